@@ -0,0 +1,208 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Tuple, List, Dict, Any, Optional, Callable
+from passage_archive import archive_dir, ARCHIVE_SUFFIX
+
+def backup_dir(db_path: str) -> str:
+    """数据库对应的备份目录（<数据库文件>.backups）"""
+    return os.path.abspath(db_path) + ".backups"
+
+def list_backups(db_path: str, directory: Optional[str] = None) -> List[str]:
+    """按时间由旧到新列出数据库的备份文件"""
+    directory = directory or backup_dir(db_path)
+    if not os.path.isdir(directory):
+        return []
+    prefix = os.path.splitext(os.path.basename(db_path))[0] + "-"
+    names = [name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith(".db")]
+    # 文件名中的时间戳定长，按名称排序即按时间排序
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+def _archive_segments(conn: sqlite3.Connection) -> List[str]:
+    """数据库中登记的归档段文件名"""
+    try:
+        names = [row[0] for row in conn.execute("SELECT name FROM passage_archives").fetchall()]
+    except sqlite3.OperationalError:
+        # 尚未迁移出归档表的数据库
+        return []
+    return [name + ARCHIVE_SUFFIX for name in names]
+
+def _copy_segments(names: List[str], source_dir: str, target_dir: str) -> int:
+    """复制归档段文件，目标中已有的跳过，返回复制的文件数
+
+    段文件写入后不再修改（新段总是写入新文件），同一文件系统上用硬链接代替复制
+    """
+    if not names:
+        return 0
+    os.makedirs(target_dir, exist_ok=True)
+    copied = 0
+    for name in names:
+        target = os.path.join(target_dir, name)
+        if os.path.exists(target):
+            continue
+        source = os.path.join(source_dir, name)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+        copied += 1
+    return copied
+
+class DatabaseBackup:
+    """使用 sqlite3 备份接口在线复制数据库，不停止写入
+
+    WAL模式下在源连接上保持一个读事务，整个复制过程读取同一快照：写入照常提交到WAL，
+    备份不会因源库被修改而重新开始。每次复制 pages 页后暂停 pause 秒，让出磁盘IO。
+    先写入 .part 临时文件，校验通过后改名，只保留最新的 keep 个备份。
+    快照中登记的归档段文件（passage_archives）一并复制到备份旁的 <备份文件>.archive 目录。
+    """
+
+    def __init__(self, db_path: str, directory: Optional[str] = None, keep: int = 7,
+                 pages: int = 256, pause: float = 0.01, verify: bool = True,
+                 progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.db_path = db_path
+        self.directory = directory or backup_dir(db_path)
+        self.keep = max(1, int(keep))
+        self.pages = max(1, int(pages))
+        self.pause = pause
+        self.verify = verify
+        self.progress = progress
+
+    def run(self) -> Tuple[bool, Any]:
+        """执行一次备份，返回 (是否成功, 备份信息/错误信息)"""
+        if self.db_path == ":memory:" or not os.path.exists(self.db_path):
+            return (False, "数据库文件不存在")
+        os.makedirs(self.directory, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(self.db_path))[0]
+        path = os.path.join(self.directory, f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db")
+        partial = path + ".part"
+        state = {'path': path, 'steps': 0, 'remaining': 0, 'total': 0, 'elapsed': 0.0, 'archives': 0}
+        started = time.monotonic()
+
+        def on_step(status, remaining, total):
+            state.update(steps=state['steps'] + 1, remaining=remaining, total=total,
+                         elapsed=time.monotonic() - started)
+            if self.progress:
+                self.progress(dict(state))
+            if remaining:
+                time.sleep(self.pause)
+
+        source = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        target = None
+        try:
+            if source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+                # 打开读事务固定快照（WAL模式下读事务不阻塞写入）
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            target = sqlite3.connect(partial)
+            source.backup(target, pages=self.pages, progress=on_step)
+            if source.in_transaction:
+                source.execute("COMMIT")
+            if self.verify:
+                result = target.execute("PRAGMA quick_check").fetchone()[0]
+                if result != "ok":
+                    raise sqlite3.DatabaseError(f"备份校验失败: {result}")
+            # 按快照中的段目录复制归档（之后新写入的段不在快照中，也不会被复制）
+            state['archives'] = _copy_segments(_archive_segments(target), archive_dir(self.db_path),
+                                               archive_dir(partial))
+            target.close()
+            target = None
+            if state['archives']:
+                os.replace(archive_dir(partial), archive_dir(path))
+            os.replace(partial, path)
+        except Exception as e:
+            if target is not None:
+                target.close()
+            if os.path.exists(partial):
+                os.remove(partial)
+            shutil.rmtree(archive_dir(partial), ignore_errors=True)
+            shutil.rmtree(archive_dir(path), ignore_errors=True)
+            return (False, f"备份失败: {str(e)}")
+        finally:
+            source.close()
+
+        state.update(bytes=os.path.getsize(path), duration=time.monotonic() - started,
+                     removed=self.rotate())
+        return (True, state)
+
+    def rotate(self) -> List[str]:
+        """删除超出保留数量的旧备份（连同其归档目录），返回删除的文件"""
+        backups = list_backups(self.db_path, self.directory)
+        removed = backups[:-self.keep]
+        for path in removed:
+            os.remove(path)
+            shutil.rmtree(archive_dir(path), ignore_errors=True)
+        return removed
+
+class BackupScheduler:
+    """在服务进程中按固定间隔执行在线备份的后台线程"""
+
+    def __init__(self, backup: DatabaseBackup, interval: float = 6 * 3600, run_at_start: bool = False):
+        self.backup = backup
+        self.interval = interval
+        self.run_at_start = run_at_start
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_result = None
+
+    def start(self) -> None:
+        """启动后台线程"""
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="db-backup", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """停止后台线程（正在进行的备份会完成）"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self) -> None:
+        if not self.run_at_start and self.stop_event.wait(self.interval):
+            return
+        while True:
+            self.last_result = self.backup.run()
+            success, info = self.last_result
+            if success:
+                print(f"数据库备份完成: {info['path']}，{info['total']} 页，"
+                      f"{info['bytes']} 字节，耗时 {info['duration']:.2f} 秒")
+            else:
+                print(f"数据库备份失败: {info}")
+            if self.stop_event.wait(self.interval):
+                return
+
+def restore_backup(backup_path: str, db_path: str, pages: int = -1) -> Tuple[bool, str]:
+    """用备份文件覆盖数据库（通过备份接口写入，正确处理目标库的WAL），应在停止服务后执行
+
+    备份中登记的归档段从 <备份文件>.archive 复制到数据库的归档目录（已有的段不重复复制）
+    """
+    if not os.path.exists(backup_path):
+        return (False, "备份文件不存在")
+    source = sqlite3.connect(backup_path)
+    try:
+        result = source.execute("PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            return (False, f"备份文件校验失败: {result}")
+        # 先补齐归档段再覆盖数据库，段文件缺失时数据库保持不变
+        segments = _archive_segments(source)
+        missing = [name for name in segments
+                   if not os.path.exists(os.path.join(archive_dir(backup_path), name))
+                   and not os.path.exists(os.path.join(archive_dir(db_path), name))]
+        if missing:
+            return (False, f"备份缺少归档段文件: {', '.join(missing)}")
+        _copy_segments([name for name in segments if os.path.exists(os.path.join(archive_dir(backup_path), name))],
+                       archive_dir(backup_path), archive_dir(db_path))
+        target = sqlite3.connect(db_path, timeout=30)
+        try:
+            source.backup(target, pages=pages)
+        finally:
+            target.close()
+        return (True, "恢复成功")
+    except Exception as e:
+        return (False, f"恢复失败: {str(e)}")
+    finally:
+        source.close()
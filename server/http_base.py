@@ -0,0 +1,207 @@
+import json
+import sqlite3
+from typing import Callable, Dict, Tuple, Any, Optional, Sequence
+from urllib.parse import parse_qsl
+from http.server import BaseHTTPRequestHandler
+from vehicle_db import VehicleDB, _is_busy_error
+from storage import VehicleStorage
+from http_pool import KeepAliveHandlerMixin
+
+# 未匹配任何路由时的统一响应
+NOT_FOUND = {"success": False, "message": "接口不存在"}
+
+# 数据库锁冲突超过重试期限时的响应（503）
+DATABASE_BUSY = {"success": False, "message": "数据库繁忙，请稍后重试"}
+
+# 布尔参数可接受的取值（不区分大小写）
+_TRUE_VALUES = frozenset(('1', 'true', 'yes', 'on'))
+_FALSE_VALUES = frozenset(('0', 'false', 'no', 'off'))
+
+def encode_json(response: Any) -> bytes:
+    """将响应序列化为JSON字节串，每个响应只序列化一次"""
+    return json.dumps(response).encode('utf-8')
+
+class ParamError(ValueError):
+    """请求参数缺失或格式错误，对应400响应"""
+
+class Param:
+    """接口参数说明
+
+    kind 为 str、int、bool，或接收原始值返回转换结果的函数（格式错误时抛出 ValueError），
+    为 None 时不做转换。查询字符串中的空值视为未传入；int 参数小于 minimum 时报错，
+    大于 maximum 时按 maximum 处理。
+    """
+
+    def __init__(self, kind: Optional[Callable[[Any], Any]] = str, required: bool = False,
+                 default: Any = None, minimum: Optional[int] = None, maximum: Optional[int] = None):
+        self.kind = kind
+        self.required = required
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def convert(self, value: Any) -> Any:
+        """按类型转换参数值，格式错误时抛出 ValueError"""
+        if self.kind is None:
+            return value
+        if self.kind is str:
+            if isinstance(value, str):
+                return value
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return str(value)
+            raise ValueError(value)
+        if self.kind is bool:
+            if isinstance(value, bool):
+                return value
+            if isinstance(value, int) and value in (0, 1):
+                return bool(value)
+            if isinstance(value, str) and value.strip().lower() in _TRUE_VALUES | _FALSE_VALUES:
+                return value.strip().lower() in _TRUE_VALUES
+            raise ValueError(value)
+        if self.kind is int:
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                raise ValueError(value)
+            value = int(value)
+            if self.minimum is not None and value < self.minimum:
+                raise ValueError(value)
+            if self.maximum is not None:
+                value = min(value, self.maximum)
+            return value
+        return self.kind(value)
+
+class Route:
+    """一条路由：接口路径、请求方法、参数说明及处理函数"""
+
+    def __init__(self, path: str, methods: Sequence[str], params: Dict[str, Param],
+                 required_message: Optional[str], func: Callable):
+        self.path = path
+        self.methods = tuple(methods)
+        self.params = params
+        self.required_message = required_message
+        self.func = func
+
+    def bind(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """按参数说明校验并转换请求参数，返回处理函数的关键字参数；校验失败抛出 ParamError"""
+        kwargs = {}
+        missing = []
+        for name, param in self.params.items():
+            value = values.get(name)
+            if value is None or value == '':
+                if param.required:
+                    missing.append(name)
+                kwargs[name] = param.default
+                continue
+            try:
+                kwargs[name] = param.convert(value)
+            except (ValueError, TypeError):
+                raise ParamError(f"参数{name}格式错误")
+        if missing:
+            raise ParamError(self.required_message or f"{'、'.join(missing)}为必填项")
+        return kwargs
+
+def route(path: str, methods: Sequence[str] = ("GET",), required_message: Optional[str] = None,
+          **params: Param) -> Callable:
+    """声明接口：被装饰的方法接收校验后的参数，返回响应字典或 (状态码, 响应字典)
+
+    required_message 为缺少必填参数时的提示，未指定时按参数名生成
+    """
+    def decorator(func: Callable) -> Callable:
+        func.route = Route(path, methods, params, required_message, func)
+        return func
+    return decorator
+
+class JSONRequestHandler(KeepAliveHandlerMixin, BaseHTTPRequestHandler):
+    """HTTP服务器共用的处理器基类
+
+    子类用 @route 声明接口，类创建时汇总为 {(请求方法, 路径): Route} 路由表，请求按表直接查找；
+    GET 参数从查询字符串解析（URL解码），POST 参数从JSON请求体解析，按 Param 校验后调用处理函数，
+    响应只序列化一次。未匹配的请求方法和路径返回404；锁冲突超过重试期限时存储抛出的错误返回503。
+    """
+
+    # 存储引擎工厂，服务器启动时创建一个共享实例；可替换为任意 VehicleStorage 实现（如 memory_store.MemoryVehicleDB）
+    storage_factory: Callable[[], VehicleStorage] = VehicleDB
+    routes: Dict[Tuple[str, str], Route] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        routes = {}
+        for klass in reversed(cls.__mro__):
+            for attr in vars(klass).values():
+                spec = getattr(attr, 'route', None)
+                if isinstance(spec, Route):
+                    routes.update(((method, spec.path), spec) for method in spec.methods)
+        cls.routes = routes
+
+    def __init__(self, request, client_address, server):
+        # 使用服务器共享的存储（启动时已初始化），请求中不再创建和初始化
+        self.db = server.storage
+        super().__init__(request, client_address, server)
+
+    @classmethod
+    def detached(cls, storage: VehicleStorage) -> 'JSONRequestHandler':
+        """创建不绑定连接的处理器，供HTTP网关直接调用 handle_route"""
+        handler = cls.__new__(cls)
+        handler.db = storage
+        return handler
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def _respond(self):
+        content_length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(content_length) if content_length > 0 else b""
+        status_code, response = self.handle_route(self.command, self.path, body)
+        self._send_json(response, status_code)
+
+    def _send_json(self, response, status_code=200):
+        """发送JSON响应（带Content-Length，连接可继续用于后续请求）"""
+        body = encode_json(response)
+        self.send_response(status_code)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def _parse_params(method: str, query: str, body: bytes) -> Dict[str, Any]:
+        """获取请求参数（GET从查询字符串，POST从JSON数据）"""
+        if method == 'GET':
+            return dict(parse_qsl(query, keep_blank_values=True))
+        try:
+            data = json.loads(body.decode('utf-8')) if body else {}
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _authorize(self, params: Dict[str, Any]) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """参数校验前调用，返回 (状态码, 响应) 时拒绝请求；默认不做检查"""
+        return None
+
+    def handle_route(self, method: str, target: str, body: bytes = b"") -> Tuple[int, Dict[str, Any]]:
+        """按路由表处理一个请求，返回 (状态码, 响应字典)"""
+        path, _, query = target.partition('?')
+        spec = self.routes.get((method, path))
+        if spec is None:
+            return 404, NOT_FOUND
+        params = self._parse_params(method, query, body)
+        try:
+            # 请求已解析完毕，只在分发期间借用只读连接；连接池已满时不等待，直接使用线程专属连接
+            with self.db.read_session(timeout=0):
+                denied = self._authorize(params)
+                if denied is not None:
+                    return denied
+                try:
+                    kwargs = spec.bind(params)
+                except ParamError as e:
+                    return 400, {"success": False, "message": str(e)}
+                result = spec.func(self, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not _is_busy_error(e):
+                raise
+            return 503, DATABASE_BUSY
+        if isinstance(result, tuple):
+            return result
+        return 200, result
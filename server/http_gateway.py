@@ -0,0 +1,299 @@
+import asyncio
+import http.client
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Tuple, List, Dict, Any, Optional, Sequence
+from storage import VehicleStorage
+from http_base import JSONRequestHandler, NOT_FOUND, encode_json
+from http_login_server import LoginHTTPHandler
+from http_admin_server import AdminHTTPHandler
+from http_user_server import UserHTTPHandler
+
+# 三类接口：名称 -> 处理器，接口路径取自处理器的路由表，各类接口路径互不重复，可由同一端口提供
+ROUTE_FAMILIES = {
+    "login": LoginHTTPHandler,
+    "admin": AdminHTTPHandler,
+    "user": UserHTTPHandler,
+}
+
+# 默认沿用原三个服务器的端口；如需单端口，可配置为 {8080: ("login", "admin", "user")}
+GATEWAY_LISTENERS = {
+    12344: ("login",),
+    12345: ("admin",),
+    12346: ("user",),
+}
+
+# 网关默认配置：数据库工作线程数、等待执行的请求数上限、请求处理超时及空闲连接超时（秒）、
+# 请求头及请求体大小上限（字节）
+GATEWAY_DEFAULTS = {
+    "max_workers": 16,
+    "queue_size": 64,
+    "request_timeout": 30.0,
+    "keepalive_timeout": 75.0,
+    "max_header_size": 65536,
+    "max_body_size": 1048576,
+}
+
+def _execute(handler: JSONRequestHandler, method: str, target: str, body: bytes) -> Tuple[int, bytes]:
+    """在工作线程中按处理器的路由表处理请求，返回 (状态码, JSON响应体)
+
+    handle_route 在分发期间借用只读连接，连接池已满时不等待
+    """
+    status, response = handler.handle_route(method, target, body)
+    return status, encode_json(response)
+
+class HTTPGateway:
+    """单进程asyncio HTTP网关，在一个或多个端口上提供登录、管理员、用户三类接口
+
+    连接由事件循环管理，空闲的keep-alive连接只占用一个等待读取的协程；
+    数据库调用在有界线程池中执行，正在执行和等待执行的请求超过
+    max_workers + queue_size 时直接返回503，处理超过 request_timeout 秒返回504。
+    三类接口直接调用原服务器处理器的 handle_route，路由、参数校验和JSON格式与原服务器一致，
+    共用一个存储实例；运行期间按 max_workers 在存储的只读连接池中预留连接。
+    """
+
+    def __init__(self, listeners: Optional[Dict[int, Sequence[str]]] = None, host: str = "",
+                 max_workers: int = GATEWAY_DEFAULTS["max_workers"],
+                 queue_size: int = GATEWAY_DEFAULTS["queue_size"],
+                 request_timeout: float = GATEWAY_DEFAULTS["request_timeout"],
+                 keepalive_timeout: float = GATEWAY_DEFAULTS["keepalive_timeout"],
+                 max_header_size: int = GATEWAY_DEFAULTS["max_header_size"],
+                 max_body_size: int = GATEWAY_DEFAULTS["max_body_size"],
+                 storage: Optional[VehicleStorage] = None):
+        self.listeners = dict(listeners or GATEWAY_LISTENERS)
+        self.host = host
+        self.max_workers = max(1, int(max_workers))
+        self.capacity = self.max_workers + max(0, int(queue_size))
+        self.request_timeout = request_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.routes = {}
+        for port, families in self.listeners.items():
+            table = {}
+            for family in families:
+                if family not in ROUTE_FAMILIES:
+                    raise ValueError(f"未知的接口类别: {family}")
+                handler_class = ROUTE_FAMILIES[family]
+                table.update((path, handler_class) for _, path in handler_class.routes)
+            self.routes[port] = table
+        # 处理器按 storage_factory 创建存储，相同工厂只创建并初始化一次；每类处理器一个共享实例
+        self.storages = {}
+        self.handlers = {}
+        for port, table in self.routes.items():
+            for handler_class in table.values():
+                if handler_class in self.handlers:
+                    continue
+                factory = handler_class.storage_factory
+                if factory not in self.storages:
+                    if storage is None:
+                        instance = factory()
+                        if not instance.initialize():
+                            raise RuntimeError("数据库初始化失败")
+                        self.storages[factory] = instance
+                    else:
+                        self.storages[factory] = storage
+                self.handlers[handler_class] = handler_class.detached(self.storages[factory])
+        self.executor = None
+        self.servers = []
+        self.writers = set()
+        self.ports = []
+        self.loop = None
+        self.stopped = None
+        self.pending = 0
+        self.stats = {'connections': 0, 'open_connections': 0, 'requests': 0, 'rejected': 0, 'timeouts': 0}
+        self.ready = threading.Event()
+
+    async def start(self) -> List[int]:
+        """开始监听，返回实际监听的端口（配置为0时由系统分配）"""
+        self.loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gateway-db")
+        for storage in self._distinct_storages():
+            storage.reserve_read_connections(self.max_workers)
+        ports = []
+        for port, table in self.routes.items():
+            server = await asyncio.start_server(
+                lambda reader, writer, table=table: self._handle_connection(reader, writer, table),
+                self.host or None, port, limit=self.max_header_size, backlog=1024
+            )
+            self.servers.append(server)
+            ports.append(server.sockets[0].getsockname()[1])
+        self.ports = ports
+        self.ready.set()
+        return ports
+
+    async def serve_forever(self) -> None:
+        """启动并运行至 stop 被调用"""
+        if not self.servers:
+            await self.start()
+        try:
+            await self.stopped.wait()
+        finally:
+            for server in self.servers:
+                server.close()
+            # 关闭空闲的keep-alive连接，正在处理的请求写完响应后随之结束
+            for writer in list(self.writers):
+                writer.close()
+            for server in self.servers:
+                await server.wait_closed()
+            self.servers = []
+            self.executor.shutdown(wait=True)
+            for storage in self._distinct_storages():
+                storage.reserve_read_connections(-self.max_workers)
+
+    def _distinct_storages(self) -> List[VehicleStorage]:
+        storages = []
+        for storage in self.storages.values():
+            if all(storage is not other for other in storages):
+                storages.append(storage)
+        return storages
+
+    def stop(self) -> None:
+        """停止网关（可在其他线程中调用）"""
+        if self.loop is not None and self.stopped is not None:
+            self.loop.call_soon_threadsafe(self.stopped.set)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回累计连接数、当前打开的连接数、请求数、因繁忙拒绝及超时的请求数，以及正在执行和等待的请求数"""
+        stats = dict(self.stats)
+        stats['pending'] = self.pending
+        return stats
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                 routes: Dict[str, Any]) -> None:
+        self.stats['connections'] += 1
+        self.stats['open_connections'] += 1
+        self.writers.add(writer)
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = self._keep_alive(version, headers)
+                status, content_type, payload = await self._dispatch(routes, method, target, body)
+                self._write_response(writer, status, content_type, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.stats['open_connections'] -= 1
+            self.writers.discard(writer)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """读取一个请求，连接关闭、空闲超时或请求格式错误时返回None"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return None
+        except asyncio.LimitOverrunError:
+            self._write_error(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "请求头过大")
+            return None
+        request_line, _, header_block = head.partition(b"\r\n")
+        parts = request_line.decode('iso-8859-1').split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            self._write_error(writer, HTTPStatus.BAD_REQUEST, "请求格式错误")
+            return None
+        method, target, version = parts
+        headers = http.client.parse_headers(io.BytesIO(header_block))
+        # 不支持分块传输的请求体，与 KeepAliveHandlerMixin 一致要求 Content-Length
+        if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            self._write_error(writer, HTTPStatus.LENGTH_REQUIRED, "请求体须带Content-Length")
+            return None
+        try:
+            length = int(headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._write_error(writer, HTTPStatus.BAD_REQUEST, "Content-Length无效")
+            return None
+        if length > self.max_body_size:
+            self._write_error(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "请求体过大")
+            return None
+        body = await asyncio.wait_for(reader.readexactly(length), self.request_timeout) if length > 0 else b""
+        return method, target, version, headers, body
+
+    @staticmethod
+    def _keep_alive(version: str, headers: http.client.HTTPMessage) -> bool:
+        connection = headers.get('Connection', '').lower()
+        if version == "HTTP/1.1":
+            return connection != "close"
+        return connection == "keep-alive"
+
+    async def _dispatch(self, routes: Dict[str, Any], method: str, target: str,
+                        body: bytes) -> Tuple[int, str, bytes]:
+        self.stats['requests'] += 1
+        path = target.partition('?')[0]
+        handler_class = routes.get(path)
+        # 路径或请求方法不在路由表中时直接返回404，不占用数据库线程
+        if handler_class is None or (method, path) not in handler_class.routes:
+            return int(HTTPStatus.NOT_FOUND), 'application/json; charset=utf-8', encode_json(NOT_FOUND)
+        if self.pending >= self.capacity:
+            self.stats['rejected'] += 1
+            return self._json(HTTPStatus.SERVICE_UNAVAILABLE, "服务器繁忙，请稍后重试")
+        self.pending += 1
+        future = self.loop.run_in_executor(self.executor, _execute, self.handlers[handler_class],
+                                           method, target, body)
+        future.add_done_callback(self._request_done)
+        try:
+            # shield：超时只放弃等待，已在线程中执行的处理器继续完成，完成后才释放名额
+            status, payload = await asyncio.wait_for(asyncio.shield(future), self.request_timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            return self._json(HTTPStatus.GATEWAY_TIMEOUT, "请求处理超时")
+        except Exception as e:
+            return self._json(HTTPStatus.INTERNAL_SERVER_ERROR, f"服务器内部错误: {str(e)}")
+        return status, 'application/json; charset=utf-8', payload
+
+    def _request_done(self, future) -> None:
+        self.pending -= 1
+
+    @staticmethod
+    def _json(status: int, message: str) -> Tuple[int, str, bytes]:
+        body = encode_json({"success": False, "message": message})
+        return int(status), 'application/json; charset=utf-8', body
+
+    def _write_error(self, writer: asyncio.StreamWriter, status: int, message: str) -> None:
+        self._write_response(writer, *self._json(status, message), keep_alive=False)
+
+    def _write_response(self, writer: asyncio.StreamWriter, status: int, content_type: str,
+                        body: bytes, keep_alive: bool) -> None:
+        try:
+            reason = HTTPStatus(status).phrase
+        except ValueError:
+            reason = ""
+        head = (f"HTTP/1.1 {status} {reason}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if keep_alive:
+            head += f"Keep-Alive: timeout={int(self.keepalive_timeout)}\r\n"
+        writer.write(head.encode('ascii') + b"\r\n" + body)
+
+def run_gateway(listeners: Optional[Dict[int, Sequence[str]]] = None,
+                max_workers: int = GATEWAY_DEFAULTS["max_workers"],
+                queue_size: int = GATEWAY_DEFAULTS["queue_size"],
+                request_timeout: float = GATEWAY_DEFAULTS["request_timeout"],
+                keepalive_timeout: float = GATEWAY_DEFAULTS["keepalive_timeout"]):
+    gateway = HTTPGateway(listeners, max_workers=max_workers, queue_size=queue_size,
+                          request_timeout=request_timeout, keepalive_timeout=keepalive_timeout)
+    for port, families in gateway.listeners.items():
+        print(f"HTTP网关启动，监听端口 {port}（{'、'.join(families)}）...")
+    try:
+        asyncio.run(gateway.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    print('HTTP网关已关闭')
+
+if __name__ == '__main__':
+    run_gateway()
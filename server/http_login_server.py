@@ -1,84 +1,23 @@
-import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from vehicle_db import VehicleDB
-
-class LoginHTTPHandler(BaseHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        self.db = VehicleDB()
-        if not self.db.initialize():
-            raise RuntimeError("数据库初始化失败")
-        super().__init__(*args, **kwargs)
-
-    def _set_response(self, status_code=200):
-        self.send_response(status_code)
-        self.send_header('Content-type', 'application/json; charset=utf-8')
-        self.end_headers()
-
-    def _parse_post_data(self):
-        content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length)
-        try:
-            return json.loads(post_data.decode('utf-8'))
-        except json.JSONDecodeError:
-            return None
-
-    def _get_params(self):
-        """获取请求参数（GET从查询字符串，POST从JSON数据）"""
-        if self.command == 'GET':
-            params = {}
-            if '?' in self.path:
-                path, query = self.path.split('?', 1)
-                for param in query.split('&'):
-                    if '=' in param:
-                        k, v = param.split('=', 1)
-                        params[k] = v
-            return params
-        else:  # POST
-            return self._parse_post_data() or {}
-
-    def do_GET(self):
-        self._handle_request()
-
-    def do_POST(self):
-        self._handle_request()
-
-    def _handle_request(self):
-        path = self.path.split('?')[0]
-        params = self._get_params()
-        
-        if path == '/verify_user_and_get_role':
-            name = params.get('name')
-            password = params.get('password')
-            
-            if not name or not password:
-                # 修改此处的响应格式，返回标准JSON对象
-                response = {"success": False, "message": "用户名或密码不能为空"}
-                self._set_response(400)
-                self.wfile.write(json.dumps(response).encode('utf-8'))
-                return
-                
-            # 验证用户
-            success, user_id, is_admin = self.db.verify_user(name, password)
-
-            if success and user_id != -1:
-                role = "admin" if is_admin else "user"
-                response = {"success": True, "role": role}
-            else:
-                response = {"success": False, "message": "用户名或密码错误"}
-                
-            self._set_response()
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-            
-        else:
-            self._set_response(404)
-            # 统一错误响应格式
-            response = {"success": False, "message": "接口不存在"}
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-
-def run_login_server():
+from http_base import JSONRequestHandler, Param, route
+from http_pool import PooledHTTPServer, HTTP_POOL_DEFAULTS
+
+class LoginHTTPHandler(JSONRequestHandler):
+    @route('/verify_user_and_get_role', ('GET', 'POST'), "用户名或密码不能为空",
+           name=Param(required=True), password=Param(required=True))
+    def verify_user_and_get_role(self, name, password):
+        # 验证用户
+        success, user_id, is_admin = self.db.verify_user(name, password)
+        if success and user_id != -1:
+            role = "admin" if is_admin else "user"
+            return {"success": True, "role": role}
+        return {"success": False, "message": "用户名或密码错误"}
+
+def run_login_server(max_workers: int = HTTP_POOL_DEFAULTS["max_workers"],
+                     queue_size: int = HTTP_POOL_DEFAULTS["queue_size"],
+                     request_timeout: float = HTTP_POOL_DEFAULTS["request_timeout"]):
     server_address = ('', 12344)
-    httpd = HTTPServer(server_address, LoginHTTPHandler)
-    print('登录服务器启动，监听端口 12344...')
+    httpd = PooledHTTPServer(server_address, LoginHTTPHandler, max_workers, queue_size, request_timeout)
+    print(f'登录服务器启动，监听端口 12344（{max_workers} 个工作线程）...')
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
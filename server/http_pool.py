@@ -0,0 +1,202 @@
+import io
+import json
+import queue
+import select
+import socket
+import threading
+import time
+from http.server import HTTPServer
+from typing import Tuple, Dict, Any, Optional
+from storage import VehicleStorage
+
+# HTTP服务器默认配置：工作线程数、等待队列长度、单个请求的超时时间及持久连接的空闲超时（秒）
+HTTP_POOL_DEFAULTS = {
+    "max_workers": 16,
+    "queue_size": 64,
+    "request_timeout": 30.0,
+    "keepalive_timeout": 5.0,
+}
+
+class KeepAliveHandlerMixin:
+    """HTTP/1.1 持久连接：在同一连接上依次处理多个请求（包括客户端流水线发送的请求）
+
+    与 BaseHTTPRequestHandler 一起使用，响应必须带 Content-Length。每个请求的请求体在解析请求头后
+    整体读出，处理器未读取的内容不会被当作下一个请求。两个请求之间最多空闲 keepalive_timeout 秒；
+    空闲期间服务器有连接在排队时关闭连接，让出工作线程（已到达的流水线请求照常处理）。
+    """
+
+    protocol_version = "HTTP/1.1"
+    keepalive_timeout = HTTP_POOL_DEFAULTS["keepalive_timeout"]
+
+    def handle(self):
+        self.stream = self.rfile
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._wait_for_next_request():
+            self.rfile = self.stream
+            self.handle_one_request()
+
+    def parse_request(self) -> bool:
+        self.rfile = self.stream
+        if not super().parse_request():
+            return False
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            self.send_error(411, "Length Required")
+            return False
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_error(400, "Bad Content-Length")
+            return False
+        self.rfile = io.BytesIO(self.stream.read(length))
+        return True
+
+    def _wait_for_next_request(self) -> bool:
+        """等待下一个请求到达，连接关闭、空闲超时或需要让出工作线程时返回False"""
+        waiting = getattr(self.server, 'requests', None)
+        idle_timeout = getattr(self.server, 'keepalive_timeout', None) or self.keepalive_timeout
+        deadline = time.monotonic() + idle_timeout
+        timeout = self.connection.gettimeout()
+        # 非阻塞地检查缓冲区及已到达的数据；套接字读超时后无法继续读取，因此用select分段等待
+        self.connection.settimeout(0.0)
+        readable = False
+        try:
+            while True:
+                if self.stream.peek(1):
+                    return True
+                if readable:
+                    # 可读但没有数据：客户端已关闭连接
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (waiting is not None and waiting.qsize() > 0):
+                    return False
+                readable = bool(select.select([self.connection], [], [], min(remaining, 0.1))[0])
+        except (OSError, ValueError):
+            return False
+        finally:
+            self.connection.settimeout(timeout)
+
+class PooledHTTPServer(HTTPServer):
+    """由固定数量的工作线程处理请求的HTTP服务器
+
+    监听线程只负责接受连接并放入有界队列，max_workers 个工作线程并发处理；
+    队列已满时直接返回503，避免请求无限堆积。request_timeout 同时限制连接上的
+    单次读写等待和请求在队列中的等待时间，排队超时的请求同样返回503；处理器使用
+    KeepAliveHandlerMixin 时，持久连接在两个请求之间最多空闲 keepalive_timeout 秒。
+    每个请求始终在同一个工作线程中处理，处理器可以安全使用线程专属的数据库连接。
+
+    storage 为各请求共享的存储（处理器通过 server.storage 访问）；未传入时按处理器的
+    storage_factory 创建，并在启动时初始化一次。启动时按工作线程数在存储的只读连接池中预留连接，
+    关闭时取消预留；工作线程退出时关闭其数据库连接。
+    """
+
+    # 操作系统的连接等待队列（listen backlog）
+    request_queue_size = 128
+
+    def __init__(self, server_address: Tuple[str, int], handler_class,
+                 max_workers: int = HTTP_POOL_DEFAULTS["max_workers"],
+                 queue_size: int = HTTP_POOL_DEFAULTS["queue_size"],
+                 request_timeout: float = HTTP_POOL_DEFAULTS["request_timeout"],
+                 keepalive_timeout: float = HTTP_POOL_DEFAULTS["keepalive_timeout"],
+                 storage: Optional[VehicleStorage] = None, bind_and_activate: bool = True):
+        if storage is None and hasattr(handler_class, 'storage_factory'):
+            storage = handler_class.storage_factory()
+            if not storage.initialize():
+                raise RuntimeError("数据库初始化失败")
+        self.storage = storage
+        super().__init__(server_address, handler_class, bind_and_activate)
+        self.max_workers = max(1, int(max_workers))
+        if self.storage is not None:
+            self.storage.reserve_read_connections(self.max_workers)
+        self.request_timeout = request_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.requests = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.stats_lock = threading.Lock()
+        self.stats = {'accepted': 0, 'rejected': 0, 'expired': 0, 'completed': 0, 'active': 0}
+        self.workers = []
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker, name=f"http-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def process_request(self, request: socket.socket, client_address) -> None:
+        """在监听线程中调用：放入等待队列，队列已满时返回503"""
+        try:
+            self.requests.put_nowait((request, client_address, time.monotonic()))
+        except queue.Full:
+            self._count('rejected')
+            self._reject(request, "服务器繁忙，请稍后重试")
+            return
+        self._count('accepted')
+
+    def _worker(self) -> None:
+        try:
+            self._serve_queued()
+        finally:
+            if self.storage is not None:
+                self.storage.close_thread_resources()
+
+    def _serve_queued(self) -> None:
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            request, client_address, queued_at = item
+            if self.request_timeout is not None and time.monotonic() - queued_at > self.request_timeout:
+                # 客户端多半已放弃等待，不再处理
+                self._count('expired')
+                self._reject(request, "请求排队超时")
+                continue
+            self._count('active')
+            try:
+                request.settimeout(self.request_timeout)
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self.stats_lock:
+                    self.stats['active'] -= 1
+                    self.stats['completed'] += 1
+
+    def _reject(self, request: socket.socket, message: str) -> None:
+        """不经处理器直接返回503并关闭连接"""
+        body = json.dumps({"success": False, "message": message}).encode('utf-8')
+        head = (f"HTTP/1.0 503 Service Unavailable\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Retry-After: 1\r\n"
+                f"Connection: close\r\n\r\n").encode('ascii')
+        try:
+            request.settimeout(1.0)
+            request.sendall(head + body)
+            # 读掉已到达的请求内容，避免关闭时因未读数据发送RST导致客户端收不到响应
+            request.setblocking(False)
+            request.recv(65536)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _count(self, key: str) -> None:
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回请求计数：已接受、队列满拒绝、排队超时、已完成、正在处理，以及当前排队数"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['queued'] = self.requests.qsize()
+        return stats
+
+    def server_close(self) -> None:
+        """关闭监听套接字，处理完已排队的请求后停止工作线程"""
+        super().server_close()
+        for _ in self.workers:
+            self.requests.put(None)
+        for worker in self.workers:
+            worker.join()
+        if self.workers and self.storage is not None:
+            self.storage.reserve_read_connections(-self.max_workers)
+        self.workers = []
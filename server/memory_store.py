@@ -0,0 +1,383 @@
+import hashlib
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+from typing import Tuple, List, Dict, Any, Optional, Sequence
+from storage import VehicleStorage
+from vehicle_db import decode_page_cursor
+
+class MemoryVehicleDB(VehicleStorage):
+    """基于字典和有序列表的内存存储引擎，行为与 VehicleDB 一致（返回值、提示信息、排序和分页游标）
+
+    数据只保存在进程内存中，进程退出即丢失，适用于测试和基准测试。
+    所有操作在一把锁内完成；通行记录按 (passage_time, id) 维护全局、按车辆、按传感器三个有序索引。
+    """
+
+    def __init__(self):
+        self.initialized = False
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.users = {}             # id -> 用户字典
+        self.user_ids = []          # 有序用户ID
+        self.user_by_name = {}      # name -> id
+        self.sensors = {}           # id -> 传感器字典
+        self.sensor_ids = []        # 有序传感器ID
+        self.sensor_by_code = {}    # sensor_id -> id
+        self.vehicles = {}          # vehicle_id -> 车辆字典
+        self.vehicle_ids = []       # 有序车辆ID
+        self.passages = {}          # id -> 通行记录字典
+        self.passage_keys = []      # 有序 (passage_time, id)
+        self.vehicle_passages = {}  # vehicle_id -> 有序 (passage_time, id)
+        self.sensor_passages = {}   # sensor id -> 有序 (passage_time, id)
+        self.occupancy = 0
+        self.next_user_id = 1
+        self.next_sensor_id = 1
+        self.next_passage_id = 1
+
+    @staticmethod
+    def _now() -> str:
+        # 与SQLite的CURRENT_TIMESTAMP一致（UTC）
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def _hash_password(password: str) -> str:
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def initialize(self, db_path: str = ":memory:", *args, **kwargs) -> bool:
+        """初始化并添加默认管理员，db_path 等参数仅为与 VehicleDB 接口一致而保留"""
+        with self.lock:
+            if self.initialized:
+                return True
+            self._reset()
+            self._insert_user("root", self._hash_password("123456"), True)
+            self.initialized = True
+            return True
+
+    def close(self) -> None:
+        with self.lock:
+            self.initialized = False
+
+    # 分页辅助
+    @staticmethod
+    def _page_ascending(keys: List[Any], limit: int, offset: int, after: Optional[str],
+                        kind: str) -> Optional[List[Any]]:
+        """在升序键列表上分页，游标无效时返回None"""
+        if after is not None:
+            key = decode_page_cursor(kind, after)
+            if key is None:
+                return None
+            start = bisect_right(keys, key[0])
+            return keys[start:start + limit]
+        return keys[offset:offset + limit]
+
+    @staticmethod
+    def _page_descending(keys: List[Tuple[str, int]], limit: int, offset: int,
+                         after: Optional[str]) -> Optional[List[Tuple[str, int]]]:
+        """在升序 (passage_time, id) 列表上按倒序分页，游标无效时返回None"""
+        if after is not None:
+            key = decode_page_cursor("passages", after)
+            if key is None:
+                return None
+            end = bisect_left(keys, (key[0], key[1]))
+        else:
+            end = len(keys) - offset
+        if end <= 0:
+            return []
+        return keys[max(0, end - limit):end][::-1]
+
+    def _passage_dicts(self, keys: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+        records = []
+        for _, passage_id in keys:
+            record = self.passages[passage_id]
+            sensor = self.sensors.get(record['sensor_id'])
+            records.append(dict(record, location=sensor['location'] if sensor else None))
+        return [{k: r[k] for k in ('id', 'vehicle_id', 'sensor_id', 'location', 'passage_time', 'created_at')}
+                for r in records]
+
+    # 用户管理
+    def _insert_user(self, name: str, hashed_pwd: str, is_admin: bool) -> None:
+        user_id = self.next_user_id
+        self.next_user_id += 1
+        now = self._now()
+        self.users[user_id] = {'id': user_id, 'name': name, 'password': hashed_pwd,
+                               'is_admin': int(bool(is_admin)), 'created_at': now, 'updated_at': now}
+        self.user_ids.append(user_id)
+        self.user_by_name[name] = user_id
+
+    def add_user(self, name: str, password: str, is_admin: bool = False) -> Tuple[bool, str]:
+        with self.lock:
+            if name in self.user_by_name:
+                return (False, "用户名已存在")
+            self._insert_user(name, self._hash_password(password), is_admin)
+            return (True, "用户添加成功")
+
+    def verify_user(self, name: str, password: str) -> Tuple[bool, int, bool]:
+        with self.lock:
+            user = self.users.get(self.user_by_name.get(name))
+            if user and user['password'] == self._hash_password(password):
+                return (True, user['id'], user['is_admin'])
+            return (False, -1, False)
+
+    def change_password(self, name: str, old_password: Optional[str], new_password: str) -> Tuple[bool, str]:
+        with self.lock:
+            user = self.users.get(self.user_by_name.get(name))
+            if not user:
+                return (False, "用户不存在")
+            if old_password is not None and self._hash_password(old_password) != user['password']:
+                return (False, "旧密码不正确")
+            user['password'] = self._hash_password(new_password)
+            user['updated_at'] = self._now()
+            return (True, "密码修改成功")
+
+    def delete_user(self, name: str, password: Optional[str]) -> Tuple[bool, str]:
+        with self.lock:
+            user = self.users.get(self.user_by_name.get(name))
+            if not user:
+                return (False, "用户不存在")
+            if password is not None and self._hash_password(password) != user['password']:
+                return (False, "密码不正确，无法删除")
+            # 与VehicleDB一致：删除其登记的车辆（通行记录保留）
+            for vehicle_id in [v for v, vehicle in self.vehicles.items() if vehicle['registered_by'] == user['id']]:
+                self._remove_vehicle(vehicle_id)
+            del self.users[user['id']]
+            del self.user_by_name[name]
+            self.user_ids.pop(bisect_left(self.user_ids, user['id']))
+            return (True, "用户删除成功")
+
+    def get_user_id_by_name(self, name: str) -> Tuple[bool, int]:
+        with self.lock:
+            user_id = self.user_by_name.get(name)
+            return (True, user_id) if user_id is not None else (False, -1)
+
+    def get_users(self, limit: int = 20, offset: int = 0, after: Optional[str] = None,
+                  with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        with self.lock:
+            ids = self._page_ascending(self.user_ids, limit, offset, after, "users")
+            if ids is None:
+                return (False, "无效的分页游标", 0)
+            users = [{k: self.users[i][k] for k in ('id', 'name', 'is_admin', 'created_at')} for i in ids]
+            return (True, users, len(self.user_ids) if with_total else None)
+
+    # 传感器管理
+    def add_sensor(self, sensor_id: str, location: str, description: str = "",
+                   is_active: bool = True, is_gate: bool = False) -> Tuple[bool, str]:
+        with self.lock:
+            if sensor_id in self.sensor_by_code:
+                return (False, "传感器ID已存在")
+            if any(s['location'] == location for s in self.sensors.values()):
+                return (False, "位置已被占用")
+            id = self.next_sensor_id
+            self.next_sensor_id += 1
+            now = self._now()
+            self.sensors[id] = {'id': id, 'sensor_id': sensor_id, 'location': location, 'description': description,
+                                'is_active': int(bool(is_active)), 'is_gate': int(bool(is_gate)),
+                                'created_at': now, 'updated_at': now}
+            self.sensor_ids.append(id)
+            self.sensor_by_code[sensor_id] = id
+            return (True, "传感器添加成功")
+
+    def update_sensor_status(self, sensor_id: str, is_active: bool) -> Tuple[bool, str]:
+        with self.lock:
+            sensor = self.sensors.get(self.sensor_by_code.get(sensor_id))
+            if not sensor:
+                return (False, "传感器不存在")
+            sensor['is_active'] = int(bool(is_active))
+            sensor['updated_at'] = self._now()
+            return (True, "传感器状态更新成功")
+
+    def delete_sensor(self, sensor_id: str) -> Tuple[bool, str]:
+        with self.lock:
+            id = self.sensor_by_code.get(sensor_id)
+            if id is None:
+                return (False, "传感器不存在")
+            for key in list(self.sensor_passages.get(id, [])):
+                self._remove_passage(key)
+            del self.sensors[id]
+            del self.sensor_by_code[sensor_id]
+            self.sensor_ids.pop(bisect_left(self.sensor_ids, id))
+            return (True, "传感器删除成功")
+
+    def get_sensors(self, limit: int = 20, offset: int = 0, after: Optional[str] = None,
+                    with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        with self.lock:
+            ids = self._page_ascending(self.sensor_ids, limit, offset, after, "sensors")
+            if ids is None:
+                return (False, "无效的分页游标", 0)
+            fields = ('id', 'sensor_id', 'location', 'description', 'is_active', 'is_gate', 'created_at')
+            sensors = [{k: self.sensors[i][k] for k in fields} for i in ids]
+            return (True, sensors, len(self.sensor_ids) if with_total else None)
+
+    def get_sensor_status(self, sensor_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        with self.lock:
+            sensor = self.sensors.get(self.sensor_by_code.get(sensor_id))
+            return (True, dict(sensor)) if sensor else (False, None)
+
+    def lookup_sensor(self, sensor_id: str) -> Optional[Tuple[int, bool, bool]]:
+        with self.lock:
+            sensor = self.sensors.get(self.sensor_by_code.get(sensor_id))
+            if not sensor:
+                return None
+            return (sensor['id'], bool(sensor['is_active']), bool(sensor['is_gate']))
+
+    # 车辆管理
+    def add_vehicle(self, vehicle_id: str, registered_by: Any, is_on_campus: bool = False) -> Tuple[bool, str]:
+        with self.lock:
+            if vehicle_id in self.vehicles:
+                return (False, "车辆已注册")
+            user_id = self.user_by_name.get(registered_by)
+            if user_id is None:
+                return (False, "注册人不存在")
+            now = self._now()
+            self.vehicles[vehicle_id] = {'vehicle_id': vehicle_id, 'is_on_campus': int(bool(is_on_campus)),
+                                         'registered_by': user_id, 'created_at': now, 'updated_at': now}
+            insort(self.vehicle_ids, vehicle_id)
+            self.occupancy += int(bool(is_on_campus))
+            return (True, "车辆注册成功")
+
+    def _remove_vehicle(self, vehicle_id: str) -> None:
+        vehicle = self.vehicles.pop(vehicle_id)
+        self.vehicle_ids.pop(bisect_left(self.vehicle_ids, vehicle_id))
+        self.occupancy -= vehicle['is_on_campus']
+
+    def delete_vehicle(self, vehicle_id: str) -> Tuple[bool, str]:
+        with self.lock:
+            if vehicle_id not in self.vehicles:
+                return (False, "车辆不存在")
+            for key in list(self.vehicle_passages.get(vehicle_id, [])):
+                self._remove_passage(key)
+            self._remove_vehicle(vehicle_id)
+            return (True, "车辆删除成功")
+
+    def _vehicle_dict(self, vehicle: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+        user = self.users.get(vehicle['registered_by'])
+        row = dict(vehicle, registered_by_name=user['name'] if user else None)
+        return {k: row[k] for k in fields}
+
+    def get_vehicles(self, limit: int = 20, offset: int = 0, after: Optional[str] = None,
+                     with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        with self.lock:
+            ids = self._page_ascending(self.vehicle_ids, limit, offset, after, "vehicles")
+            if ids is None:
+                return (False, "无效的分页游标", 0)
+            fields = ('vehicle_id', 'is_on_campus', 'registered_by_name', 'created_at')
+            vehicles = [self._vehicle_dict(self.vehicles[v], fields) for v in ids]
+            return (True, vehicles, len(self.vehicle_ids) if with_total else None)
+
+    def get_vehicle_status(self, vehicle_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        with self.lock:
+            vehicle = self.vehicles.get(vehicle_id)
+            if not vehicle:
+                return (False, None)
+            fields = ('vehicle_id', 'is_on_campus', 'registered_by_name', 'created_at', 'updated_at')
+            return (True, self._vehicle_dict(vehicle, fields))
+
+    def get_campus_occupancy(self) -> Tuple[bool, Any]:
+        with self.lock:
+            return (True, self.occupancy)
+
+    # 通行记录
+    def _insert_passage(self, vehicle_id: str, sensor_id: int, passage_time: str) -> None:
+        passage_id = self.next_passage_id
+        self.next_passage_id += 1
+        self.passages[passage_id] = {'id': passage_id, 'vehicle_id': vehicle_id, 'sensor_id': sensor_id,
+                                     'passage_time': passage_time, 'created_at': self._now()}
+        key = (passage_time, passage_id)
+        insort(self.passage_keys, key)
+        insort(self.vehicle_passages.setdefault(vehicle_id, []), key)
+        insort(self.sensor_passages.setdefault(sensor_id, []), key)
+
+    def _remove_passage(self, key: Tuple[str, int]) -> None:
+        record = self.passages.pop(key[1])
+        for keys in (self.passage_keys, self.vehicle_passages[record['vehicle_id']],
+                     self.sensor_passages[record['sensor_id']]):
+            keys.pop(bisect_left(keys, key))
+
+    def _set_on_campus(self, vehicle: Dict[str, Any], is_on_campus: bool) -> None:
+        self.occupancy += int(is_on_campus) - vehicle['is_on_campus']
+        vehicle['is_on_campus'] = int(is_on_campus)
+        vehicle['updated_at'] = self._now()
+
+    def add_passage_record(self, vehicle_id: str, sensor_id: int) -> Tuple[bool, str]:
+        with self.lock:
+            vehicle = self.vehicles.get(vehicle_id)
+            if not vehicle:
+                return (False, "车辆不存在")
+            sensor = self.sensors.get(sensor_id)
+            if not sensor:
+                return (False, "传感器不存在")
+            self._insert_passage(vehicle_id, sensor_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            # 如果是校门传感器，反转车辆在校状态
+            is_on_campus = bool(vehicle['is_on_campus'])
+            if sensor['is_gate']:
+                is_on_campus = not is_on_campus
+            self._set_on_campus(vehicle, is_on_campus)
+            return (True, "通行记录添加成功")
+
+    def add_passage_records_bulk(self, events: Sequence[Tuple[str, int, Any]]) -> Tuple[bool, Any]:
+        with self.lock:
+            results = []
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            for event in events:
+                if len(event) != 3:
+                    results.append((False, "事件格式无效"))
+                    continue
+                vehicle_id, sensor_id, timestamp = event
+                vehicle = self.vehicles.get(vehicle_id)
+                if not vehicle:
+                    results.append((False, "车辆不存在"))
+                    continue
+                sensor = self.sensors.get(sensor_id)
+                if not sensor:
+                    results.append((False, "传感器不存在"))
+                    continue
+                if timestamp is None:
+                    passage_time = now
+                elif isinstance(timestamp, datetime):
+                    passage_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+                else:
+                    try:
+                        passage_time = datetime.strptime(str(timestamp), "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+                    except ValueError:
+                        results.append((False, "时间格式无效"))
+                        continue
+                self._insert_passage(vehicle_id, sensor_id, passage_time)
+                if sensor['is_gate']:
+                    self._set_on_campus(vehicle, not vehicle['is_on_campus'])
+                results.append((True, "通行记录添加成功"))
+            return (True, results)
+
+    def get_passage_by_vehicle(self, vehicle_id: str, limit: int = 20, offset: int = 0,
+                               after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        with self.lock:
+            if vehicle_id not in self.vehicles:
+                return (False, "车辆不存在", 0)
+            keys = self.vehicle_passages.get(vehicle_id, [])
+            page = self._page_descending(keys, limit, offset, after)
+            if page is None:
+                return (False, "无效的分页游标", 0)
+            return (True, self._passage_dicts(page), len(keys) if with_total else None)
+
+    def get_passage_by_sensor(self, sensor_id: int, limit: int = 20, offset: int = 0,
+                              after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        with self.lock:
+            if sensor_id not in self.sensors:
+                return (False, "传感器不存在", 0)
+            keys = self.sensor_passages.get(sensor_id, [])
+            page = self._page_descending(keys, limit, offset, after)
+            if page is None:
+                return (False, "无效的分页游标", 0)
+            return (True, self._passage_dicts(page), len(keys) if with_total else None)
+
+    def get_passages_by_time(self, start_time: str, end_time: str, limit: int = 20, offset: int = 0,
+                             after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        with self.lock:
+            # 时间范围 [start_time, end_time) 对应的键区间
+            lo = bisect_left(self.passage_keys, (start_time,))
+            hi = bisect_left(self.passage_keys, (end_time,))
+            keys = self.passage_keys[lo:hi]
+            page = self._page_descending(keys, limit, offset, after)
+            if page is None:
+                return (False, "无效的分页游标", 0)
+            return (True, self._passage_dicts(page), len(keys) if with_total else None)
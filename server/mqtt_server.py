@@ -2,7 +2,9 @@ import time
 import json
 import paho.mqtt.client as mqtt
 from datetime import datetime
+from typing import Optional
 from vehicle_db import VehicleDB  # 导入数据库操作类
+from storage import VehicleStorage
 
 class MqttJsonVehicleWriter:
     def __init__(self, 
@@ -12,14 +14,21 @@ class MqttJsonVehicleWriter:
              mqtt_topic="vehicle/passage",
              mqtt_username=None,
              mqtt_password=None,
-             client_id="vehicle_json_db_writer"):
-        """初始化MQTT JSON车辆数据写入器（无方向版）"""
+             client_id="vehicle_json_db_writer",
+             db: Optional[VehicleStorage] = None):
+        """初始化MQTT JSON车辆数据写入器（无方向版）
+
+        db 为已初始化的存储实例（任意 VehicleStorage 实现），未提供时按 db_path 创建 VehicleDB
+        """
         # 初始化数据库连接
-        self.db = VehicleDB()
-        if db_path:
-            self.db.initialize(db_path)
+        if db is not None:
+            self.db = db
         else:
-            self.db.initialize()  # 使用默认路径
+            self.db = VehicleDB()
+            if db_path:
+                self.db.initialize(db_path)
+            else:
+                self.db.initialize()  # 使用默认路径
         
         # MQTT配置
         self.mqtt_broker = mqtt_broker
@@ -75,14 +84,15 @@ class MqttJsonVehicleWriter:
             vehicle_id = data['vehicle_id'].strip()
             sensor_id_str = data['sensor_id'].strip()
             
-            # 验证传感器是否存在
-            sensor_id = self.get_sensor_id_by_sensor_id(sensor_id_str)
-            if sensor_id is None:
+            # 验证传感器是否存在（查询进程内传感器缓存，无需访问数据库）
+            sensor = self.db.lookup_sensor(sensor_id_str)
+            if sensor is None:
                 print(f"警告: 传感器ID {sensor_id_str} 不存在，忽略该消息")
                 return
+            sensor_id, is_active, _ = sensor
             
             # 验证传感器是否激活
-            if not self.is_sensor_active(sensor_id_str):
+            if not is_active:
                 print(f"警告: 传感器ID {sensor_id_str} 未激活，忽略该消息")
                 return
             
@@ -115,11 +125,8 @@ class MqttJsonVehicleWriter:
     def get_sensor_id_by_sensor_id(self, sensor_id_str: str) -> int:
         """通过传感器ID字符串获取数据库中的传感器ID"""
         try:
-            # 获取传感器详情
-            success, sensor_data = self.db.get_sensor_status(sensor_id_str)
-            if success and sensor_data:
-                return sensor_data['id']
-            return None
+            sensor = self.db.lookup_sensor(sensor_id_str)
+            return sensor[0] if sensor else None
         except Exception as e:
             print(f"查询传感器ID时出错: {str(e)}")
             return None
@@ -127,8 +134,8 @@ class MqttJsonVehicleWriter:
     def is_sensor_active(self, sensor_id_str: str) -> bool:
         """检查传感器是否处于激活状态"""
         try:
-            success, sensor_data = self.db.get_sensor_status(sensor_id_str)
-            return success and sensor_data and sensor_data['is_active']
+            sensor = self.db.lookup_sensor(sensor_id_str)
+            return bool(sensor and sensor[1])
         except Exception as e:
             print(f"检查传感器状态时出错: {str(e)}")
             return False
@@ -0,0 +1,182 @@
+import json
+import os
+import struct
+import sys
+import zlib
+import calendar
+from array import array
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Tuple, Sequence, Optional
+
+# 归档段文件格式 PVA2（按车辆分块，块内按列存储）：
+#   MAGIC + 各车辆的数据块 + 目录JSON + 目录长度(uint32, 小端)
+# 目录为 [[车辆ID, 块偏移, 块长度], ...]，偏移和长度同时写入 passage_archive_vehicles，
+# 按车辆查询时只读取并解压该车辆的数据块。每个数据块为
+#   zlib( 头部长度(uint32, 小端) + 头部JSON + 4个int64列 )
+# 头部记录行数及传感器ID字典；各列依次为：
+#   id（差分）、传感器字典下标、通行时间（秒级时间戳，差分）、创建时间相对通行时间的偏移
+# 块内行按 (passage_time, id) 升序排列，差分后数值很小，压缩率高
+# 旧格式 PVA1（整段一次压缩，车辆ID也字典编码，列为 id、车辆下标、传感器下标、时间、偏移）仍可读取
+ARCHIVE_MAGIC = b"PVA2"
+_PVA1_MAGIC = b"PVA1"
+ARCHIVE_SUFFIX = ".pva"
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _to_epoch(value: str) -> int:
+    # 时间字符串不含时区，按UTC换算仅用于编码，解码时原样还原
+    return calendar.timegm(datetime.strptime(value, _TIME_FORMAT).timetuple())
+
+def _from_epoch(value: int) -> str:
+    return datetime.fromtimestamp(value, timezone.utc).strftime(_TIME_FORMAT)
+
+def _delta(values: List[int]) -> List[int]:
+    return [v - prev for prev, v in zip([0] + values[:-1], values)]
+
+def _undelta(values: Sequence[int]) -> List[int]:
+    result, total = [], 0
+    for v in values:
+        total += v
+        result.append(total)
+    return result
+
+def _column_bytes(values: List[int]) -> bytes:
+    column = array('q', values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+
+def _column_from_bytes(data: bytes) -> array:
+    column = array('q')
+    column.frombytes(data)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+def _read_columns(body: bytes) -> Tuple[Dict[str, Any], List[array]]:
+    """解析 头部长度 + 头部JSON + int64列，返回 (头部, 各列)"""
+    header_len = struct.unpack_from("<I", body)[0]
+    header = json.loads(body[4:4 + header_len].decode('utf-8'))
+    size = header["count"] * 8
+    columns = []
+    offset = 4 + header_len
+    while offset < len(body):
+        columns.append(_column_from_bytes(body[offset:offset + size]))
+        offset += size
+    return header, columns
+
+def _encode_block(rows: Sequence[Tuple[int, str, int, str, str]]) -> bytes:
+    """编码一辆车的记录（已按 (passage_time, id) 排序）"""
+    sensors = sorted({r[2] for r in rows})
+    sensor_index = {s: i for i, s in enumerate(sensors)}
+    times = [_to_epoch(r[3]) for r in rows]
+    columns = [
+        _delta([r[0] for r in rows]),
+        [sensor_index[r[2]] for r in rows],
+        _delta(times),
+        [_to_epoch(r[4]) - t if r[4] else 0 for r, t in zip(rows, times)],
+    ]
+    header = json.dumps({"count": len(rows), "sensors": sensors}).encode('utf-8')
+    body = struct.pack("<I", len(header)) + header + b"".join(_column_bytes(c) for c in columns)
+    return zlib.compress(body, 9)
+
+def _decode_block(vehicle_id: str, data: bytes) -> List[Tuple[int, str, int, str, str]]:
+    header, columns = _read_columns(zlib.decompress(data))
+    ids = _undelta(columns[0])
+    times = _undelta(columns[2])
+    sensors = header["sensors"]
+    return [
+        (ids[i], vehicle_id, sensors[columns[1][i]], _from_epoch(times[i]), _from_epoch(times[i] + columns[3][i]))
+        for i in range(header["count"])
+    ]
+
+def _decode_pva1(data: bytes) -> List[Tuple[int, str, int, str, str]]:
+    header, columns = _read_columns(zlib.decompress(data[len(_PVA1_MAGIC):]))
+    ids = _undelta(columns[0])
+    times = _undelta(columns[3])
+    vehicles, sensors = header["vehicles"], header["sensors"]
+    return [
+        (ids[i], vehicles[columns[1][i]], sensors[columns[2][i]],
+         _from_epoch(times[i]), _from_epoch(times[i] + columns[4][i]))
+        for i in range(header["count"])
+    ]
+
+def _encode_segment(rows: Sequence[Tuple[int, str, int, str, str]]) -> Tuple[bytes, Dict[str, Tuple[int, int]]]:
+    rows = sorted(rows, key=lambda r: (r[3], r[0]))
+    by_vehicle = {}
+    for row in rows:
+        by_vehicle.setdefault(row[1], []).append(row)
+    parts, blocks, offset = [ARCHIVE_MAGIC], {}, len(ARCHIVE_MAGIC)
+    for vehicle_id in sorted(by_vehicle):
+        block = _encode_block(by_vehicle[vehicle_id])
+        parts.append(block)
+        blocks[vehicle_id] = (offset, len(block))
+        offset += len(block)
+    directory = json.dumps([[v, o, n] for v, (o, n) in blocks.items()], ensure_ascii=False).encode('utf-8')
+    parts += [directory, struct.pack("<I", len(directory))]
+    return b"".join(parts), blocks
+
+def encode_segment(rows: Sequence[Tuple[int, str, int, str, str]]) -> bytes:
+    """将通行记录 (id, vehicle_id, sensor_id, passage_time, created_at) 编码为归档段"""
+    return _encode_segment(rows)[0]
+
+def decode_segment(data: bytes) -> List[Tuple[int, str, int, str, str]]:
+    """解码整个归档段，返回按 (passage_time, id) 升序的记录元组"""
+    if data[:len(_PVA1_MAGIC)] == _PVA1_MAGIC:
+        return _decode_pva1(data)
+    if data[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+        raise ValueError("归档文件格式无效")
+    directory_len = struct.unpack("<I", data[-4:])[0]
+    rows = []
+    for vehicle_id, offset, length in json.loads(data[-4 - directory_len:-4].decode('utf-8')):
+        rows += _decode_block(vehicle_id, data[offset:offset + length])
+    rows.sort(key=lambda r: (r[3], r[0]))
+    return rows
+
+def archive_dir(db_path: str) -> str:
+    """数据库对应的归档目录"""
+    return db_path + ".archive"
+
+def write_segment(directory: str, name: str,
+                  rows: Sequence[Tuple[int, str, int, str, str]]) -> Tuple[int, Dict[str, Tuple[int, int]]]:
+    """写入归档段文件（先写临时文件再原子替换），返回文件字节数及各车辆数据块的 (偏移, 长度)"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + ARCHIVE_SUFFIX)
+    data, blocks = _encode_segment(rows)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+    return len(data), blocks
+
+def remove_segment(directory: str, name: str) -> None:
+    path = os.path.join(directory, name + ARCHIVE_SUFFIX)
+    if os.path.exists(path):
+        os.remove(path)
+
+def read_segment(directory: str, name: str) -> List[Tuple[int, str, int, str, str]]:
+    """读取并解码整个归档段（按月重建汇总等全量读取使用，不缓存）"""
+    with open(os.path.join(directory, name + ARCHIVE_SUFFIX), "rb") as f:
+        return decode_segment(f.read())
+
+def read_vehicle_rows(directory: str, name: str, vehicle_id: str, offset: Optional[int],
+                      length: Optional[int]) -> List[Tuple[int, str, int, str, str]]:
+    """读取段中一辆车的记录：只读取并解压该车辆的数据块，按 (passage_time, id) 升序
+
+    offset 为空表示旧格式段（无分块），解码整段后筛选
+    """
+    if offset is None:
+        return [row for row in read_segment(directory, name) if row[1] == vehicle_id]
+    with open(os.path.join(directory, name + ARCHIVE_SUFFIX), "rb") as f:
+        f.seek(offset)
+        return _decode_block(vehicle_id, f.read(length))
+
+def segment_summary(rows: Sequence[Tuple[int, str, int, str, str]]) -> Dict[str, Dict[str, Any]]:
+    """按车辆统计段内记录数和时间范围，写入索引表供查询时筛选段文件"""
+    summary = {}
+    for row in rows:
+        item = summary.setdefault(row[1], {"records": 0, "min_time": row[3], "max_time": row[3]})
+        item["records"] += 1
+        item["min_time"] = min(item["min_time"], row[3])
+        item["max_time"] = max(item["max_time"], row[3])
+    return summary
@@ -0,0 +1,194 @@
+import threading
+import time
+from typing import Tuple, Dict, Any, Optional, Callable
+from vehicle_db import VehicleDB, _raise_if_busy
+
+class PassagePurgeJob:
+    """分批清理早于截止时间的通行记录，可在后台运行并在重启后续传
+
+    按表依次处理（原表在前，分区由旧到新）：整月早于截止时间的分区直接删除，
+    其余表按自增ID区间分批删除，每批一个短事务，批次之间暂停以让出写锁。
+    进度保存在 purge_jobs 表中，同名任务以相同截止时间再次运行时从上次位置继续。
+    全部完成后执行 incremental_vacuum 回收磁盘空间。
+    """
+
+    def __init__(self, db: VehicleDB, cutoff: str, name: str = "passage_purge",
+                 batch_size: int = 1000, pause: float = 0.05, vacuum_pages: int = 1000,
+                 progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.db = db
+        self.cutoff = cutoff
+        self.name = name
+        self.batch_size = max(1, int(batch_size))
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.progress = progress
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.result = None
+
+    def start(self) -> None:
+        """在后台线程中运行"""
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run_in_thread, name=f"purge-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """在当前批次结束后暂停，进度已保存，之后可再次运行续传"""
+        self.stop_event.set()
+        if wait and self.thread is not None:
+            self.thread.join()
+
+    def _run_in_thread(self) -> None:
+        try:
+            self.result = self.run()
+        finally:
+            self.db.close_thread_resources()
+
+    def run(self) -> Tuple[bool, Any]:
+        """同步运行至完成或被停止，返回 (是否成功, 进度信息/错误信息)"""
+        success, state = self._load_or_create_state()
+        if not success:
+            return (False, state)
+
+        while not self.stop_event.is_set():
+            success, state = self.db._execute_write(lambda: self._run_batch(state))
+            if not success:
+                return (False, state)
+            self._report(state)
+            if state['status'] == 'done':
+                break
+            time.sleep(self.pause)
+
+        if state['status'] != 'done':
+            return (True, state)
+
+        success, vacuum = self.db.incremental_vacuum(self.vacuum_pages, self.pause)
+        state['freed_pages'] = vacuum['freed_pages'] if success else 0
+        self._report(state)
+        return (True, state)
+
+    def _report(self, state: Dict[str, Any]) -> None:
+        if self.progress:
+            self.progress(dict(state))
+
+    def _load_or_create_state(self) -> Tuple[bool, Any]:
+        def operation():
+            cursor = self.db._get_thread_cursor()
+            try:
+                cursor.execute("SELECT * FROM purge_jobs WHERE name = ?", (self.name,))
+                row = cursor.fetchone()
+                if row and row['cutoff'] == self.cutoff and row['status'] == 'running':
+                    return (True, dict(row))
+                # 新任务或截止时间变化时从头开始
+                cursor.execute(
+                    """INSERT INTO purge_jobs (name, cutoff, source, last_id, max_id, deleted, status)
+                       VALUES (?, ?, NULL, 0, 0, 0, 'running')
+                       ON CONFLICT (name) DO UPDATE SET cutoff = excluded.cutoff, source = NULL,
+                           last_id = 0, max_id = 0, deleted = 0, status = 'running',
+                           started_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP, finished_at = NULL""",
+                    (self.name, self.cutoff)
+                )
+                self.db._commit()
+                cursor.execute("SELECT * FROM purge_jobs WHERE name = ?", (self.name,))
+                return (True, dict(cursor.fetchone()))
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"创建清理任务失败: {str(e)}")
+
+        return self.db._execute_write(operation)
+
+    @staticmethod
+    def _source_order(table: Optional[str]) -> str:
+        """处理顺序：原表在前，分区按表名（即月份）由旧到新"""
+        return "" if table == "passage_records" else table
+
+    def _next_source(self, cursor, current: Optional[str]) -> Optional[str]:
+        """返回current之后待处理的表，跳过起始时间不早于截止时间的分区"""
+        candidates = []
+        for table in self.db._passage_sources(cursor):
+            month = self.db._partition_month(table)
+            if month is not None and f"{month}-01 00:00:00" >= self.cutoff:
+                continue
+            if current is None or self._source_order(table) > self._source_order(current):
+                candidates.append(table)
+        return min(candidates, key=self._source_order) if candidates else None
+
+    def _run_batch(self, state: Dict[str, Any]) -> Tuple[bool, Any]:
+        """处理一个批次并保存进度（在写事务中执行）"""
+        # 在副本上推进进度，事务因锁冲突重试时从原进度重新开始
+        state = dict(state)
+        cursor = self.db._get_thread_cursor()
+        try:
+            if state['source'] is None:
+                state['source'] = self._next_source(cursor, None)
+                if state['source'] is not None:
+                    # 记录开始处理时的ID上界，之后写入的新记录不在清理范围内
+                    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {state['source']}")
+                    state['last_id'], state['max_id'] = 0, cursor.fetchone()[0]
+
+            source = state['source']
+            month = self.db._partition_month(source) if source else None
+            if source is None:
+                state['status'] = 'done'
+            elif source not in self.db._passage_sources(cursor):
+                # 分区已在暂停期间被删除
+                state['last_id'] = state['max_id']
+            elif month is not None and self.db._month_end(month) < self.cutoff:
+                # 整个分区早于截止时间，直接删除分区
+                state['deleted'] += self.db._drop_partition(cursor, source)
+                state['last_id'] = state['max_id']
+            else:
+                # 跳过ID空洞，删除下一段ID区间内早于截止时间的记录
+                cursor.execute(f"SELECT MIN(id) FROM {source} WHERE id > ?", (state['last_id'],))
+                next_id = cursor.fetchone()[0]
+                if next_id is None or next_id > state['max_id']:
+                    state['last_id'] = state['max_id']
+                else:
+                    upper = min(next_id + self.batch_size - 1, state['max_id'])
+                    cursor.execute(
+                        f"DELETE FROM {source} WHERE id BETWEEN ? AND ? AND passage_time < ?",
+                        (next_id, upper, self.cutoff)
+                    )
+                    state['deleted'] += cursor.rowcount
+                    state['last_id'] = upper
+
+            if source is not None and state['last_id'] >= state['max_id']:
+                # 当前表处理完毕，切换到下一张表
+                state['source'] = self._next_source(cursor, source)
+                state['last_id'], state['max_id'] = 0, 0
+                if state['source'] is None:
+                    state['status'] = 'done'
+                else:
+                    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {state['source']}")
+                    state['max_id'] = cursor.fetchone()[0]
+
+            cursor.execute(
+                """UPDATE purge_jobs SET source = ?, last_id = ?, max_id = ?, deleted = ?, status = ?,
+                       updated_at = CURRENT_TIMESTAMP,
+                       finished_at = CASE WHEN ? = 'done' THEN CURRENT_TIMESTAMP ELSE NULL END
+                   WHERE name = ?""",
+                (state['source'], state['last_id'], state['max_id'], state['deleted'], state['status'],
+                 state['status'], self.name)
+            )
+            self.db._commit()
+            return (True, state)
+        except Exception as e:
+            self.db._rollback()
+            _raise_if_busy(e)
+            return (False, f"清理失败: {str(e)}")
+
+def get_purge_status(db: VehicleDB, name: str = "passage_purge") -> Tuple[bool, Any]:
+    """查询清理任务进度"""
+    def operation():
+        cursor = db._get_read_cursor()
+        try:
+            cursor.execute("SELECT * FROM purge_jobs WHERE name = ?", (name,))
+            row = cursor.fetchone()
+            if not row:
+                return (False, "清理任务不存在")
+            return (True, dict(row))
+        except Exception as e:
+            _raise_if_busy(e)
+            return (False, f"查询失败: {str(e)}")
+
+    return db._retry_operation(operation)
@@ -0,0 +1,329 @@
+import heapq
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Tuple, List, Dict, Any, Optional, Sequence
+from storage import VehicleStorage
+from vehicle_db import VehicleDB, decode_page_cursor, _raise_if_busy
+
+# 分片间复制的表及其全部列（以目录库为准）
+_REPLICATED_COLUMNS = {
+    "users": ("id", "name", "password", "is_admin", "created_at", "updated_at"),
+    "sensors": ("id", "sensor_id", "location", "description", "is_active", "is_gate", "created_at", "updated_at"),
+}
+
+class ShardedVehicleDB(VehicleStorage):
+    """按 vehicle_id 哈希分片的车辆数据库，接口与 VehicleDB 一致
+
+    目录库（db_path）保存用户和传感器的权威数据及分片数；每个分片是一个独立的
+    VehicleDB 文件，保存其车辆和通行记录，并持有用户和传感器的副本（ID与目录库相同）。
+    各分片有独立的写锁，不同车辆的写入可并行提交。跨分片的列表查询并行查询各分片后
+    归并排序。通行记录ID按分片加上不同的基数，在分片之间唯一，游标分页照常使用。
+    """
+
+    MAX_SHARDS = 127
+
+    def __init__(self):
+        self.catalog = VehicleDB()
+        self.shards: List[VehicleDB] = []
+        self.executor = None
+        self.lock = threading.Lock()
+        self.initialized = False
+
+    @staticmethod
+    def shard_path(db_path: str, index: int) -> str:
+        root, ext = os.path.splitext(db_path)
+        return f"{root}.shard{index}{ext or '.db'}"
+
+    def initialize(self, db_path: str = "vehicle_db.db", shards: int = 4, profile: Any = "durable",
+                   pragmas: Optional[Dict[str, Any]] = None) -> bool:
+        """初始化目录库和各分片，分片数首次初始化后保存在目录库中，之后不可更改"""
+        with self.lock:
+            if self.initialized:
+                return True
+            if not 1 <= shards <= self.MAX_SHARDS:
+                print(f"初始化数据库失败: 分片数应在1到{self.MAX_SHARDS}之间")
+                return False
+            if not self.catalog.initialize(db_path, profile, pragmas):
+                return False
+
+            success, stored = self.catalog.get_setting("shard_count")
+            if not success:
+                print(f"初始化数据库失败: {stored}")
+                return False
+            if stored is None:
+                self.catalog.set_setting("shard_count", str(shards))
+            elif int(stored) != shards:
+                # 分片数变化会改变车辆所在分片，需迁移数据，不允许直接修改
+                print(f"初始化数据库失败: 数据库已按 {stored} 个分片创建，与指定的 {shards} 不一致")
+                return False
+
+            self.shards = []
+            for index in range(shards):
+                shard = VehicleDB()
+                shard.id_base = (index + 1) << 56
+                if not shard.initialize(self.shard_path(db_path, index), profile, pragmas):
+                    return False
+                self.shards.append(shard)
+
+            for table in _REPLICATED_COLUMNS:
+                success, message = self._sync_table(table)
+                if not success:
+                    print(f"初始化数据库失败: {message}")
+                    return False
+
+            self.executor = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="shard")
+            self.initialized = True
+            return True
+
+    def close(self) -> None:
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+            for shard in self.shards:
+                shard.close()
+            self.catalog.close()
+            self.initialized = False
+
+    def close_thread_resources(self) -> None:
+        """关闭当前线程在目录库和各分片上的连接"""
+        self.catalog.close_thread_resources()
+        for shard in self.shards:
+            shard.close_thread_resources()
+
+    @contextmanager
+    def read_session(self, timeout: Optional[float] = 5.0):
+        """目录库查询使用只读连接池（分片查询在分片线程池中执行）"""
+        with self.catalog.read_session(timeout):
+            yield
+
+    def reserve_read_connections(self, count: int) -> None:
+        self.catalog.reserve_read_connections(count)
+
+    def start_writer(self, **options) -> None:
+        """为每个分片和目录库分别启用单写线程"""
+        self.catalog.start_writer(**options)
+        for shard in self.shards:
+            shard.start_writer(**options)
+
+    def stop_writer(self) -> None:
+        self.catalog.stop_writer()
+        for shard in self.shards:
+            shard.stop_writer()
+
+    def enable_vehicle_state_table(self, **options) -> int:
+        """在各分片启用车辆状态写回缓存，返回恢复时重放过通行记录的车辆总数"""
+        return sum(shard.enable_vehicle_state_table(**options) for shard in self.shards)
+
+    def disable_vehicle_state_table(self) -> None:
+        for shard in self.shards:
+            shard.disable_vehicle_state_table()
+
+    # 分片路由与并行查询
+    def shard_for(self, vehicle_id: str) -> VehicleDB:
+        """按 vehicle_id 的 CRC32 选择分片（与进程无关，结果稳定）"""
+        return self.shards[zlib.crc32(str(vehicle_id).encode('utf-8')) % len(self.shards)]
+
+    def _fan_out(self, method: str, *args, **kwargs) -> List[Any]:
+        """在各分片上并行调用同名方法，按分片顺序返回结果"""
+        def call(shard):
+            try:
+                return getattr(shard, method)(*args, **kwargs)
+            finally:
+                shard.close_thread_resources()
+
+        return list(self.executor.map(call, self.shards))
+
+    @staticmethod
+    def _merge_pages(results: List[Tuple[bool, Any, Optional[int]]], key, reverse: bool,
+                     skip: int, limit: int) -> Tuple[bool, Any, Optional[int]]:
+        """合并各分片已排序的分页结果"""
+        for success, rows, _ in results:
+            if not success:
+                return (False, rows, 0)
+        totals = [total for _, _, total in results]
+        total = None if any(t is None for t in totals) else sum(totals)
+        merged = heapq.merge(*[rows for _, rows, _ in results], key=key, reverse=reverse)
+        return (True, list(merged)[skip:skip + limit], total)
+
+    # 用户与传感器（目录库为准，复制到各分片）
+    def _sync_table(self, table: str, where: str = "", params: Sequence[Any] = ()) -> Tuple[bool, str]:
+        """将目录库中表（或满足条件的行）的内容复制到各分片：更新或插入存在的行，删除已不存在的行"""
+        columns = _REPLICATED_COLUMNS[table]
+        cursor = self.catalog._get_thread_cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {table} {where}", params)
+            rows = [tuple(row) for row in cursor.fetchall()]
+        except Exception as e:
+            return (False, f"读取目录库失败: {str(e)}")
+        ids = {row[0] for row in rows}
+
+        def operation(shard):
+            shard_cursor = shard._get_thread_cursor()
+            try:
+                shard_cursor.execute(f"SELECT id FROM {table} {where}", params)
+                stale = [row[0] for row in shard_cursor.fetchall() if row[0] not in ids]
+                shard_cursor.executemany(f"DELETE FROM {table} WHERE id = ?", [(i,) for i in stale])
+                shard_cursor.executemany(
+                    f"""INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})
+                        ON CONFLICT (id) DO UPDATE SET
+                        {', '.join(f'{c} = excluded.{c}' for c in columns[1:])}""",
+                    rows
+                )
+                shard._commit()
+                return (True, "同步成功")
+            except Exception as e:
+                shard._rollback()
+                _raise_if_busy(e)
+                return (False, f"同步失败: {str(e)}")
+
+        for shard in self.shards:
+            success, message = shard._execute_write(lambda: operation(shard))
+            if not success:
+                return (False, message)
+            if table == "sensors":
+                shard.sensor_registry.invalidate()
+        return (True, "同步成功")
+
+    def add_user(self, name: str, password: str, is_admin: bool = False) -> Tuple[bool, str]:
+        result = self.catalog.add_user(name, password, is_admin)
+        if result[0]:
+            self._sync_table("users", "WHERE name = ?", (name,))
+        return result
+
+    def verify_user(self, name: str, password: str) -> Tuple[bool, int, bool]:
+        return self.catalog.verify_user(name, password)
+
+    def change_password(self, name: str, old_password: Optional[str], new_password: str) -> Tuple[bool, str]:
+        result = self.catalog.change_password(name, old_password, new_password)
+        if result[0]:
+            self._sync_table("users", "WHERE name = ?", (name,))
+        return result
+
+    def delete_user(self, name: str, password: Optional[str]) -> Tuple[bool, str]:
+        """在目录库校验并删除用户后，在各分片删除其副本及其登记的车辆"""
+        result = self.catalog.delete_user(name, password)
+        if result[0]:
+            self._fan_out("delete_user", name, None)
+        return result
+
+    def get_user_id_by_name(self, name: str) -> Tuple[bool, int]:
+        return self.catalog.get_user_id_by_name(name)
+
+    def get_users(self, *args, **kwargs) -> Tuple[bool, Any, Optional[int]]:
+        return self.catalog.get_users(*args, **kwargs)
+
+    def add_sensor(self, sensor_id: str, location: str, description: str = "",
+                   is_active: bool = True, is_gate: bool = False) -> Tuple[bool, str]:
+        result = self.catalog.add_sensor(sensor_id, location, description, is_active, is_gate)
+        if result[0]:
+            self._sync_table("sensors", "WHERE sensor_id = ?", (sensor_id,))
+        return result
+
+    def update_sensor_status(self, sensor_id: str, is_active: bool) -> Tuple[bool, str]:
+        result = self.catalog.update_sensor_status(sensor_id, is_active)
+        if result[0]:
+            self._sync_table("sensors", "WHERE sensor_id = ?", (sensor_id,))
+        return result
+
+    def delete_sensor(self, sensor_id: str) -> Tuple[bool, str]:
+        """先在各分片删除传感器副本及其通行记录，再从目录库删除"""
+        exists, _ = self.catalog.get_sensor_status(sensor_id)
+        if not exists:
+            return (False, "传感器不存在")
+        for success, message in self._fan_out("delete_sensor", sensor_id):
+            if not success and message != "传感器不存在":
+                return (False, message)
+        return self.catalog.delete_sensor(sensor_id)
+
+    def get_sensors(self, *args, **kwargs) -> Tuple[bool, Any, Optional[int]]:
+        return self.catalog.get_sensors(*args, **kwargs)
+
+    def get_sensor_status(self, sensor_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        return self.catalog.get_sensor_status(sensor_id)
+
+    def lookup_sensor(self, sensor_id: str) -> Optional[Tuple[int, bool, bool]]:
+        return self.catalog.lookup_sensor(sensor_id)
+
+    # 车辆与通行记录（按 vehicle_id 路由到分片）
+    def add_vehicle(self, vehicle_id: str, registered_by: Any, is_on_campus: bool = False) -> Tuple[bool, str]:
+        return self.shard_for(vehicle_id).add_vehicle(vehicle_id, registered_by, is_on_campus)
+
+    def delete_vehicle(self, vehicle_id: str) -> Tuple[bool, str]:
+        return self.shard_for(vehicle_id).delete_vehicle(vehicle_id)
+
+    def get_vehicle_status(self, vehicle_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        return self.shard_for(vehicle_id).get_vehicle_status(vehicle_id)
+
+    def add_passage_record(self, vehicle_id: str, sensor_id: int) -> Tuple[bool, str]:
+        return self.shard_for(vehicle_id).add_passage_record(vehicle_id, sensor_id)
+
+    def add_passage_records_bulk(self, events: Sequence[Tuple[str, int, Any]]) -> Tuple[bool, Any]:
+        """按分片拆分事件后并行写入，结果按原事件顺序返回"""
+        groups = {}
+        results = [(False, "事件格式无效")] * len(events)
+        for position, event in enumerate(events):
+            if len(event) == 3:
+                groups.setdefault(self.shard_for(event[0]), []).append(position)
+
+        def call(item):
+            shard, positions = item
+            try:
+                return shard.add_passage_records_bulk([events[p] for p in positions])
+            finally:
+                shard.close_thread_resources()
+
+        items = list(groups.items())
+        for (shard, positions), (success, shard_results) in zip(items, self.executor.map(call, items)):
+            if not success:
+                # 其他分片的事务可能已提交，返回失败信息由调用方重试该批次
+                return (False, shard_results)
+            for position, result in zip(positions, shard_results):
+                results[position] = result
+        return (True, results)
+
+    def get_passage_by_vehicle(self, vehicle_id: str, *args, **kwargs) -> Tuple[bool, Any, Optional[int]]:
+        return self.shard_for(vehicle_id).get_passage_by_vehicle(vehicle_id, *args, **kwargs)
+
+    def get_vehicles(self, limit: int = 20, offset: int = 0, after: Optional[str] = None,
+                     with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        """并行查询各分片的前 offset+limit 辆车，按车辆ID归并后分页"""
+        if after is not None and decode_page_cursor("vehicles", after) is None:
+            return (False, "无效的分页游标", 0)
+        skip = 0 if after is not None else offset
+        results = self._fan_out("get_vehicles", skip + limit, 0, after=after, with_total=with_total)
+        return self._merge_pages(results, lambda v: v['vehicle_id'], False, skip, limit)
+
+    def get_passage_by_sensor(self, sensor_id: int, limit: int = 20, offset: int = 0,
+                              after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        """并行查询各分片中该传感器的通行记录，按 (passage_time, id) 倒序归并后分页"""
+        skip = 0 if after is not None else offset
+        results = self._fan_out("get_passage_by_sensor", sensor_id, skip + limit, 0,
+                                after=after, with_total=with_total)
+        return self._merge_pages(results, lambda r: (r['passage_time'], r['id']), True, skip, limit)
+
+    def get_passages_by_time(self, start_time: str, end_time: str, limit: int = 20, offset: int = 0,
+                             after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        """并行查询各分片时间范围内的通行记录，按 (passage_time, id) 倒序归并后分页"""
+        skip = 0 if after is not None else offset
+        results = self._fan_out("get_passages_by_time", start_time, end_time, skip + limit, 0,
+                                after=after, with_total=with_total)
+        return self._merge_pages(results, lambda r: (r['passage_time'], r['id']), True, skip, limit)
+
+    def enable_passage_partitioning(self) -> Tuple[bool, str]:
+        """在各分片启用通行记录按月分区"""
+        for success, message in self._fan_out("enable_passage_partitioning"):
+            if not success:
+                return (False, message)
+        return (True, "已启用通行记录按月分区")
+
+    def get_campus_occupancy(self) -> Tuple[bool, Any]:
+        """各分片在校车辆数之和"""
+        results = self._fan_out("get_campus_occupancy")
+        for success, value in results:
+            if not success:
+                return (False, value)
+        return (True, sum(value for _, value in results))
@@ -3,22 +3,43 @@ import time
 from http_user_server import run_user_server
 from http_login_server import run_login_server
 from http_admin_server import run_admin_server
+from http_gateway import run_gateway, GATEWAY_LISTENERS
 from mqtt_server import MqttJsonVehicleWriter
+from db_backup import DatabaseBackup, BackupScheduler
+
+# 在线备份配置：数据库文件、备份间隔（秒）及保留的备份数量
+DB_PATH = "vehicle_db.db"
+BACKUP_INTERVAL = 6 * 3600
+BACKUP_KEEP = 7
+
+# HTTP服务器并发配置：每个服务器的工作线程数、等待队列长度及请求超时（秒）
+HTTP_MAX_WORKERS = 16
+HTTP_QUEUE_SIZE = 64
+HTTP_REQUEST_TIMEOUT = 30
+
+# 使用单进程asyncio网关代替三个独立的HTTP服务器；监听端口及各端口提供的接口见 GATEWAY_LISTENERS
+USE_HTTP_GATEWAY = True
+HTTP_KEEPALIVE_TIMEOUT = 75
 
 def start_http_user_server():
     """启动用户HTTP服务器"""
     print("准备启动用户服务器...")
-    run_user_server()
+    run_user_server(HTTP_MAX_WORKERS, HTTP_QUEUE_SIZE, HTTP_REQUEST_TIMEOUT)
 
 def start_http_login_server():
     """启动登录HTTP服务器"""
     print("准备启动登录服务器...")
-    run_login_server()
+    run_login_server(HTTP_MAX_WORKERS, HTTP_QUEUE_SIZE, HTTP_REQUEST_TIMEOUT)
 
 def start_http_admin_server():
     """启动管理员HTTP服务器"""
     print("准备启动管理员服务器...")
-    run_admin_server()
+    run_admin_server(HTTP_MAX_WORKERS, HTTP_QUEUE_SIZE, HTTP_REQUEST_TIMEOUT)
+
+def start_http_gateway():
+    """启动HTTP网关（同时提供登录、管理员、用户接口）"""
+    print("准备启动HTTP网关...")
+    run_gateway(GATEWAY_LISTENERS, HTTP_MAX_WORKERS, HTTP_QUEUE_SIZE, HTTP_REQUEST_TIMEOUT, HTTP_KEEPALIVE_TIMEOUT)
 
 def start_mqtt_server():
     """启动MQTT服务器"""
@@ -43,14 +64,18 @@ def start_mqtt_server():
         print(f"MQTT服务器启动失败: {str(e)}")
 
 if __name__ == "__main__":
+    backup_scheduler = BackupScheduler(DatabaseBackup(DB_PATH, keep=BACKUP_KEEP), BACKUP_INTERVAL)
     try:
-        # 创建线程分别启动四个服务
-        threads = [
-            threading.Thread(target=start_http_user_server, daemon=True),
-            threading.Thread(target=start_http_login_server, daemon=True),
-            threading.Thread(target=start_http_admin_server, daemon=True),
-            threading.Thread(target=start_mqtt_server, daemon=True)
-        ]
+        # 创建线程分别启动HTTP服务和MQTT服务
+        if USE_HTTP_GATEWAY:
+            threads = [threading.Thread(target=start_http_gateway, daemon=True)]
+        else:
+            threads = [
+                threading.Thread(target=start_http_user_server, daemon=True),
+                threading.Thread(target=start_http_login_server, daemon=True),
+                threading.Thread(target=start_http_admin_server, daemon=True)
+            ]
+        threads.append(threading.Thread(target=start_mqtt_server, daemon=True))
         
         # 启动所有线程
         for thread in threads:
@@ -58,6 +83,9 @@ if __name__ == "__main__":
             # 稍微延迟避免同时启动的资源竞争
             time.sleep(0.5)
         
+        # 定时在线备份数据库，不影响MQTT写入
+        backup_scheduler.start()
+        
         print("所有服务已启动，按Ctrl+C停止...")
         
         # 主线程保持运行
@@ -65,4 +93,5 @@ if __name__ == "__main__":
             time.sleep(1)
     except KeyboardInterrupt:
         print("\n正在停止所有服务...")
+        backup_scheduler.stop()
         print("所有服务已停止")
\ No newline at end of file
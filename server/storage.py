@@ -0,0 +1,122 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from importlib import import_module
+from typing import Tuple, Dict, Any, Optional, Sequence
+
+class VehicleStorage(ABC):
+    """车辆数据存储接口，HTTP服务器和MQTT写入器只依赖本接口
+
+    返回值约定与 VehicleDB 相同：写操作返回 (是否成功, 结果信息)，列表查询返回
+    (是否成功, 数据/错误信息, 总数)，分页游标由 vehicle_db.next_page_cursor 生成。
+    """
+
+    # 生命周期
+    @abstractmethod
+    def initialize(self, db_path: str = "vehicle_db.db", *args, **kwargs) -> bool:
+        """初始化存储，返回是否成功"""
+
+    @abstractmethod
+    def close(self) -> None:
+        """关闭存储"""
+
+    def close_thread_resources(self) -> None:
+        """释放当前线程占用的资源（无线程资源的实现可不覆盖）"""
+
+    @contextmanager
+    def read_session(self, timeout: Optional[float] = 5.0):
+        """在上下文期间为当前线程准备查询资源（默认不做任何处理）"""
+        yield
+
+    def reserve_read_connections(self, count: int) -> None:
+        """为count个并发请求预留查询资源，负数取消预留（默认不做任何处理）"""
+
+    # 用户
+    @abstractmethod
+    def add_user(self, name: str, password: str, is_admin: bool = False) -> Tuple[bool, str]: ...
+
+    @abstractmethod
+    def verify_user(self, name: str, password: str) -> Tuple[bool, int, bool]: ...
+
+    @abstractmethod
+    def change_password(self, name: str, old_password: Optional[str], new_password: str) -> Tuple[bool, str]: ...
+
+    @abstractmethod
+    def delete_user(self, name: str, password: Optional[str]) -> Tuple[bool, str]: ...
+
+    @abstractmethod
+    def get_user_id_by_name(self, name: str) -> Tuple[bool, int]: ...
+
+    @abstractmethod
+    def get_users(self, limit: int = 20, offset: int = 0, after: Optional[str] = None,
+                  with_total: bool = True) -> Tuple[bool, Any, Optional[int]]: ...
+
+    # 传感器
+    @abstractmethod
+    def add_sensor(self, sensor_id: str, location: str, description: str = "",
+                   is_active: bool = True, is_gate: bool = False) -> Tuple[bool, str]: ...
+
+    @abstractmethod
+    def update_sensor_status(self, sensor_id: str, is_active: bool) -> Tuple[bool, str]: ...
+
+    @abstractmethod
+    def delete_sensor(self, sensor_id: str) -> Tuple[bool, str]: ...
+
+    @abstractmethod
+    def get_sensors(self, limit: int = 20, offset: int = 0, after: Optional[str] = None,
+                    with_total: bool = True) -> Tuple[bool, Any, Optional[int]]: ...
+
+    @abstractmethod
+    def get_sensor_status(self, sensor_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]: ...
+
+    @abstractmethod
+    def lookup_sensor(self, sensor_id: str) -> Optional[Tuple[int, bool, bool]]: ...
+
+    # 车辆
+    @abstractmethod
+    def add_vehicle(self, vehicle_id: str, registered_by: Any, is_on_campus: bool = False) -> Tuple[bool, str]: ...
+
+    @abstractmethod
+    def delete_vehicle(self, vehicle_id: str) -> Tuple[bool, str]: ...
+
+    @abstractmethod
+    def get_vehicles(self, limit: int = 20, offset: int = 0, after: Optional[str] = None,
+                     with_total: bool = True) -> Tuple[bool, Any, Optional[int]]: ...
+
+    @abstractmethod
+    def get_vehicle_status(self, vehicle_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]: ...
+
+    @abstractmethod
+    def get_campus_occupancy(self) -> Tuple[bool, Any]: ...
+
+    # 通行记录
+    @abstractmethod
+    def add_passage_record(self, vehicle_id: str, sensor_id: int) -> Tuple[bool, str]: ...
+
+    @abstractmethod
+    def add_passage_records_bulk(self, events: Sequence[Tuple[str, int, Any]]) -> Tuple[bool, Any]: ...
+
+    @abstractmethod
+    def get_passage_by_vehicle(self, vehicle_id: str, limit: int = 20, offset: int = 0,
+                               after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]: ...
+
+    @abstractmethod
+    def get_passage_by_sensor(self, sensor_id: int, limit: int = 20, offset: int = 0,
+                              after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]: ...
+
+    @abstractmethod
+    def get_passages_by_time(self, start_time: str, end_time: str, limit: int = 20, offset: int = 0,
+                             after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]: ...
+
+# 存储引擎名称 -> "模块.类名"，按需导入
+STORAGE_BACKENDS = {
+    "sqlite": "vehicle_db.VehicleDB",
+    "sharded": "sharded_vehicle_db.ShardedVehicleDB",
+    "memory": "memory_store.MemoryVehicleDB",
+}
+
+def create_storage(backend: str = "sqlite") -> VehicleStorage:
+    """按名称创建（未初始化的）存储实例"""
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"未知的存储引擎: {backend}")
+    module_name, class_name = STORAGE_BACKENDS[backend].rsplit(".", 1)
+    return getattr(import_module(module_name), class_name)()
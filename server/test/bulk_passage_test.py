@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+from datetime import datetime
+
+class TestBulkPassage(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_bulk_passage_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.assertTrue(self.db.add_vehicle("TEST001", "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_vehicle("TEST002", "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        self.assertTrue(self.db.add_sensor("SENSOR001", "停车场A区", "普通传感器", True, False)[0], "添加传感器失败")
+        _, gate = self.db.get_sensor_status("GATE001")
+        _, sensor = self.db.get_sensor_status("SENSOR001")
+        self.gate_id = gate["id"]
+        self.sensor_id = sensor["id"]
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def test_gate_toggles_in_event_order(self):
+        """测试校门事件按顺序反转在校状态"""
+        events = [
+            ("TEST001", self.gate_id, "2024-05-01 08:00:00"),
+            ("TEST002", self.gate_id, "2024-05-01 08:00:05"),
+            ("TEST001", self.sensor_id, "2024-05-01 08:10:00"),
+            ("TEST001", self.gate_id, datetime(2024, 5, 1, 18, 0, 0)),
+        ]
+        success, results = self.db.add_passage_records_bulk(events)
+        self.assertTrue(success, results)
+        self.assertTrue(all(ok for ok, _ in results))
+
+        _, status1 = self.db.get_vehicle_status("TEST001")
+        _, status2 = self.db.get_vehicle_status("TEST002")
+        self.assertFalse(status1["is_on_campus"], "TEST001进出各一次后应在校外")
+        self.assertTrue(status2["is_on_campus"], "TEST002进入后应在校内")
+
+        _, records, total = self.db.get_passage_by_vehicle("TEST001")
+        self.assertEqual(total, 3)
+        self.assertEqual(records[0]["passage_time"], "2024-05-01 18:00:00")
+
+    def test_rejects_reported_per_event(self):
+        """测试无效事件单独报告且不影响其他事件"""
+        events = [
+            ("TEST001", self.gate_id, None),
+            ("INVALID001", self.gate_id, None),
+            ("TEST001", 9999, None),
+            ("TEST002", self.gate_id, "not a time"),
+            ("TEST002",),
+        ]
+        success, results = self.db.add_passage_records_bulk(events)
+        self.assertTrue(success, results)
+        self.assertEqual(results[0], (True, "通行记录添加成功"))
+        self.assertEqual(results[1], (False, "车辆不存在"))
+        self.assertEqual(results[2], (False, "传感器不存在"))
+        self.assertEqual(results[3], (False, "时间格式无效"))
+        self.assertEqual(results[4], (False, "事件格式无效"))
+        self.assertEqual(self.db.get_passage_by_sensor(self.gate_id)[2], 1)
+
+if __name__ == "__main__":
+    unittest.main()
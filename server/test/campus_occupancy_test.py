@@ -0,0 +1,102 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+import sqlite3
+from vehicle_db import VehicleDB
+
+class FailingOutboxDB(VehicleDB):
+    """fail 为真时写入发件箱失败（通行记录、汇总和计数已在同一事务中写入）"""
+    fail = False
+
+    def _append_outbox(self, cursor, events):
+        if self.fail:
+            raise sqlite3.IntegrityError("发件箱写入失败")
+        super()._append_outbox(cursor, events)
+
+class TestCampusOccupancy(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_occupancy_test.db"
+        self._remove_db_files()
+        self.db = FailingOutboxDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.assertTrue(self.db.add_vehicle("TEST001", "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_vehicle("TEST002", "owner", True)[0], "添加车辆失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        self.assertTrue(self.db.add_sensor("ROAD001", "主干道", "普通传感器", True, False)[0], "添加传感器失败")
+        self.gate_id = self.db.get_sensor_status("GATE001")[1]["id"]
+        self.road_id = self.db.get_sensor_status("ROAD001")[1]["id"]
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def _occupancy(self):
+        success, occupancy = self.db.get_campus_occupancy()
+        self.assertTrue(success, occupancy)
+        return occupancy
+
+    def test_counter_follows_passages(self):
+        """测试校门通行反转在校状态时计数同步变化，普通传感器不影响计数"""
+        self.assertEqual(self._occupancy(), 1)
+        self.assertTrue(self.db.add_passage_record("TEST001", self.gate_id)[0])
+        self.assertEqual(self._occupancy(), 2)
+        self.assertTrue(self.db.add_passage_record("TEST001", self.road_id)[0])
+        self.assertEqual(self._occupancy(), 2)
+
+        events = [("TEST002", self.gate_id, "2024-01-01 08:00:00"), ("TEST001", self.gate_id, "2024-01-01 08:01:00"),
+                  ("TEST001", self.gate_id, "2024-01-01 08:02:00")]
+        self.assertTrue(self.db.add_passage_records_bulk(events)[0])
+        self.assertEqual(self._occupancy(), 1)
+
+    def test_failed_passage_rolled_back(self):
+        """测试通行记录写入中途失败时整体回滚，不会随同一线程的下一次提交写入"""
+        before = self._occupancy()
+        self.db.fail = True
+        success, message = self.db.add_passage_record("TEST001", self.gate_id)
+        self.assertFalse(success, message)
+        self.db.fail = False
+        self.assertTrue(self.db.add_user("other", "other123")[0])
+        self.assertEqual(self._occupancy(), before)
+        self.assertEqual(self.db.get_passage_by_vehicle("TEST001")[2], 0)
+        _, traffic = self.db.get_sensor_hourly_traffic(self.gate_id, "2000-01-01 00:00:00", "2100-01-01 00:00:00")
+        self.assertEqual(traffic['total'], 0)
+
+    def test_counter_follows_vehicle_changes(self):
+        """测试添加、删除在校车辆时计数同步变化"""
+        self.assertTrue(self.db.add_vehicle("TEST003", "owner", True)[0])
+        self.assertEqual(self._occupancy(), 2)
+        self.assertTrue(self.db.delete_vehicle("TEST002")[0])
+        self.assertEqual(self._occupancy(), 1)
+        self.assertTrue(self.db.delete_vehicle("TEST001")[0])
+        self.assertEqual(self._occupancy(), 1)
+
+    def test_reconcile(self):
+        """测试核对发现并修复不一致的计数"""
+        success, result = self.db.reconcile_campus_occupancy()
+        self.assertTrue(success, result)
+        self.assertTrue(result["consistent"])
+
+        conn = self.db._get_thread_connection()
+        conn.execute("UPDATE row_counters SET value = 5 WHERE scope = 'campus_occupancy'")
+        conn.commit()
+        success, result = self.db.reconcile_campus_occupancy(repair=False)
+        self.assertEqual((result["counter"], result["actual"], result["repaired"]), (5, 1, False))
+        self.assertEqual(self._occupancy(), 5)
+
+        success, result = self.db.reconcile_campus_occupancy()
+        self.assertTrue(result["repaired"])
+        self.assertEqual(self._occupancy(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+import shutil
+import sqlite3
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+from db_backup import DatabaseBackup, BackupScheduler, backup_dir, list_backups, restore_backup
+from passage_archive import archive_dir
+
+class TestDatabaseBackup(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_backup_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        self.gate_id = self.db.get_sensor_status("GATE001")[1]["id"]
+        for i in range(20):
+            self.assertTrue(self.db.add_vehicle(f"CAR{i:03d}", "owner")[0], "添加车辆失败")
+        events = [(f"CAR{i % 20:03d}", self.gate_id, f"2024-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}")
+                  for i in range(5000)]
+        self.assertTrue(self.db.add_passage_records_bulk(events)[0])
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close()
+        self.db.close_thread_resources()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+        shutil.rmtree(backup_dir(self.test_db_path), ignore_errors=True)
+        shutil.rmtree(archive_dir(self.test_db_path), ignore_errors=True)
+
+    @staticmethod
+    def _count_passages(path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM passage_records").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_backup_during_writes(self):
+        """测试持续写入期间分步备份能够完成，得到一致的快照且写入不被阻塞"""
+        stop = threading.Event()
+        latencies = []
+
+        def writer():
+            while not stop.is_set():
+                started = time.monotonic()
+                self.db.add_passage_record("CAR000", self.gate_id)
+                latencies.append(time.monotonic() - started)
+            self.db.close_thread_resources()
+
+        steps = []
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            success, info = DatabaseBackup(self.test_db_path, pages=8, pause=0.002, progress=steps.append).run()
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertTrue(success, info)
+        self.assertGreater(len(steps), 1, "备份应分多步完成")
+        self.assertEqual(steps[-1]['remaining'], 0)
+        self.assertGreater(info['duration'], 0)
+        self.assertGreater(len(latencies), 0)
+        self.assertLess(max(latencies), 1.0, "备份期间写入被长时间阻塞")
+        # 快照包含备份开始前的全部记录，且与计数表一致
+        conn = sqlite3.connect(info['path'])
+        try:
+            self.assertEqual(conn.execute("PRAGMA integrity_check").fetchone()[0], "ok")
+            total = conn.execute("SELECT COUNT(*) FROM passage_records").fetchone()[0]
+            counter = conn.execute("SELECT value FROM row_counters WHERE scope = 'passages'").fetchone()[0]
+        finally:
+            conn.close()
+        self.assertGreaterEqual(total, 5000)
+        self.assertEqual(total, counter)
+
+    def test_rotation_and_restore(self):
+        """测试只保留最新的N个备份，并可用备份恢复数据库"""
+        job = DatabaseBackup(self.test_db_path, keep=2)
+        paths = []
+        for _ in range(3):
+            success, info = job.run()
+            self.assertTrue(success, info)
+            paths.append(info['path'])
+        self.assertEqual(list_backups(self.test_db_path), paths[1:])
+        self.assertEqual(info['removed'], paths[:1])
+
+        self.assertTrue(self.db.delete_vehicle("CAR000")[0])
+        self.assertLess(self._count_passages(self.test_db_path), 5000)
+        self.db.close()
+        self.db.close_thread_resources()
+
+        self.assertEqual(restore_backup(paths[-1], self.test_db_path), (True, "恢复成功"))
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path))
+        self.assertTrue(self.db.get_vehicle_status("CAR000")[0])
+        self.assertEqual(self.db.get_passage_by_sensor(self.gate_id)[2], 5000)
+        self.assertFalse(restore_backup("missing.db", self.test_db_path)[0])
+
+    def test_archive_segments(self):
+        """测试备份包含归档段文件，恢复时一并还原，轮转时随备份删除"""
+        self.assertTrue(self.db.archive_passages_before("2024-01-01 01:00:00")[0])
+        job = DatabaseBackup(self.test_db_path, keep=1)
+        success, info = job.run()
+        self.assertTrue(success, info)
+        self.assertEqual(info['archives'], 1)
+        self.assertEqual(len(os.listdir(archive_dir(info['path']))), 1)
+
+        self.db.close()
+        self.db.close_thread_resources()
+        shutil.rmtree(archive_dir(self.test_db_path))
+        self.assertEqual(restore_backup(info['path'], self.test_db_path), (True, "恢复成功"))
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path))
+        success, records, total = self.db.get_passage_by_vehicle("CAR000", limit=300)
+        self.assertTrue(success, records)
+        self.assertEqual((total, len(records)), (250, 250))
+
+        first = info['path']
+        success, info = job.run()
+        self.assertTrue(success, info)
+        self.assertEqual(info['removed'], [first])
+        self.assertFalse(os.path.exists(archive_dir(first)))
+
+        # 备份缺少段文件时拒绝恢复，数据库保持不变
+        self.db.close()
+        self.db.close_thread_resources()
+        shutil.rmtree(archive_dir(self.test_db_path))
+        shutil.rmtree(archive_dir(info['path']))
+        self.assertFalse(restore_backup(info['path'], self.test_db_path)[0])
+
+    def test_scheduler(self):
+        """测试后台定时备份"""
+        scheduler = BackupScheduler(DatabaseBackup(self.test_db_path, keep=1), interval=3600, run_at_start=True)
+        scheduler.start()
+        deadline = time.monotonic() + 10
+        while scheduler.last_result is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        scheduler.stop()
+        self.assertTrue(scheduler.last_result[0], scheduler.last_result)
+        self.assertEqual(len(list_backups(self.test_db_path)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB, WriterStoppedError
+import threading
+
+class TestGroupCommitWriter(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_group_commit_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        _, gate = self.db.get_sensor_status("GATE001")
+        self.gate_id = gate["id"]
+        self.db.start_writer(max_batch=32, max_delay_ms=20)
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close()
+        self.db.close_thread_resources()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def test_concurrent_writes_are_group_committed(self):
+        """测试多线程并发写入全部成功且被合并提交"""
+        for i in range(8):
+            self.assertTrue(self.db.add_vehicle(f"CAR{i:03d}", "owner")[0], "添加车辆失败")
+        errors = []
+
+        def worker(index):
+            for _ in range(10):
+                success, msg = self.db.add_passage_record(f"CAR{index:03d}", self.gate_id)
+                if not success:
+                    errors.append(msg)
+            self.db.close_thread_resources()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.db.get_passage_by_sensor(self.gate_id)[2], 80)
+        stats = self.db.writer.stats
+        self.assertLess(stats['batches'], stats['operations'], "写操作未被合并提交")
+        # 每辆车经过校门10次后应回到校外
+        _, status = self.db.get_vehicle_status("CAR000")
+        self.assertFalse(status["is_on_campus"])
+
+    def test_failed_operation_rolled_back_alone(self):
+        """测试失败的写操作只回滚自身"""
+        def failing_operation():
+            cursor = self.db._get_thread_cursor()
+            cursor.execute("INSERT INTO users (name, password) VALUES ('ghost', 'x')")
+            return (False, "模拟失败")
+
+        self.assertEqual(self.db._execute_write(failing_operation), (False, "模拟失败"))
+        self.assertTrue(self.db.add_user("alice", "alice123")[0])
+        self.assertFalse(self.db.get_user_id_by_name("ghost")[0], "失败操作的写入未回滚")
+        self.assertTrue(self.db.get_user_id_by_name("alice")[0])
+
+    def test_stop_writer_falls_back_to_direct_commit(self):
+        """测试停止写线程后写操作仍可直接提交"""
+        self.db.stop_writer()
+        self.assertIsNone(self.db.writer)
+        self.assertTrue(self.db.add_user("bob", "bob123")[0])
+        self.assertTrue(self.db.get_user_id_by_name("bob")[0])
+
+    def test_submit_after_stop_not_lost(self):
+        """测试停止前取得写线程的调用方在停止后提交时不会无限等待，写操作改为直接提交"""
+        writer = self.db.writer
+        self.db.stop_writer()
+        with self.assertRaises(WriterStoppedError):
+            writer.submit(lambda: (True, "不会执行"))
+        # 模拟停止前已读取 self.writer 的调用方
+        self.db.writer = writer
+        self.assertTrue(self.db.add_user("carol", "carol123")[0])
+        self.assertTrue(self.db.get_user_id_by_name("carol")[0])
+        self.db.writer = None
+
+    def test_writer_thread_exit_fails_pending(self):
+        """测试写线程异常退出时未执行的写操作以错误结束"""
+        writer = self.db.writer
+        started = threading.Event()
+        release = threading.Event()
+
+        def crash(conn, batch):
+            started.set()
+            release.wait(5)
+            raise SystemExit
+
+        writer._commit_batch = crash
+        first = writer.submit(lambda: (True, "第一批"))
+        self.assertTrue(started.wait(5))
+        queued = writer.submit(lambda: (True, "排队中"))
+        release.set()
+        for future in (first, queued):
+            with self.assertRaises(WriterStoppedError):
+                future.result(timeout=5)
+        with self.assertRaises(WriterStoppedError):
+            writer.submit(lambda: (True, "已停止"))
+        # 写线程退出后写操作在调用线程直接提交
+        self.assertTrue(self.db.add_user("dave", "dave123")[0])
+        self.assertTrue(self.db.get_user_id_by_name("dave")[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+
+class TestHourlyRollups(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_rollup_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        for i in range(5):
+            self.assertTrue(self.db.add_vehicle(f"TEST00{i}", "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        _, gate = self.db.get_sensor_status("GATE001")
+        self.gate_id = gate["id"]
+
+        # 8点：5辆车各2次；9点：1辆车1次
+        events = [(f"TEST00{i}", self.gate_id, f"2024-01-01 08:{i * 10 + j:02d}:00")
+                  for i in range(5) for j in range(2)]
+        events.append(("TEST000", self.gate_id, "2024-01-01 09:30:00"))
+        success, results = self.db.add_passage_records_bulk(events)
+        self.assertTrue(success and all(ok for ok, _ in results), results)
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def _traffic(self):
+        success, traffic = self.db.get_sensor_hourly_traffic(self.gate_id, "2024-01-01 00:00:00", "2024-01-02 00:00:00")
+        self.assertTrue(success, traffic)
+        return traffic
+
+    def test_rollups_updated_on_write(self):
+        """测试写入通行记录时同步更新小时汇总"""
+        traffic = self._traffic()
+        self.assertEqual([(h["hour_bucket"], h["count"], h["distinct_vehicles_estimate"]) for h in traffic["hours"]],
+                         [("2024-01-01 08:00:00", 10, 5), ("2024-01-01 09:00:00", 1, 1)])
+        self.assertEqual(traffic["total"], 11)
+        self.assertEqual(traffic["distinct_vehicles_estimate"], 5)
+
+        # 单条写入使用当前时间
+        self.assertTrue(self.db.add_passage_record("TEST001", self.gate_id)[0])
+        cursor = self.db._get_thread_cursor()
+        cursor.execute("SELECT SUM(count) FROM sensor_hourly_rollups")
+        self.assertEqual(cursor.fetchone()[0], 12)
+
+    def test_range_query(self):
+        """测试按小时范围查询"""
+        success, traffic = self.db.get_sensor_hourly_traffic(self.gate_id, "2024-01-01 09:00:00", "2024-01-01 10:00:00")
+        self.assertTrue(success, traffic)
+        self.assertEqual(traffic["total"], 1)
+        # 非整点的截止时间向下取整到整点，不计入截止时间所在的小时
+        self.assertTrue(self.db.add_passage_records_bulk([("TEST001", self.gate_id, "2024-01-01 10:45:00")])[0])
+        success, traffic = self.db.get_sensor_hourly_traffic(self.gate_id, "2024-01-01 08:00:00", "2024-01-01 09:30:00")
+        self.assertEqual([h["hour_bucket"] for h in traffic["hours"]], ["2024-01-01 08:00:00"])
+        self.assertEqual(traffic["total"], 10)
+        success, traffic = self.db.get_sensor_hourly_traffic(self.gate_id, "2024-01-01 08:30:00", "2024-01-01 10:30:00")
+        self.assertEqual([h["hour_bucket"] for h in traffic["hours"]], ["2024-01-01 08:00:00", "2024-01-01 09:00:00"])
+        self.assertEqual(traffic["total"], 11)
+        self.assertFalse(self.db.get_sensor_hourly_traffic(9999, "2024-01-01 00:00:00", "2024-01-02 00:00:00")[0])
+
+    def test_backfill(self):
+        """测试清空后按通行记录回填得到相同结果"""
+        expected = self._traffic()
+        cursor = self.db._get_thread_cursor()
+        cursor.execute("DELETE FROM sensor_hourly_rollups")
+        self.db._get_thread_connection().commit()
+        self.assertEqual(self._traffic()["total"], 0)
+
+        success, result = self.db.rebuild_sensor_hourly_rollups()
+        self.assertTrue(success, result)
+        self.assertEqual(result, {"months": 1, "records": 11})
+        self.assertEqual(self._traffic(), expected)
+
+        # 重复回填不会重复累加
+        self.assertTrue(self.db.rebuild_sensor_hourly_rollups("2024-01", "2024-01")[0])
+        self.assertEqual(self._traffic(), expected)
+
+    def test_delete_sensor_removes_rollups(self):
+        """测试删除传感器时删除其小时汇总"""
+        self.assertTrue(self.db.delete_sensor("GATE001")[0])
+        cursor = self.db._get_thread_cursor()
+        cursor.execute("SELECT COUNT(*) FROM sensor_hourly_rollups")
+        self.assertEqual(cursor.fetchone()[0], 0)
+
+if __name__ == '__main__':
+    unittest.main()
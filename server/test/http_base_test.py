@@ -0,0 +1,110 @@
+import unittest
+import json
+import sqlite3
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from http_base import Param
+from http_admin_server import AdminHTTPHandler
+from http_login_server import LoginHTTPHandler
+from http_user_server import UserHTTPHandler
+from memory_store import MemoryVehicleDB
+
+class BusyMemoryDB(MemoryVehicleDB):
+    """verify_user 抛出 error 指定的数据库错误，默认模拟锁冲突超过重试期限"""
+    error = "database is locked"
+
+    def verify_user(self, name, password):
+        raise sqlite3.OperationalError(self.error)
+
+class TestJSONRequestHandler(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.db = MemoryVehicleDB()
+        self.assertTrue(self.db.initialize(), "数据库初始化失败")
+        self.admin = AdminHTTPHandler.detached(self.db)
+        self.user = UserHTTPHandler.detached(self.db)
+        self.login = LoginHTTPHandler.detached(self.db)
+
+    def _post(self, handler, path, data):
+        return handler.handle_route('POST', path, json.dumps(data).encode('utf-8'))
+
+    def test_route_table(self):
+        """测试路由表按请求方法和路径查找，未匹配时返回404"""
+        self.assertIn(('POST', '/add_user'), AdminHTTPHandler.routes)
+        self.assertNotIn(('GET', '/add_user'), AdminHTTPHandler.routes)
+        self.assertIn(('GET', '/get_user_vehicles'), UserHTTPHandler.routes)
+        self.assertIn(('POST', '/get_user_vehicles'), UserHTTPHandler.routes)
+        self.assertEqual(self.admin.handle_route('GET', '/add_user?name=a&password=b'),
+                         (404, {"success": False, "message": "接口不存在"}))
+        self.assertEqual(self.login.handle_route('PUT', '/verify_user_and_get_role'),
+                         (404, {"success": False, "message": "接口不存在"}))
+
+    def test_query_url_decoding(self):
+        """测试查询字符串参数经过URL解码"""
+        self.assertEqual(self._post(self.admin, '/add_user', {"name": "张 三", "password": "p&w=1"}),
+                         (200, {"success": True, "message": "用户添加成功"}))
+        status, body = self.user.handle_route('GET', '/get_current_user_info?name=%E5%BC%A0+%E4%B8%89')
+        self.assertEqual((status, body["data"]["name"]), (200, "张 三"))
+        self.assertEqual(self.login.handle_route('GET', '/verify_user_and_get_role?name=%E5%BC%A0%20%E4%B8%89'
+                                                        '&password=p%26w%3D1'),
+                         (200, {"success": True, "role": "user"}))
+
+    def test_required_params(self):
+        """测试缺少必填参数时返回各接口原有的提示"""
+        self.assertEqual(self._post(self.admin, '/add_user', {"name": "alice"}),
+                         (400, {"success": False, "message": "用户名和密码为必填项"}))
+        self.assertEqual(self.admin.handle_route('GET', '/get_vehicle_info?vehicle_id='),
+                         (400, {"success": False, "message": "车辆ID为必填项"}))
+        self.assertEqual(self.login.handle_route('POST', '/verify_user_and_get_role', b"not json"),
+                         (400, {"success": False, "message": "用户名或密码不能为空"}))
+        # 用户接口先验证用户，再校验其余参数
+        self.assertEqual(self.user.handle_route('GET', '/get_user_vehicle_info?vehicle_id=CAR1'),
+                         (401, {"success": False, "message": "用户不存在"}))
+        self.assertEqual(self.user.handle_route('GET', '/get_user_vehicle_info?name=root'),
+                         (400, {"success": False, "message": "车辆ID为必填项"}))
+
+    def test_typed_params(self):
+        """测试参数类型转换和校验"""
+        for i in range(3):
+            self.assertTrue(self.db.add_user(f"user{i}", "password")[0])
+        status, body = self.admin.handle_route('GET', '/get_users?limit=2&with_total=0')
+        self.assertEqual((status, len(body["data"]), body["total"], body["limit"]), (200, 2, None, 2))
+        status, body = self.admin.handle_route('GET', '/get_users?limit=500&cursor=' + body["next_cursor"])
+        self.assertEqual((status, body["limit"], len(body["data"]), body["total"]), (200, 100, 2, 4))
+        self.assertEqual(self.admin.handle_route('GET', '/get_users?limit=abc'),
+                         (400, {"success": False, "message": "参数limit格式错误"}))
+        self.assertEqual(self.admin.handle_route('GET', '/get_users?limit=0')[0], 400)
+        self.assertEqual(self.admin.handle_route('GET', '/get_users?with_total=maybe')[0], 400)
+        self.assertEqual(self._post(self.admin, '/add_user', {"name": ["x"], "password": "p"}),
+                         (400, {"success": False, "message": "参数name格式错误"}))
+        self.assertEqual(self._post(self.admin, '/add_user', {"name": "bob", "password": "p", "is_admin": "false"})[0],
+                         200)
+        self.assertEqual(self.login.handle_route('GET', '/verify_user_and_get_role?name=bob&password=p'),
+                         (200, {"success": True, "role": "user"}))
+
+    def test_param_convert(self):
+        """测试参数说明的类型转换"""
+        self.assertEqual(Param(int, maximum=10).convert("42"), 10)
+        self.assertEqual(Param(bool).convert("True"), True)
+        self.assertEqual(Param(bool).convert(0), False)
+        self.assertEqual(Param(str).convert(7), "7")
+        self.assertEqual(Param(None).convert(7), 7)
+        for param, value in ((Param(int), True), (Param(int, minimum=1), "0"), (Param(bool), "2"),
+                             (Param(str), {"a": 1})):
+            with self.assertRaises(ValueError):
+                param.convert(value)
+
+    def test_database_busy(self):
+        """测试锁冲突超过重试期限时返回503，其他数据库错误照常抛出"""
+        db = BusyMemoryDB()
+        self.assertTrue(db.initialize(), "数据库初始化失败")
+        login = LoginHTTPHandler.detached(db)
+        self.assertEqual(login.handle_route('GET', '/verify_user_and_get_role?name=root&password=123456'),
+                         (503, {"success": False, "message": "数据库繁忙，请稍后重试"}))
+        db.error = "no such table: users"
+        with self.assertRaises(sqlite3.OperationalError):
+            login.handle_route('GET', '/verify_user_and_get_role?name=root&password=123456')
+
+if __name__ == '__main__':
+    unittest.main()
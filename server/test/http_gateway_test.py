@@ -0,0 +1,199 @@
+import unittest
+import asyncio
+import json
+import socket
+import threading
+import time
+import http.client
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from http_gateway import HTTPGateway
+from memory_store import MemoryVehicleDB
+from vehicle_db import VehicleDB, get_read_pool
+
+class BlockingMemoryDB(MemoryVehicleDB):
+    """verify_user 在 release 事件设置前阻塞，用于模拟慢查询"""
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.release.set()
+
+    def verify_user(self, name, password):
+        self.release.wait(5)
+        return super().verify_user(name, password)
+
+class TestHTTPGateway(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.db = BlockingMemoryDB()
+        self.assertTrue(self.db.initialize(), "数据库初始化失败")
+        self.gateway = None
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.release.set()
+        if self.gateway is not None:
+            self.gateway.stop()
+            self.thread.join(10)
+            self.assertFalse(self.thread.is_alive(), "网关未能停止")
+
+    def _start(self, storage=None, **kwargs):
+        self.gateway = HTTPGateway({0: ("login", "admin", "user")}, host="127.0.0.1",
+                                   storage=storage or self.db, **kwargs)
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.gateway.serve_forever()), daemon=True)
+        self.thread.start()
+        self.assertTrue(self.gateway.ready.wait(5))
+        self.port = self.gateway.ports[0]
+
+    def _request(self, conn, method, path, data=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read().decode('utf-8'))
+
+    def _wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_route_families_on_one_port(self):
+        """测试同一端口提供三类接口，响应与原服务器一致，并复用keep-alive连接"""
+        self._start()
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+        try:
+            self.assertEqual(self._request(conn, 'GET', '/verify_user_and_get_role?name=root&password=123456'),
+                             (200, {"success": True, "role": "admin"}))
+            self.assertEqual(self._request(conn, 'POST', '/add_user', {"name": "alice", "password": "alice123"}),
+                             (200, {"success": True, "message": "用户添加成功"}))
+            status, body = self._request(conn, 'GET', '/get_current_user_info?name=alice')
+            self.assertEqual((status, body["data"]["name"]), (200, "alice"))
+            status, body = self._request(conn, 'GET', '/get_users?limit=10')
+            self.assertEqual(sorted(u["name"] for u in body["data"]), ["alice", "root"])
+            self.assertEqual(self._request(conn, 'GET', '/missing'),
+                             (404, {"success": False, "message": "接口不存在"}))
+        finally:
+            conn.close()
+        stats = self.gateway.get_stats()
+        self.assertEqual((stats['connections'], stats['requests']), (1, 5))
+
+    def _raw_request(self, request):
+        """发送原始请求，读取直到连接关闭，返回状态码和JSON内容"""
+        sock = socket.create_connection(('127.0.0.1', self.port))
+        try:
+            sock.settimeout(5)
+            sock.sendall(request)
+            data = b""
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        finally:
+            sock.close()
+        head, _, body = data.partition(b"\r\n\r\n")
+        return int(head.split(b" ", 2)[1]), json.loads(body.decode('utf-8'))
+
+    def test_request_body_limits(self):
+        """测试分块传输的请求返回411，请求体超过上限返回413且不读取请求体"""
+        self._start(max_body_size=64)
+        self.assertEqual(self._raw_request(b"POST /add_user HTTP/1.1\r\nHost: test\r\n"
+                                           b"Transfer-Encoding: chunked\r\n\r\n"
+                                           b"5\r\nhello\r\n0\r\n\r\n"),
+                         (411, {"success": False, "message": "请求体须带Content-Length"}))
+        self.assertEqual(self._raw_request(b"POST /add_user HTTP/1.1\r\nHost: test\r\n"
+                                           b"Content-Length: 100000000\r\n\r\n{}"),
+                         (413, {"success": False, "message": "请求体过大"}))
+        self.assertEqual(self.gateway.get_stats()['requests'], 0)
+
+    def test_idle_keepalive_connections(self):
+        """测试大量空闲连接不占用工作线程，请求照常处理"""
+        self._start(max_workers=2)
+        idle = [socket.create_connection(('127.0.0.1', self.port)) for _ in range(1000)]
+        try:
+            self._wait_for(lambda: self.gateway.get_stats()['open_connections'] == 1000)
+            conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+            try:
+                self.assertEqual(self._request(conn, 'GET', '/get_campus_occupancy'),
+                                 (200, {"success": True, "data": {"on_campus": 0}}))
+            finally:
+                conn.close()
+        finally:
+            for sock in idle:
+                sock.close()
+        self._wait_for(lambda: self.gateway.get_stats()['open_connections'] == 0)
+
+    def test_read_pool_reserved_and_non_blocking(self):
+        """测试网关按工作线程数预留只读连接，连接池耗尽时请求不等待连接"""
+        db_path = "vehicle_db_gateway_test.db"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        db = VehicleDB()
+        self.assertTrue(db.initialize(db_path), "数据库初始化失败")
+        pool = get_read_pool(db_path)
+        held = []
+        try:
+            self._start(db, max_workers=12)
+            self.assertEqual(pool.get_stats()['max_size'], 12)
+            held = [pool.acquire(timeout=0) for _ in range(12)]
+            self.assertNotIn(None, held)
+            conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+            try:
+                started = time.monotonic()
+                result = self._request(conn, 'GET', '/verify_user_and_get_role?name=root&password=123456')
+                elapsed = time.monotonic() - started
+            finally:
+                conn.close()
+            self.assertEqual(result, (200, {"success": True, "role": "admin"}))
+            self.assertLess(elapsed, 1.0, "请求等待了只读连接池")
+        finally:
+            for conn in held:
+                pool.release(conn)
+            if self.gateway is not None:
+                self.gateway.stop()
+                self.thread.join(10)
+                self.gateway = None
+            self.assertEqual(pool.get_stats()['max_size'], 8, "停止后未取消预留")
+            pool.close()
+            db.close_thread_resources()
+            db.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+    def test_busy_and_timeout(self):
+        """测试执行队列已满时返回503，处理超时返回504"""
+        self._start(max_workers=1, queue_size=0, request_timeout=0.5)
+        self.db.release.clear()
+        results = []
+
+        def login():
+            conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+            try:
+                results.append(self._request(conn, 'GET', '/verify_user_and_get_role?name=root&password=123456'))
+            finally:
+                conn.close()
+
+        slow = threading.Thread(target=login)
+        slow.start()
+        self._wait_for(lambda: self.gateway.get_stats()['pending'] == 1)
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+        try:
+            status, body = self._request(conn, 'GET', '/get_campus_occupancy')
+        finally:
+            conn.close()
+        self.assertEqual((status, body["success"]), (503, False))
+
+        slow.join()
+        self.assertEqual(results[0], (504, {"success": False, "message": "请求处理超时"}))
+        # 超时后处理器仍在执行，完成前不接受新的请求
+        self.db.release.set()
+        self._wait_for(lambda: self.gateway.get_stats()['pending'] == 0)
+        login()
+        self.assertEqual(results[1], (200, {"success": True, "role": "admin"}))
+
+if __name__ == '__main__':
+    unittest.main()
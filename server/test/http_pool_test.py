@@ -0,0 +1,309 @@
+import unittest
+import json
+import socket
+import threading
+import time
+import http.client
+import sys
+import os
+from http.server import BaseHTTPRequestHandler
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from http_pool import PooledHTTPServer
+from http_login_server import LoginHTTPHandler
+from memory_store import MemoryVehicleDB
+from vehicle_db import VehicleDB, get_read_pool
+
+class BlockingHandler(BaseHTTPRequestHandler):
+    """收到请求后等待 release 事件再响应，记录同时处理的请求数"""
+    started = None
+    release = None
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        cls.started.release()
+        cls.release.wait(5)
+        with cls.lock:
+            cls.active -= 1
+        body = json.dumps({"success": True, "thread": threading.current_thread().name}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class CountingMemoryDB(MemoryVehicleDB):
+    """记录创建和初始化次数的内存存储"""
+    created = 0
+    initialized_count = 0
+
+    def __init__(self):
+        type(self).created += 1
+        super().__init__()
+
+    def initialize(self, *args, **kwargs) -> bool:
+        type(self).initialized_count += 1
+        return super().initialize(*args, **kwargs)
+
+class QuietLoginHandler(LoginHTTPHandler):
+    storage_factory = CountingMemoryDB
+
+    def log_message(self, format, *args):
+        pass
+
+class TestPooledHTTPServer(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        BlockingHandler.started = threading.Semaphore(0)
+        BlockingHandler.release = threading.Event()
+        BlockingHandler.active = BlockingHandler.peak = 0
+        self.httpd = None
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        BlockingHandler.release.set()
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+    def _start(self, handler_class, **kwargs):
+        self.httpd = PooledHTTPServer(('127.0.0.1', 0), handler_class, **kwargs)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self.httpd.server_address[1]
+
+    def _get(self, port, path, results=None):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            result = (response.status, json.loads(response.read().decode('utf-8')))
+        finally:
+            conn.close()
+        if results is not None:
+            results.append(result)
+        return result
+
+    def _get_async(self, port, path, results):
+        thread = threading.Thread(target=self._get, args=(port, path, results))
+        thread.start()
+        return thread
+
+    def _wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_requests_handled_concurrently(self):
+        """测试多个慢请求由不同工作线程同时处理"""
+        port = self._start(BlockingHandler, max_workers=4)
+        results = []
+        threads = [self._get_async(port, '/slow', results) for _ in range(4)]
+        for _ in range(4):
+            self.assertTrue(BlockingHandler.started.acquire(timeout=5), "请求未被并发处理")
+        BlockingHandler.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(BlockingHandler.peak, 4)
+        self.assertEqual([status for status, _ in results], [200] * 4)
+        self.assertEqual(len({body["thread"] for _, body in results}), 4)
+        self._wait_for(lambda: self.httpd.get_stats()['completed'] == 4)
+
+    def test_queue_full_returns_503(self):
+        """测试工作线程全忙且队列已满时立即返回503"""
+        port = self._start(BlockingHandler, max_workers=1, queue_size=1)
+        results = []
+        first = self._get_async(port, '/slow', results)
+        self.assertTrue(BlockingHandler.started.acquire(timeout=5))
+        second = self._get_async(port, '/slow', results)
+        self._wait_for(lambda: self.httpd.get_stats()['queued'] == 1)
+
+        status, body = self._get(port, '/slow')
+        self.assertEqual(status, 503)
+        self.assertFalse(body["success"])
+
+        BlockingHandler.release.set()
+        first.join()
+        second.join()
+        self.assertEqual([status for status, _ in results], [200, 200])
+        stats = self.httpd.get_stats()
+        self.assertEqual((stats['accepted'], stats['rejected']), (2, 1))
+
+    def test_request_timeout(self):
+        """测试空闲连接超时后释放工作线程，排队超过超时时间的请求返回503"""
+        port = self._start(BlockingHandler, max_workers=1, request_timeout=0.3)
+        idle = socket.create_connection(('127.0.0.1', port))
+        try:
+            idle.settimeout(5)
+            started = time.monotonic()
+            self.assertEqual(idle.recv(1024), b"", "空闲连接未被关闭")
+            self.assertLess(time.monotonic() - started, 3)
+        finally:
+            idle.close()
+
+        results = []
+        first = self._get_async(port, '/slow', results)
+        self.assertTrue(BlockingHandler.started.acquire(timeout=5))
+        second = self._get_async(port, '/slow', results)
+        self._wait_for(lambda: self.httpd.get_stats()['queued'] == 1)
+        time.sleep(0.4)
+        BlockingHandler.release.set()
+        first.join()
+        second.join()
+        self.assertEqual(sorted(status for status, _ in results), [200, 503])
+        self.assertEqual(self.httpd.get_stats()['expired'], 1)
+
+    def test_login_handler(self):
+        """测试登录处理器在工作线程中并发处理请求"""
+        port = self._start(QuietLoginHandler, max_workers=4)
+        results = []
+        threads = [self._get_async(port, '/verify_user_and_get_role?name=root&password=123456', results)
+                   for _ in range(8)]
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [(200, {"success": True, "role": "admin"})] * 8)
+
+    def test_storage_shared_across_requests(self):
+        """测试服务器启动时创建并初始化一次存储，各请求共享使用"""
+        CountingMemoryDB.created = CountingMemoryDB.initialized_count = 0
+        port = self._start(QuietLoginHandler, max_workers=2)
+        self.assertEqual((CountingMemoryDB.created, CountingMemoryDB.initialized_count), (1, 1))
+        self.assertTrue(self.httpd.storage.add_user("alice", "alice123")[0])
+        for _ in range(4):
+            status, body = self._get(port, '/verify_user_and_get_role?name=alice&password=alice123')
+            self.assertEqual((status, body), (200, {"success": True, "role": "user"}))
+        self.assertEqual((CountingMemoryDB.created, CountingMemoryDB.initialized_count), (1, 1))
+
+    def test_idle_connections_do_not_hold_read_pool(self):
+        """测试空闲的持久连接不占用只读连接，连接池上限按工作线程数预留，请求不因等待连接池而延迟"""
+        db_path = "vehicle_db_http_pool_test.db"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        db = VehicleDB()
+        self.assertTrue(db.initialize(db_path), "数据库初始化失败")
+        idle = []
+        try:
+            port = self._start(QuietLoginHandler, max_workers=12, request_timeout=10, storage=db)
+            self.assertEqual(get_read_pool(db_path).get_stats()['max_size'], 12)
+            # 9个空闲连接各占用一个工作线程，超过连接池默认的8个连接
+            idle = [socket.create_connection(('127.0.0.1', port)) for _ in range(9)]
+            self._wait_for(lambda: self.httpd.get_stats()['active'] == 9)
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            try:
+                started = time.monotonic()
+                conn.request('POST', '/verify_user_and_get_role',
+                             json.dumps({"name": "root", "password": "123456"}).encode('utf-8'),
+                             {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                body = json.loads(response.read().decode('utf-8'))
+                elapsed = time.monotonic() - started
+            finally:
+                conn.close()
+            self.assertEqual((response.status, body), (200, {"success": True, "role": "admin"}))
+            self.assertLess(elapsed, 1.0, "请求等待了只读连接池")
+        finally:
+            for sock in idle:
+                sock.close()
+            if self.httpd is not None:
+                self.httpd.shutdown()
+                self.httpd.server_close()
+                self.httpd = None
+            self.assertEqual(get_read_pool(db_path).get_stats()['max_size'], 8, "关闭后未取消预留")
+            get_read_pool(db_path).close()
+            db.close_thread_resources()
+            db.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+    def _read_responses(self, sock):
+        """读取直到连接关闭，返回各响应的 (状态码, JSON内容)"""
+        data = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        responses = []
+        while data:
+            head, _, rest = data.partition(b"\r\n\r\n")
+            lines = head.decode('iso-8859-1').split("\r\n")
+            headers = dict(line.split(": ", 1) for line in lines[1:])
+            length = int(headers["Content-Length"])
+            responses.append((int(lines[0].split()[1]), json.loads(rest[:length].decode('utf-8'))))
+            data = rest[length:]
+        return responses
+
+    def test_keepalive_connection_reused(self):
+        """测试HTTP/1.1响应带Content-Length，同一连接依次处理多个请求"""
+        port = self._start(QuietLoginHandler, max_workers=2)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        try:
+            for _ in range(3):
+                conn.request('GET', '/verify_user_and_get_role?name=root&password=123456')
+                response = conn.getresponse()
+                body = response.read()
+                self.assertEqual(response.version, 11)
+                self.assertEqual(int(response.getheader('Content-Length')), len(body))
+                self.assertEqual(json.loads(body.decode('utf-8')), {"success": True, "role": "admin"})
+        finally:
+            conn.close()
+        self.assertEqual(self.httpd.get_stats()['accepted'], 1)
+
+    def test_pipelined_requests(self):
+        """测试一次发送的多个请求（含请求体）按顺序处理"""
+        port = self._start(QuietLoginHandler, max_workers=1)
+        body = json.dumps({"name": "root", "password": "wrong"}).encode('utf-8')
+        requests = (b"GET /verify_user_and_get_role?name=root&password=123456 HTTP/1.1\r\nHost: test\r\n\r\n"
+                    b"POST /verify_user_and_get_role HTTP/1.1\r\nHost: test\r\nContent-Length: "
+                    + str(len(body)).encode('ascii') + b"\r\n\r\n" + body +
+                    b"GET /missing HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+        sock = socket.create_connection(('127.0.0.1', port))
+        try:
+            sock.settimeout(5)
+            sock.sendall(requests)
+            responses = self._read_responses(sock)
+        finally:
+            sock.close()
+        self.assertEqual(responses, [
+            (200, {"success": True, "role": "admin"}),
+            (200, {"success": False, "message": "用户名或密码错误"}),
+            (404, {"success": False, "message": "接口不存在"}),
+        ])
+
+    def test_idle_keepalive_closed(self):
+        """测试持久连接空闲超时后关闭，有连接排队时空闲连接让出工作线程"""
+        port = self._start(QuietLoginHandler, max_workers=1, keepalive_timeout=0.3)
+        request = b"GET /verify_user_and_get_role?name=root&password=123456 HTTP/1.1\r\nHost: test\r\n\r\n"
+        sock = socket.create_connection(('127.0.0.1', port))
+        try:
+            sock.settimeout(5)
+            sock.sendall(request)
+            started = time.monotonic()
+            self.assertEqual([status for status, _ in self._read_responses(sock)], [200])
+            self.assertLess(time.monotonic() - started, 3)
+        finally:
+            sock.close()
+
+        self.httpd.keepalive_timeout = 30
+        idle = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        try:
+            idle.request('GET', '/verify_user_and_get_role?name=root&password=123456')
+            idle.getresponse().read()
+            # 唯一的工作线程正等待空闲连接的下一个请求，新连接仍能很快得到处理
+            started = time.monotonic()
+            self.assertEqual(self._get(port, '/verify_user_and_get_role?name=root&password=123456')[0], 200)
+            self.assertLess(time.monotonic() - started, 3)
+        finally:
+            idle.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB, PassageRecord, VehicleRecord
+
+class TestIterRows(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_iter_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        for i in range(7):
+            self.assertTrue(self.db.add_vehicle(f"TEST00{i}", "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        self.gate_id = self.db.get_sensor_status("GATE001")[1]["id"]
+
+        # 原表中的一月记录，启用分区后写入二月记录和一条迟到的一月记录
+        events = [(f"TEST00{i % 7}", self.gate_id, f"2024-01-{i + 1:02d} 08:00:00") for i in range(10)]
+        self.assertTrue(self.db.add_passage_records_bulk(events)[0])
+        self.assertTrue(self.db.enable_passage_partitioning()[0])
+        events = [(f"TEST00{i % 7}", self.gate_id, f"2024-02-{i + 1:02d} 08:00:00") for i in range(10)]
+        events.append(("TEST000", self.gate_id, "2024-01-15 12:00:00"))
+        self.assertTrue(self.db.add_passage_records_bulk(events)[0])
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def test_iter_matches_list_queries(self):
+        """测试流式遍历结果与分页查询一致"""
+        _, users, _ = self.db.get_users(limit=100)
+        self.assertEqual(list(self.db.iter_users(chunk_size=2)), users)
+        _, vehicles, _ = self.db.get_vehicles(limit=100)
+        self.assertEqual(list(self.db.iter_vehicles(chunk_size=3)), vehicles)
+        _, sensors, _ = self.db.get_sensors(limit=100)
+        self.assertEqual(list(self.db.iter_sensors()), sensors)
+
+    def test_row_types(self):
+        """测试元组和__slots__记录行类型"""
+        rows = list(self.db.iter_vehicles(row_type="tuple"))
+        self.assertIsInstance(rows[0], tuple)
+        records = list(self.db.iter_vehicles(row_type="record"))
+        self.assertIsInstance(records[0], VehicleRecord)
+        self.assertFalse(hasattr(records[0], "__dict__"))
+        self.assertEqual(records[0].vehicle_id, rows[0][0])
+        self.assertEqual([r.as_dict() for r in records], list(self.db.iter_vehicles()))
+        with self.assertRaises(ValueError):
+            next(self.db.iter_users(row_type="list"))
+
+    def test_iter_passages_merges_partitions(self):
+        """测试通行记录跨原表和分区按时间升序归并，支持筛选"""
+        records = list(self.db.iter_passages(row_type="record", chunk_size=4))
+        self.assertEqual(len(records), 21)
+        self.assertIsInstance(records[0], PassageRecord)
+        times = [r.passage_time for r in records]
+        self.assertEqual(times, sorted(times))
+        self.assertIn("2024-01-15 12:00:00", times)
+
+        _, expected, _ = self.db.get_passage_by_vehicle("TEST000", limit=100)
+        rows = list(self.db.iter_passages(vehicle_id="TEST000"))
+        self.assertEqual(rows, list(reversed(expected)))
+
+        rows = list(self.db.iter_passages(start_time="2024-01-10 00:00:00", end_time="2024-02-02 00:00:00",
+                                          row_type="tuple"))
+        self.assertEqual([r[4] for r in rows],
+                         ["2024-01-10 08:00:00", "2024-01-15 12:00:00", "2024-02-01 08:00:00"])
+
+if __name__ == '__main__':
+    unittest.main()
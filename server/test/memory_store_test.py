@@ -0,0 +1,161 @@
+import unittest
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB, next_page_cursor
+from memory_store import MemoryVehicleDB
+from storage import VehicleStorage, create_storage
+
+class StorageContract:
+    """各存储引擎共用的行为测试，子类提供 make_storage"""
+
+    def make_storage(self) -> VehicleStorage:
+        raise NotImplementedError
+
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.db = self.make_storage()
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        self.assertTrue(self.db.add_sensor("ROAD001", "主干道", "道路", True, False)[0], "添加传感器失败")
+        self.gate_id = self.db.get_sensor_status("GATE001")[1]["id"]
+        self.road_id = self.db.get_sensor_status("ROAD001")[1]["id"]
+        for i in range(5):
+            self.assertTrue(self.db.add_vehicle(f"TEST{i:03d}", "owner")[0], "添加车辆失败")
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+
+    def test_duplicate_and_missing_messages(self):
+        """测试重复和不存在时的返回信息"""
+        self.assertEqual(self.db.add_user("owner", "x"), (False, "用户名已存在"))
+        self.assertEqual(self.db.add_sensor("GATE001", "西门"), (False, "传感器ID已存在"))
+        self.assertEqual(self.db.add_sensor("GATE002", "东门"), (False, "位置已被占用"))
+        self.assertEqual(self.db.add_vehicle("TEST000", "owner"), (False, "车辆已注册"))
+        self.assertEqual(self.db.add_vehicle("TEST999", "nobody"), (False, "注册人不存在"))
+        self.assertEqual(self.db.add_passage_record("TEST999", self.gate_id), (False, "车辆不存在"))
+        self.assertEqual(self.db.add_passage_record("TEST000", 9999), (False, "传感器不存在"))
+        self.assertEqual(self.db.get_passage_by_vehicle("TEST999"), (False, "车辆不存在", 0))
+        self.assertEqual(self.db.get_users(after="bad"), (False, "无效的分页游标", 0))
+        self.assertEqual(self.db.delete_user("owner", "wrong"), (False, "密码不正确，无法删除"))
+
+    def test_users_and_passwords(self):
+        """测试用户验证、改密和按名称删除"""
+        success, user_id, is_admin = self.db.verify_user("owner", "owner123")
+        self.assertTrue(success)
+        self.assertFalse(is_admin)
+        self.assertEqual(self.db.get_user_id_by_name("owner"), (True, user_id))
+        self.assertTrue(self.db.verify_user("root", "123456")[2], "默认管理员不存在")
+        self.assertEqual(self.db.change_password("owner", "bad", "new"), (False, "旧密码不正确"))
+        self.assertTrue(self.db.change_password("owner", "owner123", "new")[0])
+        self.assertTrue(self.db.verify_user("owner", "new")[0])
+        # 删除用户同时删除其登记的车辆
+        self.assertTrue(self.db.delete_user("owner", "new")[0])
+        self.assertEqual(self.db.get_vehicles()[2], 0)
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 0))
+
+    def test_gate_toggles_occupancy(self):
+        """测试校门传感器反转在校状态，普通传感器不改变"""
+        self.assertTrue(self.db.add_passage_record("TEST000", self.gate_id)[0])
+        self.assertTrue(self.db.add_passage_record("TEST001", self.road_id)[0])
+        self.assertEqual(self.db.get_vehicle_status("TEST000")[1]["is_on_campus"], 1)
+        self.assertEqual(self.db.get_vehicle_status("TEST001")[1]["is_on_campus"], 0)
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 1))
+        self.assertEqual(self.db.lookup_sensor("GATE001"), (self.gate_id, True, True))
+        self.assertTrue(self.db.update_sensor_status("GATE001", False)[0])
+        self.assertEqual(self.db.lookup_sensor("GATE001"), (self.gate_id, False, True))
+
+    def test_passage_queries_and_cursors(self):
+        """测试批量写入后按车辆、传感器、时间查询，偏移与游标分页一致"""
+        events = [(f"TEST{i % 5:03d}", self.gate_id if i % 2 else self.road_id, f"2024-01-01 08:{i:02d}:00")
+                  for i in range(20)]
+        events += [("TEST000", self.gate_id, "2024-01-01 08:05:00"), ("TEST999", self.gate_id, None),
+                   ("TEST000", self.gate_id, "bad")]
+        success, results = self.db.add_passage_records_bulk(events)
+        self.assertTrue(success)
+        self.assertEqual(results[-2:], [(False, "车辆不存在"), (False, "时间格式无效")])
+
+        success, records, total = self.db.get_passages_by_time("2024-01-01 08:00:00", "2024-01-01 08:10:00", limit=100)
+        self.assertTrue(success, records)
+        self.assertEqual(total, 11)
+        keys = [(r["passage_time"], r["id"]) for r in records]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertEqual(set(records[0]), {"id", "vehicle_id", "sensor_id", "location", "passage_time", "created_at"})
+
+        _, by_vehicle, total = self.db.get_passage_by_vehicle("TEST000", limit=100)
+        self.assertEqual(total, 5)
+        collected, after = [], None
+        while True:
+            _, page, _ = self.db.get_passage_by_vehicle("TEST000", limit=2, after=after, with_total=False)
+            collected += page
+            after = next_page_cursor("passages", page, 2)
+            if not after:
+                break
+        self.assertEqual(collected, by_vehicle)
+        self.assertEqual(self.db.get_passage_by_vehicle("TEST000", limit=2, offset=2)[1], by_vehicle[2:4])
+
+        _, by_sensor, total = self.db.get_passage_by_sensor(self.gate_id, limit=100)
+        self.assertEqual(total, 11)
+        self.assertTrue(all(r["location"] == "东门" for r in by_sensor))
+
+        # 删除车辆/传感器时删除关联通行记录
+        self.assertTrue(self.db.delete_vehicle("TEST000")[0])
+        self.assertEqual(self.db.get_passage_by_sensor(self.gate_id)[2], 8)
+        self.assertTrue(self.db.delete_sensor("ROAD001")[0])
+        self.assertEqual(self.db.get_passages_by_time("2024-01-01 00:00:00", "2024-01-02 00:00:00")[2], 8)
+
+    def test_list_pagination(self):
+        """测试用户、车辆、传感器列表的排序与游标分页"""
+        _, vehicles, total = self.db.get_vehicles(limit=3)
+        self.assertEqual(total, 5)
+        self.assertEqual([v["vehicle_id"] for v in vehicles], ["TEST000", "TEST001", "TEST002"])
+        self.assertEqual(vehicles[0]["registered_by_name"], "owner")
+        after = next_page_cursor("vehicles", vehicles, 3)
+        _, rest, _ = self.db.get_vehicles(limit=3, after=after)
+        self.assertEqual([v["vehicle_id"] for v in rest], ["TEST003", "TEST004"])
+
+        _, users, total = self.db.get_users()
+        self.assertEqual(([u["name"] for u in users], total), (["root", "owner"], 2))
+        _, sensors, _ = self.db.get_sensors(limit=1, offset=1)
+        self.assertEqual(sensors[0]["sensor_id"], "ROAD001")
+
+    def test_shared_across_threads(self):
+        """测试其他线程写入的数据在当前线程可见"""
+        def worker(i):
+            self.db.add_passage_record(f"TEST{i:03d}", self.gate_id)
+            self.db.close_thread_resources()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 5))
+
+class TestSQLiteStorage(StorageContract, unittest.TestCase):
+    def make_storage(self):
+        db = VehicleDB()
+        self.assertTrue(db.initialize(":memory:"), "数据库初始化失败")
+        return db
+
+class TestMemoryStorage(StorageContract, unittest.TestCase):
+    def make_storage(self):
+        db = create_storage("memory")
+        self.assertIsInstance(db, MemoryVehicleDB)
+        self.assertTrue(db.initialize(), "存储初始化失败")
+        return db
+
+class TestSQLiteMemoryIsolation(unittest.TestCase):
+    def test_separate_memory_databases(self):
+        """测试多个 :memory: 实例互不影响"""
+        first, second = VehicleDB(), VehicleDB()
+        self.assertTrue(first.initialize(":memory:") and second.initialize(":memory:"))
+        self.assertTrue(first.add_user("only_first", "pwd")[0])
+        self.assertFalse(second.get_user_id_by_name("only_first")[0])
+        first.close()
+        second.close()
+
+if __name__ == '__main__':
+    unittest.main()
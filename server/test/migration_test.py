@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB, SCHEMA_MIGRATIONS
+import sqlite3
+
+class TestSchemaMigration(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_migration_test.db"
+        self._remove_db_files()
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def _index_names(self):
+        conn = sqlite3.connect(self.test_db_path)
+        try:
+            rows = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'passage_records'"
+            ).fetchall()
+            return {row[0] for row in rows}
+        finally:
+            conn.close()
+
+    def test_new_database_reaches_latest_version(self):
+        """测试新建数据库直接升级到最新版本"""
+        db = VehicleDB()
+        self.assertTrue(db.initialize(self.test_db_path), "数据库初始化失败")
+        self.assertEqual(db.get_schema_version(), SCHEMA_MIGRATIONS[-1][0], "结构版本不正确")
+        self.assertIn("idx_passage_vehicle_time", self._index_names(), "缺少按车辆查询的索引")
+        db.close_thread_resources()
+        db.close()
+
+    def test_upgrade_existing_database(self):
+        """测试旧版本数据库原地升级且数据保留"""
+        # 模拟未带索引的旧数据库
+        conn = sqlite3.connect(self.test_db_path)
+        conn.execute("""CREATE TABLE passage_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            vehicle_id TEXT NOT NULL,
+            sensor_id INTEGER NOT NULL,
+            passage_time TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+        conn.execute("INSERT INTO passage_records (vehicle_id, sensor_id, passage_time) VALUES ('OLD001', 1, '2024-01-01 08:00:00')")
+        conn.commit()
+        conn.close()
+        self.assertNotIn("idx_passage_vehicle_time", self._index_names())
+
+        db = VehicleDB()
+        self.assertTrue(db.initialize(self.test_db_path), "数据库初始化失败")
+        self.assertEqual(db.get_schema_version(), SCHEMA_MIGRATIONS[-1][0], "结构版本不正确")
+        self.assertIn("idx_passage_vehicle_time", self._index_names(), "升级后缺少索引")
+        cursor = db._get_thread_cursor()
+        cursor.execute("SELECT COUNT(*) AS total FROM passage_records")
+        self.assertEqual(cursor.fetchone()['total'], 1, "升级后数据丢失")
+        db.close_thread_resources()
+        db.close()
+
+    def test_initialize_is_idempotent(self):
+        """测试重复初始化不会重复执行迁移"""
+        db = VehicleDB()
+        self.assertTrue(db.initialize(self.test_db_path))
+        db.close_thread_resources()
+        db.close()
+        db = VehicleDB()
+        self.assertTrue(db.initialize(self.test_db_path), "再次初始化失败")
+        self.assertEqual(db.get_schema_version(), SCHEMA_MIGRATIONS[-1][0])
+        db.close_thread_resources()
+        db.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+
+class TestPassageOutbox(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_outbox_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        self.gate_id = self.db.get_sensor_status("GATE001")[1]["id"]
+        for i in range(3):
+            self.assertTrue(self.db.add_vehicle(f"CAR{i:03d}", "owner")[0], "添加车辆失败")
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close()
+        self.db.close_thread_resources()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def test_events_written_with_passages(self):
+        """测试单条和批量写入通行记录时按顺序追加事件，失败的写入不产生事件"""
+        self.assertTrue(self.db.register_outbox_consumer("billing")[0])
+        self.assertTrue(self.db.add_passage_record("CAR000", self.gate_id)[0])
+        self.assertFalse(self.db.add_passage_record("CAR999", self.gate_id)[0])
+        events = [("CAR001", self.gate_id, "2024-01-01 08:00:00"), ("CAR001", self.gate_id, "2024-01-01 09:00:00"),
+                  ("CAR999", self.gate_id, None)]
+        self.assertTrue(self.db.add_passage_records_bulk(events)[0])
+
+        success, batch = self.db.read_outbox("billing")
+        self.assertTrue(success, batch)
+        self.assertEqual([(e["vehicle_id"], e["is_on_campus"]) for e in batch],
+                         [("CAR000", 1), ("CAR001", 1), ("CAR001", 0)])
+        self.assertEqual([e["seq"] for e in batch], sorted(e["seq"] for e in batch))
+        _, records, _ = self.db.get_passage_by_vehicle("CAR001")
+        self.assertEqual({e["passage_id"] for e in batch[1:]}, {r["id"] for r in records})
+
+    def test_consumers_ack_and_compact(self):
+        """测试各消费者独立确认进度，压缩只删除全部消费者都已确认的事件"""
+        self.assertTrue(self.db.register_outbox_consumer("billing")[0])
+        self.assertTrue(self.db.register_outbox_consumer("alarms")[0])
+        self.assertEqual(self.db.register_outbox_consumer("alarms"), (False, "消费者已存在"))
+        for i in range(3):
+            self.assertTrue(self.db.add_passage_record(f"CAR{i:03d}", self.gate_id)[0])
+
+        _, batch = self.db.read_outbox("billing", limit=2)
+        self.assertEqual(len(batch), 2)
+        self.assertTrue(self.db.ack_outbox("billing", batch[-1]["seq"])[0])
+        _, rest = self.db.read_outbox("billing")
+        self.assertEqual([e["vehicle_id"] for e in rest], ["CAR002"])
+        # 确认序号不能后退，也不能超过已写入的事件
+        self.assertTrue(self.db.ack_outbox("billing", batch[0]["seq"])[0])
+        self.assertEqual(len(self.db.read_outbox("billing")[1]), 1)
+        self.assertFalse(self.db.ack_outbox("billing", rest[-1]["seq"] + 1)[0])
+
+        # alarms 尚未确认，不能压缩
+        self.assertEqual(self.db.compact_outbox(), (True, 0))
+        self.assertTrue(self.db.ack_outbox("alarms", batch[0]["seq"])[0])
+        self.assertEqual(self.db.compact_outbox(), (True, 1))
+        consumers = {c["name"]: c["pending"] for c in self.db.get_outbox_consumers()[1]}
+        self.assertEqual(consumers, {"alarms": 2, "billing": 1})
+
+        # 注销后不再阻止压缩，序号不会复用
+        self.assertTrue(self.db.unregister_outbox_consumer("alarms")[0])
+        self.assertEqual(self.db.compact_outbox(), (True, 1))
+        self.assertTrue(self.db.add_passage_record("CAR000", self.gate_id)[0])
+        _, latest = self.db.read_outbox("billing")
+        self.assertEqual(latest[-1]["seq"], rest[-1]["seq"] + 1)
+
+    def test_new_consumer_starts_after_existing_events(self):
+        """测试新消费者默认只读取注册后的事件，from_beginning时读取保留的全部事件"""
+        self.assertTrue(self.db.add_passage_record("CAR000", self.gate_id)[0])
+        self.assertTrue(self.db.register_outbox_consumer("analytics")[0])
+        self.assertTrue(self.db.register_outbox_consumer("replay", from_beginning=True)[0])
+        self.assertEqual(self.db.read_outbox("analytics"), (True, []))
+        self.assertEqual(len(self.db.read_outbox("replay")[1]), 1)
+        self.assertEqual(self.db.read_outbox("missing"), (False, "消费者不存在"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB, next_page_cursor, parse_page_cursor
+from http_admin_server import AdminHTTPHandler
+from http_user_server import UserHTTPHandler
+
+class TestKeysetPagination(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_pagination_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        for i in range(7):
+            self.assertTrue(self.db.add_vehicle(f"CAR{i:03d}", "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        _, sensor = self.db.get_sensor_status("GATE001")
+        self.sensor_id = sensor["id"]
+        for _ in range(5):
+            self.assertTrue(self.db.add_passage_record("CAR000", self.sensor_id)[0], "添加通行记录失败")
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def test_vehicle_pages_follow_cursor(self):
+        """测试按游标翻页可完整且不重复地遍历车辆"""
+        seen = []
+        after = None
+        while True:
+            success, vehicles, total = self.db.get_vehicles(3, after=after)
+            self.assertTrue(success, vehicles)
+            seen.extend(v["vehicle_id"] for v in vehicles)
+            after = next_page_cursor("vehicles", vehicles, 3)
+            if after is None:
+                break
+        self.assertEqual(seen, [f"CAR{i:03d}" for i in range(7)], "游标翻页结果不正确")
+        self.assertEqual(total, 7)
+
+    def test_passage_pages_stable_with_new_records(self):
+        """测试翻页过程中插入新记录不会导致重复或遗漏"""
+        success, first_page, _ = self.db.get_passage_by_vehicle("CAR000", limit=2)
+        self.assertTrue(success)
+        after = next_page_cursor("passages", first_page, 2)
+
+        # 翻页期间产生新的通行记录
+        self.db.add_passage_record("CAR000", self.sensor_id)
+
+        success, rest, _ = self.db.get_passage_by_vehicle("CAR000", limit=10, after=after)
+        self.assertTrue(success)
+        ids = [r["id"] for r in first_page + rest]
+        self.assertEqual(len(ids), 5, "旧记录出现重复或遗漏")
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_invalid_cursor_rejected(self):
+        """测试非法游标返回失败"""
+        success, message, _ = self.db.get_users(after="not-a-cursor")
+        self.assertFalse(success)
+        # 不同列表类型的游标不可混用
+        _, vehicles, _ = self.db.get_vehicles(1)
+        success, _, _ = self.db.get_users(after=next_page_cursor("vehicles", vehicles, 1))
+        self.assertFalse(success)
+
+    def test_numeric_cursor_is_offset(self):
+        """测试纯数字游标仍按偏移量处理"""
+        self.assertEqual(parse_page_cursor("4"), (4, None))
+        self.assertEqual(parse_page_cursor(0), (0, None))
+        offset, after = parse_page_cursor("4")
+        success, vehicles, _ = self.db.get_vehicles(2, offset, after=after)
+        self.assertEqual([v["vehicle_id"] for v in vehicles], ["CAR004", "CAR005"])
+
+    def test_http_next_cursor_on_last_page(self):
+        """测试HTTP接口在最后一页（包括恰好满limit条的最后一页）不返回下一页游标"""
+        admin = AdminHTTPHandler.detached(self.db)
+        user = UserHTTPHandler.detached(self.db)
+        for handler, path in ((admin, '/get_vehicles?'), (user, '/get_user_vehicles?name=owner&')):
+            status, body = handler.handle_route('GET', path + 'limit=7')
+            self.assertEqual((status, len(body["data"]), body["next_cursor"]), (200, 7, None), path)
+
+            seen = []
+            cursor = '0'
+            while cursor is not None:
+                status, body = handler.handle_route('GET', path + 'limit=3&cursor=' + cursor)
+                self.assertEqual(status, 200, body)
+                seen.extend(v["vehicle_id"] for v in body["data"])
+                cursor = body["next_cursor"]
+            self.assertEqual(seen, [f"CAR{i:03d}" for i in range(7)], path)
+
+if __name__ == "__main__":
+    unittest.main()
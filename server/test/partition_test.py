@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB, next_page_cursor
+
+class TestPassagePartitions(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_partition_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.assertTrue(self.db.add_vehicle("TEST001", "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        _, gate = self.db.get_sensor_status("GATE001")
+        self.gate_id = gate["id"]
+
+        # 启用分区前写入一条记录，保留在原表中
+        self.assertTrue(self.db.add_passage_records_bulk([("TEST001", self.gate_id, "2024-01-15 08:00:00")])[0])
+        self.assertTrue(self.db.enable_passage_partitioning()[0])
+        events = [
+            ("TEST001", self.gate_id, "2024-02-01 08:00:00"),
+            ("TEST001", self.gate_id, "2024-02-29 18:00:00"),
+            ("TEST001", self.gate_id, "2024-03-01 08:00:00"),
+            ("TEST001", self.gate_id, "2024-03-01 18:00:00"),
+        ]
+        success, results = self.db.add_passage_records_bulk(events)
+        self.assertTrue(success and all(ok for ok, _ in results), results)
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def test_records_routed_to_monthly_partitions(self):
+        """测试记录按月写入分区表"""
+        success, partitions = self.db.get_passage_partitions()
+        self.assertTrue(success, partitions)
+        self.assertEqual([(p["month"], p["records"]) for p in partitions], [("2024-03", 2), ("2024-02", 2)])
+
+    def test_unified_query_spans_partitions(self):
+        """测试查询跨分区和原表合并排序，游标翻页完整"""
+        success, records, total = self.db.get_passage_by_vehicle("TEST001", limit=2)
+        self.assertTrue(success, records)
+        self.assertEqual(total, 5)
+        self.assertEqual([r["passage_time"] for r in records], ["2024-03-01 18:00:00", "2024-03-01 08:00:00"])
+
+        times = [r["passage_time"] for r in records]
+        after = next_page_cursor("passages", records, 2)
+        while after:
+            _, page, _ = self.db.get_passage_by_vehicle("TEST001", limit=2, after=after)
+            times += [r["passage_time"] for r in page]
+            after = next_page_cursor("passages", page, 2)
+        self.assertEqual(times[-1], "2024-01-15 08:00:00")
+        self.assertEqual(len(times), 5)
+        self.assertEqual(self.db.get_passage_by_sensor(self.gate_id, limit=3, offset=3)[1][0]["passage_time"],
+                         "2024-02-01 08:00:00")
+
+    def test_retention_drops_whole_partitions(self):
+        """测试保留策略整体删除分区并同步计数"""
+        success, message = self.db.drop_passage_partitions_before("2024-03")
+        self.assertTrue(success, message)
+        _, partitions = self.db.get_passage_partitions()
+        self.assertEqual([p["month"] for p in partitions], ["2024-03"])
+        self.assertEqual(self.db.get_passage_by_vehicle("TEST001")[2], 3)
+        self.assertEqual(self.db.get_passage_by_sensor(self.gate_id)[2], 3)
+
+        # 重建计数应得到相同结果
+        self.assertTrue(self.db.rebuild_row_counters()[0])
+        self.assertEqual(self.db.get_passage_by_vehicle("TEST001")[2], 3)
+
+    def test_delete_by_time_across_partitions(self):
+        """测试按时间删除时整月分区直接删除，其余按范围删除"""
+        success, message = self.db.delete_passage_records_by_time("2024-01-01 00:00:00", "2024-03-01 12:00:00")
+        self.assertTrue(success, message)
+        self.assertEqual(message, "成功删除 4 条记录")
+        _, partitions = self.db.get_passage_partitions()
+        self.assertEqual([p["month"] for p in partitions], ["2024-03"])
+        _, records, total = self.db.get_passage_by_vehicle("TEST001")
+        self.assertEqual(total, 1)
+        self.assertEqual(records[0]["passage_time"], "2024-03-01 18:00:00")
+
+    def test_partitioning_setting_persisted(self):
+        """测试分区设置保存在数据库中"""
+        other = VehicleDB()
+        self.assertTrue(other.initialize(self.test_db_path))
+        self.assertTrue(other.partitioning)
+        other.close_thread_resources()
+        other.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+import sys
+import os
+import shutil
+import json
+import struct
+import zlib
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB, next_page_cursor
+from passage_archive import encode_segment, decode_segment, archive_dir, _column_bytes, _delta, _to_epoch
+
+class TestPassageArchive(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_archive_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        for vehicle_id in ("TEST001", "TEST002"):
+            self.assertTrue(self.db.add_vehicle(vehicle_id, "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        _, gate = self.db.get_sensor_status("GATE001")
+        self.gate_id = gate["id"]
+
+        # 一月、二月各10条，三月5条，两辆车交替
+        events = []
+        for month, days in (("01", 10), ("02", 10), ("03", 5)):
+            for day in range(1, days + 1):
+                vehicle_id = "TEST001" if day % 2 else "TEST002"
+                events.append((vehicle_id, self.gate_id, f"2024-{month}-{day:02d} 08:00:00"))
+        success, results = self.db.add_passage_records_bulk(events)
+        self.assertTrue(success and all(ok for ok, _ in results), results)
+        _, self.expected, _ = self.db.get_passage_by_vehicle("TEST001", limit=100)
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+        shutil.rmtree(archive_dir(self.test_db_path), ignore_errors=True)
+
+    def test_segment_roundtrip(self):
+        """测试列式编码解码还原全部字段"""
+        rows = [
+            (7, "京A12345", 3, "2024-01-02 08:00:00", "2024-01-02 08:00:01"),
+            (5, "京B00001", 1, "2024-01-01 23:59:59", "2024-01-02 00:00:00"),
+            (9, "京A12345", 1, "2024-01-02 08:00:00", None),
+        ]
+        decoded = decode_segment(encode_segment(rows))
+        self.assertEqual(decoded, [
+            (5, "京B00001", 1, "2024-01-01 23:59:59", "2024-01-02 00:00:00"),
+            (7, "京A12345", 3, "2024-01-02 08:00:00", "2024-01-02 08:00:01"),
+            (9, "京A12345", 1, "2024-01-02 08:00:00", "2024-01-02 08:00:00"),
+        ])
+
+    def test_read_pva1_segment(self):
+        """测试仍可解码旧格式（整段压缩）的段文件"""
+        rows = [(5, "京B00001", 1, "2024-01-01 23:59:59", "2024-01-02 00:00:00"),
+                (7, "京A12345", 3, "2024-01-02 08:00:00", "2024-01-02 08:00:01")]
+        times = [_to_epoch(r[3]) for r in rows]
+        columns = [_delta([5, 7]), [1, 0], [0, 1], _delta(times), [1, 1]]
+        header = json.dumps({"count": 2, "vehicles": ["京A12345", "京B00001"], "sensors": [1, 3]}).encode('utf-8')
+        body = struct.pack("<I", len(header)) + header + b"".join(_column_bytes(c) for c in columns)
+        self.assertEqual(decode_segment(b"PVA1" + zlib.compress(body)), rows)
+
+    def test_query_reads_only_vehicle_block(self):
+        """测试按车辆查询只读取该车辆的数据块：其他车辆的数据块损坏不影响查询"""
+        self.assertTrue(self.db.archive_passages_before("2024-02-06 00:00:00")[0])
+        cursor = self.db._get_thread_cursor()
+        cursor.execute("""SELECT archive, block_offset, block_length FROM passage_archive_vehicles
+                          WHERE vehicle_id = 'TEST002'""")
+        for archive, offset, length in cursor.fetchall():
+            with open(os.path.join(archive_dir(self.test_db_path), archive + ".pva"), "r+b") as f:
+                f.seek(offset)
+                f.write(b"\0" * length)
+        _, records, total = self.db.get_passage_by_vehicle("TEST001", limit=100)
+        self.assertEqual((records, total), (self.expected, len(self.expected)))
+
+    def test_query_segment_without_block_index(self):
+        """测试迁移14之前登记的段（没有块位置）解码整段后筛选"""
+        self.assertTrue(self.db.archive_passages_before("2024-02-06 00:00:00")[0])
+        cursor = self.db._get_thread_cursor()
+        cursor.execute("UPDATE passage_archive_vehicles SET block_offset = NULL, block_length = NULL")
+        self.db._commit()
+        _, records, total = self.db.get_passage_by_vehicle("TEST001", limit=100)
+        self.assertEqual((records, total), (self.expected, len(self.expected)))
+
+    def test_archive_moves_old_records(self):
+        """测试早于截止时间的记录按月移入段文件"""
+        success, result = self.db.archive_passages_before("2024-02-06 00:00:00")
+        self.assertTrue(success, result)
+        self.assertEqual(result["archived"], 15)
+        self.assertEqual(len(result["segments"]), 2)
+
+        cursor = self.db._get_thread_cursor()
+        cursor.execute("SELECT COUNT(*) FROM passage_records")
+        self.assertEqual(cursor.fetchone()[0], 10)
+
+        _, archives = self.db.get_passage_archives()
+        self.assertEqual([(a["month"], a["records"]) for a in archives], [("2024-02", 5), ("2024-01", 10)])
+        for archive in archives:
+            self.assertTrue(os.path.exists(os.path.join(archive_dir(self.test_db_path), archive["name"] + ".pva")))
+
+    def test_query_merges_archive(self):
+        """测试按车辆查询透明合并在线记录和归档记录，偏移和游标翻页一致"""
+        self.assertTrue(self.db.archive_passages_before("2024-02-06 00:00:00")[0])
+
+        success, records, total = self.db.get_passage_by_vehicle("TEST001", limit=100)
+        self.assertTrue(success, records)
+        self.assertEqual(total, len(self.expected))
+        self.assertEqual(records, self.expected)
+
+        _, page, _ = self.db.get_passage_by_vehicle("TEST001", limit=4, offset=4)
+        self.assertEqual(page, self.expected[4:8])
+
+        collected = []
+        after = None
+        while True:
+            _, page, _ = self.db.get_passage_by_vehicle("TEST001", limit=3, after=after, with_total=False)
+            collected += page
+            after = next_page_cursor("passages", page, 3)
+            if not after:
+                break
+        self.assertEqual(collected, self.expected)
+
+    def test_offset_page_within_live_records(self):
+        """测试有归档时，未涉及归档的偏移分页只返回请求的一页"""
+        self.assertTrue(self.db.archive_passages_before("2024-01-04 00:00:00")[0])
+        success, page, total = self.db.get_passage_by_vehicle("TEST001", limit=3, offset=3)
+        self.assertTrue(success, page)
+        self.assertEqual(total, len(self.expected))
+        self.assertEqual(page, self.expected[3:6])
+
+    def test_archive_partitions(self):
+        """测试分区中的记录归档后删除整月已清空的分区"""
+        self.assertTrue(self.db.enable_passage_partitioning()[0])
+        self.assertTrue(self.db.add_passage_records_bulk([("TEST001", self.gate_id, "2024-04-01 08:00:00")])[0])
+        success, result = self.db.archive_passages_before("2024-05-01 00:00:00")
+        self.assertTrue(success, result)
+        self.assertEqual(result["archived"], 26)
+        _, partitions = self.db.get_passage_partitions()
+        self.assertEqual(partitions, [])
+        _, records, total = self.db.get_passage_by_vehicle("TEST001", limit=1)
+        self.assertEqual(total, len(self.expected) + 1)
+        self.assertEqual(records[0]["passage_time"], "2024-04-01 08:00:00")
+
+    def test_delete_vehicle_hides_archive(self):
+        """测试删除车辆后不再返回其归档记录"""
+        self.assertTrue(self.db.archive_passages_before("2024-04-01 00:00:00")[0])
+        self.assertTrue(self.db.delete_vehicle("TEST001")[0])
+        self.assertTrue(self.db.add_vehicle("TEST001", "owner")[0])
+        _, records, total = self.db.get_passage_by_vehicle("TEST001")
+        self.assertEqual((records, total), ([], 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+from passage_purge import PassagePurgeJob, get_purge_status
+
+class TestPassagePurge(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_purge_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.assertTrue(self.db.add_vehicle("TEST001", "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        _, gate = self.db.get_sensor_status("GATE001")
+        self.gate_id = gate["id"]
+
+        # 原表中30条一月记录和2条三月记录
+        events = [("TEST001", self.gate_id, f"2024-01-{day:02d} 08:00:00") for day in range(1, 31)]
+        events += [("TEST001", self.gate_id, "2024-03-01 08:00:00"), ("TEST001", self.gate_id, "2024-03-02 08:00:00")]
+        success, results = self.db.add_passage_records_bulk(events)
+        self.assertTrue(success and all(ok for ok, _ in results), results)
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def _passage_times(self):
+        _, records, total = self.db.get_passage_by_vehicle("TEST001", limit=100)
+        return sorted(r["passage_time"] for r in records), total
+
+    def test_purge_in_batches(self):
+        """测试分批删除早于截止时间的记录，计数同步更新"""
+        progress = []
+        job = PassagePurgeJob(self.db, "2024-02-01 00:00:00", batch_size=7, pause=0, progress=progress.append)
+        success, state = job.run()
+        self.assertTrue(success, state)
+        self.assertEqual(state["status"], "done")
+        self.assertEqual(state["deleted"], 30)
+        self.assertGreater(len(progress), 4, "应分多个批次执行")
+
+        times, total = self._passage_times()
+        self.assertEqual(times, ["2024-03-01 08:00:00", "2024-03-02 08:00:00"])
+        self.assertEqual(total, 2)
+
+        success, status = get_purge_status(self.db)
+        self.assertTrue(success, status)
+        self.assertEqual(status["status"], "done")
+        self.assertIsNotNone(status["finished_at"])
+
+    def test_resume_after_stop(self):
+        """测试任务中途停止后再次运行从保存的位置继续"""
+        cutoff = "2024-02-01 00:00:00"
+        first = PassagePurgeJob(self.db, cutoff, batch_size=5, pause=0)
+        # 第一个批次结束后请求停止
+        first.progress = lambda state: first.stop_event.set()
+        success, state = first.run()
+        self.assertTrue(success, state)
+        self.assertEqual(state["status"], "running")
+        self.assertEqual(state["deleted"], 5)
+
+        success, status = get_purge_status(self.db)
+        self.assertEqual((status["source"], status["last_id"], status["deleted"]), ("passage_records", 5, 5))
+
+        success, state = PassagePurgeJob(self.db, cutoff, batch_size=5, pause=0).run()
+        self.assertTrue(success, state)
+        self.assertEqual(state["status"], "done")
+        self.assertEqual(state["deleted"], 30)
+        self.assertEqual(self._passage_times()[1], 2)
+
+    def test_purge_partitions(self):
+        """测试整月早于截止时间的分区直接删除，跨截止时间的分区按批删除"""
+        self.assertTrue(self.db.enable_passage_partitioning()[0])
+        events = [("TEST001", self.gate_id, f"2024-04-{day:02d} 08:00:00") for day in range(1, 11)]
+        events += [("TEST001", self.gate_id, "2024-05-20 08:00:00")]
+        self.assertTrue(self.db.add_passage_records_bulk(events)[0])
+
+        success, state = PassagePurgeJob(self.db, "2024-04-06 00:00:00", batch_size=3, pause=0).run()
+        self.assertTrue(success, state)
+        self.assertEqual(state["deleted"], 30 + 2 + 5)
+
+        times, total = self._passage_times()
+        self.assertEqual(times[0], "2024-04-06 08:00:00")
+        self.assertEqual(total, 6)
+        _, partitions = self.db.get_passage_partitions()
+        self.assertEqual([p["month"] for p in partitions], ["2024-05", "2024-04"])
+
+    def test_incremental_vacuum_frees_pages(self):
+        """测试清理后回收空闲页"""
+        success, state = PassagePurgeJob(self.db, "2024-12-01 00:00:00", pause=0).run()
+        self.assertTrue(success, state)
+        self.assertIn("freed_pages", state)
+        cursor = self.db._get_thread_cursor()
+        cursor.execute("PRAGMA freelist_count")
+        self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_incremental_vacuum_reports_freed(self):
+        """测试回收页数按清理前后空闲页数计算"""
+        cursor = self.db._get_thread_cursor()
+        cursor.execute("CREATE TABLE scratch (data BLOB)")
+        cursor.executemany("INSERT INTO scratch VALUES (zeroblob(4000))", [()] * 50)
+        cursor.execute("DROP TABLE scratch")
+        self.db._commit()
+        cursor.execute("PRAGMA freelist_count")
+        before = cursor.fetchone()[0]
+        self.assertGreater(before, 0)
+        success, state = self.db.incremental_vacuum(max_pages=2, pause=0)
+        self.assertTrue(success, state)
+        cursor.execute("PRAGMA freelist_count")
+        self.assertEqual(state['freed_pages'], before - cursor.fetchone()[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+import threading
+
+class TestPragmaProfile(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_pragma_profile_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def test_default_profile_uses_wal(self):
+        """测试默认配置启用WAL并完整同步"""
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+        settings = self.db.get_pragma_settings()
+        self.assertEqual(settings["journal_mode"], "WAL", "未启用WAL")
+        self.assertEqual(settings["synchronous"], "FULL", "durable配置应完整同步")
+
+    def test_throughput_profile_with_override(self):
+        """测试throughput预设及单项覆盖"""
+        self.assertTrue(self.db.initialize(self.test_db_path, profile="throughput",
+                                           pragmas={"busy_timeout": 2500}))
+        settings = self.db.get_pragma_settings()
+        self.assertEqual(settings["synchronous"], "NORMAL")
+        self.assertEqual(settings["temp_store"], "MEMORY")
+        self.assertEqual(settings["busy_timeout"], 2500, "覆盖项未生效")
+
+    def test_settings_applied_to_every_thread(self):
+        """测试其他线程的连接同样应用配置"""
+        self.assertTrue(self.db.initialize(self.test_db_path, profile="throughput"))
+        result = {}
+
+        def worker():
+            result.update(self.db.get_pragma_settings())
+            self.db.close_thread_resources()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        self.assertEqual(result["cache_size"], -65536, "线程连接未应用配置")
+
+    def test_invalid_profile_rejected(self):
+        """测试非法配置导致初始化失败"""
+        self.assertFalse(self.db.initialize(self.test_db_path, profile="unknown"))
+        self.assertFalse(self.db.initialize(self.test_db_path, pragmas={"synchronous": "fast"}))
+
+if __name__ == "__main__":
+    unittest.main()
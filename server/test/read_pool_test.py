@@ -0,0 +1,100 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB, ReadConnectionPool, get_read_pool
+import sqlite3
+import threading
+import time
+
+class TestReadConnectionPool(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_read_pool_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        get_read_pool(self.test_db_path).close()
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def test_session_reads_through_read_only_connection(self):
+        """测试会话内查询使用只读连接且能读到已提交数据"""
+        with self.db.read_session():
+            conn = self.db.local.read_conn
+            self.assertIsNotNone(conn)
+            self.assertTrue(self.db.get_user_id_by_name("owner")[0])
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM users")
+            # 会话中的写操作仍走写连接
+            self.assertTrue(self.db.add_user("alice", "alice123")[0])
+            self.assertTrue(self.db.get_user_id_by_name("alice")[0], "只读连接未读到已提交数据")
+        self.assertIsNone(self.db.local.read_conn)
+
+    def test_pool_bounded_and_reused(self):
+        """测试连接数不超过上限且连接被复用"""
+        pool = ReadConnectionPool(self.test_db_path, max_size=2)
+        a = pool.acquire()
+        b = pool.acquire()
+        self.assertIsNone(pool.acquire(timeout=0.05), "连接数超过上限")
+        pool.release(a)
+        self.assertIs(pool.acquire(timeout=0.05), a, "空闲连接未被复用")
+
+        # 等待中的借用方在归还后立即获得连接
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(pool.acquire(timeout=2)))
+        waiter.start()
+        time.sleep(0.05)
+        pool.release(b)
+        waiter.join()
+        self.assertIs(result[0], b)
+        self.assertEqual(pool.get_stats()['size'], 2)
+        pool.release(a)
+        pool.release(b)
+        pool.close()
+
+    def test_reserve_and_non_blocking_acquire(self):
+        """测试预留连接提高上限、取消后恢复，timeout=0时连接池已满立即返回"""
+        pool = ReadConnectionPool(self.test_db_path, max_size=2)
+        pool.reserve(3)
+        pool.reserve(2)
+        self.assertEqual(pool.get_stats()['max_size'], 5)
+        conns = [pool.acquire() for _ in range(5)]
+        started = time.monotonic()
+        self.assertIsNone(pool.acquire(timeout=0))
+        self.assertLess(time.monotonic() - started, 0.05)
+        pool.reserve(-5)
+        self.assertEqual(pool.get_stats()['max_size'], 2)
+        for conn in conns:
+            pool.release(conn)
+        pool.close()
+
+    def test_idle_eviction_and_health_check(self):
+        """测试空闲连接回收和失效连接替换"""
+        pool = ReadConnectionPool(self.test_db_path, max_size=2, idle_timeout=0.01)
+        pool.release(pool.acquire())
+        time.sleep(0.02)
+        conn = pool.acquire()
+        self.assertEqual(pool.get_stats()['closed'], 1, "空闲连接未被回收")
+
+        pool.health_check_interval = 0
+        conn.close()
+        pool.release(conn)
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, conn)
+        self.assertEqual(replacement.execute("SELECT COUNT(*) FROM users").fetchone()[0], 2)
+        pool.release(replacement)
+        pool.close()
+
+if __name__ == "__main__":
+    unittest.main()
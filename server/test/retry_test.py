@@ -0,0 +1,100 @@
+import unittest
+import sqlite3
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB, _is_busy_error
+
+class TestLockRetry(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_retry_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        # 缩短忙等待时间，使锁冲突很快进入退避重试
+        self.assertTrue(self.db.initialize(self.test_db_path, pragmas={"busy_timeout": 20}), "数据库初始化失败")
+        self.holder = sqlite3.connect(self.test_db_path, timeout=0, isolation_level=None,
+                                      check_same_thread=False)
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        if self.holder.in_transaction:
+            self.holder.execute("ROLLBACK")
+        self.holder.close()
+        self.db.close()
+        self.db.close_thread_resources()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def test_write_retried_until_lock_released(self):
+        """测试写锁被其他连接占用时退避重试，锁释放后写入成功并记录等锁统计"""
+        self.holder.execute("BEGIN IMMEDIATE")
+        timer = threading.Timer(0.3, lambda: self.holder.execute("COMMIT"))
+        timer.start()
+        try:
+            self.assertEqual(self.db.add_user("alice", "alice123"), (True, "用户添加成功"))
+        finally:
+            timer.join()
+
+        stats = self.db.get_retry_stats()["add_user"]
+        self.assertEqual(stats["contended"], 1)
+        self.assertGreater(stats["retries"], 0)
+        self.assertGreaterEqual(stats["lock_wait"], 0.2)
+        self.assertEqual(stats["failures"], 0)
+        self.assertTrue(self.db.verify_user("alice", "alice123")[0])
+
+    def test_deadline_exceeded(self):
+        """测试超过重试期限后抛出锁冲突错误并计入最终失败，其他错误不重试"""
+        self.db.retry_policy["deadline"] = 0.2
+        self.holder.execute("BEGIN IMMEDIATE")
+        with self.assertRaises(sqlite3.OperationalError):
+            self.db.add_sensor("GATE001", "东门", "入口大门", True, True)
+        self.holder.execute("COMMIT")
+        self.assertEqual(self.db.get_retry_stats()["add_sensor"]["failures"], 1)
+
+        # 唯一约束冲突按原方式返回失败结果，不进入统计
+        self.db.reset_retry_stats()
+        self.assertTrue(self.db.add_user("bob", "bob123")[0])
+        self.assertFalse(self.db.add_user("bob", "bob123")[0])
+        self.assertEqual(self.db.get_retry_stats(), {})
+
+    def test_error_classification(self):
+        """测试按错误码区分锁冲突与其他数据库错误"""
+        self.holder.execute("BEGIN IMMEDIATE")
+        other = sqlite3.connect(self.test_db_path, timeout=0)
+        try:
+            with self.assertRaises(sqlite3.OperationalError) as busy:
+                other.execute("BEGIN IMMEDIATE")
+            with self.assertRaises(sqlite3.OperationalError) as missing:
+                other.execute("SELECT * FROM missing_table")
+        finally:
+            other.close()
+        self.assertTrue(_is_busy_error(busy.exception))
+        self.assertFalse(_is_busy_error(missing.exception))
+        self.assertFalse(_is_busy_error(sqlite3.IntegrityError("UNIQUE constraint failed")))
+        self.assertTrue(_is_busy_error(sqlite3.OperationalError("database table is locked")))
+
+    def test_memory_database_with_writer(self):
+        """测试内存数据库启用写线程时写操作不会因 memory_lock 互相等待"""
+        db = VehicleDB()
+        self.assertTrue(db.initialize(":memory:"), "数据库初始化失败")
+        db.start_writer()
+        results = []
+        worker = threading.Thread(target=lambda: results.append(db.add_user("alice", "alice123")), daemon=True)
+        worker.start()
+        worker.join(10)
+        try:
+            self.assertFalse(worker.is_alive(), "写操作未完成")
+            self.assertEqual(results, [(True, "用户添加成功")])
+            self.assertTrue(db.verify_user("alice", "alice123")[0])
+        finally:
+            if not worker.is_alive():
+                db.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+
+class TestRowCounters(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_row_counter_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.assertTrue(self.db.add_vehicle("CAR001", "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_vehicle("CAR002", "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        self.assertTrue(self.db.add_sensor("SENSOR001", "停车场A区", "普通传感器", True, False)[0], "添加传感器失败")
+        _, gate = self.db.get_sensor_status("GATE001")
+        _, sensor = self.db.get_sensor_status("SENSOR001")
+        self.gate_id = gate["id"]
+        self.sensor_id = sensor["id"]
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def _count(self, sql, params=()):
+        cursor = self.db._get_thread_cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0]
+
+    def test_totals_match_table_counts(self):
+        """测试计数表与实际行数一致"""
+        self.assertEqual(self.db.get_users()[2], self._count("SELECT COUNT(*) FROM users"))
+        self.assertEqual(self.db.get_vehicles()[2], 2)
+        self.assertEqual(self.db.get_sensors()[2], 2)
+
+    def test_passage_counters_follow_writes(self):
+        """测试通行记录的按车辆、按传感器计数随增删变化"""
+        self.db.add_passage_record("CAR001", self.gate_id)
+        self.db.add_passage_record("CAR001", self.sensor_id)
+        self.db.add_passage_record("CAR002", self.gate_id)
+        self.assertEqual(self.db.get_passage_by_vehicle("CAR001")[2], 2)
+        self.assertEqual(self.db.get_passage_by_sensor(self.gate_id)[2], 2)
+
+        self.assertTrue(self.db.delete_vehicle("CAR001")[0])
+        self.assertEqual(self.db.get_passage_by_sensor(self.gate_id)[2], 1, "删除车辆后计数未更新")
+        self.assertEqual(self.db.get_vehicles()[2], 1)
+
+    def test_skip_total(self):
+        """测试with_total=False时不返回总数"""
+        success, vehicles, total = self.db.get_vehicles(with_total=False)
+        self.assertTrue(success)
+        self.assertEqual(len(vehicles), 2)
+        self.assertIsNone(total)
+
+    def test_rebuild_counters(self):
+        """测试计数表被破坏后可重建"""
+        self.db.add_passage_record("CAR002", self.gate_id)
+        cursor = self.db._get_thread_cursor()
+        cursor.execute("UPDATE row_counters SET value = 99")
+        self.db._get_thread_connection().commit()
+        self.assertTrue(self.db.rebuild_row_counters()[0])
+        self.assertEqual(self.db.get_passage_by_vehicle("CAR002")[2], 1)
+        self.assertEqual(self.db.get_sensors()[2], 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+
+class TestSensorRegistry(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_sensor_registry_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def test_write_through_invalidation(self):
+        """测试本进程的传感器写操作立即反映到缓存"""
+        sensor = self.db.lookup_sensor("GATE001")
+        self.assertIsNotNone(sensor)
+        self.assertEqual(sensor[1:], (True, True))
+
+        self.assertTrue(self.db.update_sensor_status("GATE001", False)[0])
+        self.assertFalse(self.db.lookup_sensor("GATE001")[1], "停用后缓存未失效")
+
+        self.assertTrue(self.db.add_sensor("SENSOR001", "停车场A区", "普通传感器", True, False)[0])
+        self.assertEqual(self.db.lookup_sensor("SENSOR001")[1:], (True, False))
+
+        self.assertTrue(self.db.delete_sensor("SENSOR001")[0])
+        self.assertIsNone(self.db.lookup_sensor("SENSOR001"), "删除后缓存未失效")
+
+    def test_cached_lookup_runs_no_sql(self):
+        """测试缓存命中时不执行SQL"""
+        self.db.lookup_sensor("GATE001")
+        statements = []
+        self.db._get_thread_connection().set_trace_callback(statements.append)
+        for _ in range(100):
+            self.db.lookup_sensor("GATE001")
+        self.db._get_thread_connection().set_trace_callback(None)
+        self.assertEqual(statements, [])
+
+    def test_changes_from_other_process_detected(self):
+        """测试其他进程的修改通过版本号被发现"""
+        self.db.sensor_registry.check_interval = 0
+        self.assertTrue(self.db.lookup_sensor("GATE001")[1])
+
+        other = VehicleDB()
+        self.assertTrue(other.initialize(self.test_db_path))
+        self.assertTrue(other.update_sensor_status("GATE001", False)[0])
+        other.close_thread_resources()
+        other.close()
+
+        self.assertFalse(self.db.lookup_sensor("GATE001")[1], "未发现其他实例的修改")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import next_page_cursor
+from sharded_vehicle_db import ShardedVehicleDB
+
+class TestShardedVehicleDB(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_sharded_test.db"
+        self.shard_count = 3
+        self._remove_db_files()
+        self.db = ShardedVehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path, shards=self.shard_count), "数据库初始化失败")
+
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.vehicle_ids = [f"TEST{i:03d}" for i in range(12)]
+        for vehicle_id in self.vehicle_ids:
+            self.assertTrue(self.db.add_vehicle(vehicle_id, "owner")[0], "添加车辆失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        self.gate_id = self.db.get_sensor_status("GATE001")[1]["id"]
+
+        events = [(vehicle_id, self.gate_id, f"2024-01-01 08:{i:02d}:00")
+                  for i, vehicle_id in enumerate(self.vehicle_ids)]
+        events += [(vehicle_id, self.gate_id, "2024-01-02 08:00:00") for vehicle_id in self.vehicle_ids[:4]]
+        success, results = self.db.add_passage_records_bulk(events)
+        self.assertTrue(success and all(ok for ok, _ in results), results)
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close_thread_resources()
+        self.db.close()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        paths = [self.test_db_path] + [ShardedVehicleDB.shard_path(self.test_db_path, i) for i in range(self.shard_count)]
+        for path in paths:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def test_vehicles_distributed_across_shards(self):
+        """测试车辆按哈希分布到各分片，用户和传感器复制到每个分片"""
+        counts = [shard.get_vehicles(limit=100)[2] for shard in self.db.shards]
+        self.assertEqual(sum(counts), len(self.vehicle_ids))
+        self.assertGreater(min(counts), 0)
+        for shard in self.db.shards:
+            self.assertTrue(shard.get_sensor_status("GATE001")[0])
+            self.assertTrue(shard.get_user_id_by_name("owner")[0])
+
+    def test_fan_out_vehicle_list(self):
+        """测试跨分片车辆列表归并排序，偏移和游标分页一致"""
+        success, vehicles, total = self.db.get_vehicles(limit=100)
+        self.assertTrue(success, vehicles)
+        self.assertEqual(total, len(self.vehicle_ids))
+        self.assertEqual([v["vehicle_id"] for v in vehicles], self.vehicle_ids)
+
+        _, page, _ = self.db.get_vehicles(limit=4, offset=4)
+        self.assertEqual([v["vehicle_id"] for v in page], self.vehicle_ids[4:8])
+
+        collected, after = [], None
+        while True:
+            _, page, _ = self.db.get_vehicles(limit=5, after=after, with_total=False)
+            collected += [v["vehicle_id"] for v in page]
+            after = next_page_cursor("vehicles", page, 5)
+            if not after:
+                break
+        self.assertEqual(collected, self.vehicle_ids)
+
+    def test_fan_out_passages_by_time(self):
+        """测试跨分片按时间范围查询通行记录，ID在分片之间唯一"""
+        success, records, total = self.db.get_passages_by_time("2024-01-01 00:00:00", "2024-01-03 00:00:00", limit=100)
+        self.assertTrue(success, records)
+        self.assertEqual(total, 16)
+        keys = [(r["passage_time"], r["id"]) for r in records]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertEqual(len({r["id"] for r in records}), 16)
+
+        collected, after = [], None
+        while True:
+            _, page, _ = self.db.get_passage_by_sensor(self.gate_id, limit=3, after=after)
+            collected += page
+            after = next_page_cursor("passages", page, 3)
+            if not after:
+                break
+        self.assertEqual(collected, records)
+
+    def test_routing_and_occupancy(self):
+        """测试按车辆路由的读写及在校车辆数汇总"""
+        success, records, total = self.db.get_passage_by_vehicle("TEST000")
+        self.assertTrue(success, records)
+        self.assertEqual(total, 2)
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 8))
+        self.assertTrue(self.db.delete_vehicle("TEST000")[0])
+        self.assertFalse(self.db.get_vehicle_status("TEST000")[1])
+
+    def test_shard_count_is_fixed(self):
+        """测试分片数与已有数据库不一致时拒绝初始化"""
+        other = ShardedVehicleDB()
+        self.assertFalse(other.initialize(self.test_db_path, shards=self.shard_count + 1))
+
+    def test_delete_sensor_across_shards(self):
+        """测试删除传感器时删除各分片中的副本及通行记录"""
+        self.assertTrue(self.db.delete_sensor("GATE001")[0])
+        for shard in self.db.shards:
+            self.assertFalse(shard.get_sensor_status("GATE001")[1])
+        _, records, total = self.db.get_passages_by_time("2024-01-01 00:00:00", "2024-01-03 00:00:00")
+        self.assertEqual((records, total), ([], 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+import sqlite3
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+
+class TestVehicleStateTable(unittest.TestCase):
+    def setUp(self):
+        """测试前的初始化工作"""
+        self.test_db_path = "vehicle_db_state_test.db"
+        self._remove_db_files()
+        self.db = VehicleDB()
+        self.assertTrue(self.db.initialize(self.test_db_path), "数据库初始化失败")
+        self.assertTrue(self.db.add_user("owner", "owner123")[0], "添加用户失败")
+        self.assertTrue(self.db.add_sensor("GATE001", "东门", "入口大门", True, True)[0], "添加传感器失败")
+        self.assertTrue(self.db.add_sensor("ROAD001", "主干道", "道路", True, False)[0], "添加传感器失败")
+        self.gate_id = self.db.get_sensor_status("GATE001")[1]["id"]
+        self.road_id = self.db.get_sensor_status("ROAD001")[1]["id"]
+        for i in range(4):
+            self.assertTrue(self.db.add_vehicle(f"CAR{i:03d}", "owner")[0], "添加车辆失败")
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        self.db.close()
+        self.db.close_thread_resources()
+        self._remove_db_files()
+
+    def _remove_db_files(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def _stored_state(self, vehicle_id):
+        """直接读取车辆表中已写回的状态"""
+        conn = sqlite3.connect(self.test_db_path)
+        try:
+            return conn.execute(
+                "SELECT is_on_campus, last_sensor_id FROM vehicles WHERE vehicle_id = ?", (vehicle_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+    def test_write_behind_and_flush(self):
+        """测试通行只更新内存状态，批量写回后车辆表一致"""
+        self.db.enable_vehicle_state_table(flush_interval=3600)
+        self.assertTrue(self.db.add_passage_record("CAR000", self.gate_id)[0])
+        self.assertTrue(self.db.add_passage_record("CAR001", self.road_id)[0])
+
+        self.assertEqual(self._stored_state("CAR000"), (0, None), "车辆表不应逐条更新")
+        self.assertEqual(self.db.get_vehicle_status("CAR000")[1]["is_on_campus"], 1)
+        self.assertEqual(self.db.get_vehicles()[1][0]["is_on_campus"], 1)
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 1))
+
+        self.assertEqual(self.db.flush_vehicle_states(), 2)
+        self.assertEqual(self._stored_state("CAR000"), (1, self.gate_id))
+        self.assertEqual(self._stored_state("CAR001"), (0, self.road_id))
+        self.assertEqual(self.db.flush_vehicle_states(), 0)
+        self.assertTrue(self.db.reconcile_campus_occupancy(repair=False)[1]["consistent"])
+
+    def test_recover_after_crash(self):
+        """测试未写回即退出后，按检查点重放通行记录恢复状态"""
+        self.assertTrue(self.db.add_passage_record("CAR000", self.gate_id)[0])
+        self.db.enable_vehicle_state_table(flush_interval=3600)
+        events = [("CAR000", self.gate_id, None), ("CAR001", self.gate_id, None), ("CAR002", self.road_id, None)]
+        self.assertTrue(self.db.add_passage_records_bulk(events)[0])
+        self.assertTrue(self.db.add_passage_record("CAR001", self.gate_id)[0])
+        self.assertTrue(self.db.add_passage_record("CAR003", self.gate_id)[0])
+        expected = {f"CAR{i:03d}": self.db.get_vehicle_status(f"CAR{i:03d}")[1]["is_on_campus"] for i in range(4)}
+        self.assertEqual(expected, {"CAR000": 0, "CAR001": 0, "CAR002": 0, "CAR003": 1})
+
+        # 模拟进程崩溃：丢弃内存状态，不写回
+        states, self.db.vehicle_states = self.db.vehicle_states, None
+        states.stopping.set()
+        states.wakeup.set()
+        states.thread.join()
+        self.assertEqual(self._stored_state("CAR003"), (0, None))
+
+        other = VehicleDB()
+        self.assertTrue(other.initialize(self.test_db_path))
+        self.assertEqual(other.enable_vehicle_state_table(flush_interval=3600), 4)
+        self.assertEqual({v: other.vehicle_states.get(v)[0] for v in expected}, expected)
+        # 恢复结果立即写回车辆表
+        self.assertEqual(self._stored_state("CAR003"), (1, self.gate_id))
+        self.assertEqual(self._stored_state("CAR002"), (0, self.road_id))
+        other.close()
+        other.close_thread_resources()
+
+    def test_recover_late_historical_passage(self):
+        """测试补录早于检查点的历史通行后崩溃，恢复时按写入顺序重放，在校状态不丢失"""
+        self.assertTrue(self.db.add_passage_record("CAR000", self.gate_id)[0])
+        self.db.enable_vehicle_state_table(flush_interval=3600)
+        events = [("CAR000", self.gate_id, "2020-01-01 08:00:00"), ("CAR001", self.gate_id, "2020-01-01 08:00:00")]
+        self.assertTrue(self.db.add_passage_records_bulk(events)[0])
+        expected = {"CAR000": 0, "CAR001": 1}
+        self.assertEqual({v: self.db.get_vehicle_status(v)[1]["is_on_campus"] for v in expected}, expected)
+        # 发件箱中尚未写回的事件不会被压缩
+        self.assertEqual(self.db.compact_outbox(), (True, 1))
+
+        # 模拟进程崩溃：丢弃内存状态，不写回
+        states, self.db.vehicle_states = self.db.vehicle_states, None
+        states.stopping.set()
+        states.wakeup.set()
+        states.thread.join()
+
+        other = VehicleDB()
+        self.assertTrue(other.initialize(self.test_db_path))
+        self.assertEqual(other.enable_vehicle_state_table(flush_interval=3600), 2)
+        self.assertEqual({v: other.vehicle_states.get(v)[0] for v in expected}, expected)
+        self.assertEqual(self._stored_state("CAR000")[0], 0)
+        self.assertEqual(self._stored_state("CAR001")[0], 1)
+        # 最近通行仍为时间最新的一条
+        self.assertEqual(other.get_vehicle_status("CAR000")[1]["is_on_campus"], 0)
+        self.assertEqual(other.compact_outbox(), (True, 2))
+        other.close()
+        other.close_thread_resources()
+
+    def test_concurrent_writers_with_group_commit(self):
+        """测试多线程经写线程并发写入时状态反转不丢失"""
+        self.db.start_writer(max_batch=16, max_delay_ms=5)
+        self.db.enable_vehicle_state_table(flush_interval=0.01)
+
+        def worker(index):
+            for _ in range(11):
+                self.db.add_passage_record(f"CAR{index:03d}", self.gate_id)
+            self.db.close_thread_resources()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 4))
+        self.db.disable_vehicle_state_table()
+        for i in range(4):
+            self.assertEqual(self._stored_state(f"CAR{i:03d}"), (1, self.gate_id))
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 4))
+
+    def test_vehicle_add_and_delete(self):
+        """测试启用后增删车辆同步更新内存状态和在校计数"""
+        self.db.enable_vehicle_state_table(flush_interval=3600)
+        self.assertTrue(self.db.add_vehicle("NEW001", "owner", True)[0])
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 1))
+        self.assertTrue(self.db.add_passage_record("CAR000", self.gate_id)[0])
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 2))
+        self.assertTrue(self.db.delete_vehicle("CAR000")[0])
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 1))
+        self.assertEqual(self.db.add_passage_record("CAR000", self.gate_id), (False, "车辆不存在"))
+        self.assertTrue(self.db.delete_user("owner", None)[0])
+        self.assertEqual(self.db.get_campus_occupancy(), (True, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+
+def main():
+    parser = argparse.ArgumentParser(description="按已有通行记录回填传感器小时流量汇总")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vehicle_db.db"),
+                        help="数据库文件路径")
+    parser.add_argument("--start-month", help="起始月份（YYYY-MM，含）")
+    parser.add_argument("--end-month", help="结束月份（YYYY-MM，含）")
+    args = parser.parse_args()
+
+    db = VehicleDB()
+    if not db.initialize(args.db):
+        print("数据库初始化失败，无法继续操作")
+        return
+
+    try:
+        print("===== 开始回填小时汇总 =====")
+        success, result = db.rebuild_sensor_hourly_rollups(args.start_month, args.end_month)
+        if not success:
+            print(f"回填失败: {result}")
+            return
+        print(f"共回填 {result['months']} 个月份，{result['records']} 条通行记录")
+    finally:
+        db.close_thread_resources()
+        db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from db_backup import DatabaseBackup, list_backups, restore_backup
+
+def main():
+    parser = argparse.ArgumentParser(description="在线备份、列出及恢复车辆数据库")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vehicle_db.db"),
+                        help="数据库文件路径")
+    parser.add_argument("--dir", help="备份目录（默认<数据库文件>.backups）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup = commands.add_parser("backup", help="立即执行一次在线备份")
+    backup.add_argument("--keep", type=int, default=7, help="保留的备份数量")
+    backup.add_argument("--pages", type=int, default=256, help="每步复制的页数")
+    backup.add_argument("--pause", type=float, default=0.01, help="每步之间暂停的秒数")
+
+    commands.add_parser("list", help="列出已有备份")
+
+    restore = commands.add_parser("restore", help="用备份覆盖数据库（需先停止服务）")
+    restore.add_argument("backup", nargs="?", help="备份文件路径（默认最新的备份）")
+    args = parser.parse_args()
+
+    if args.command == "backup":
+        def report(state):
+            if state['total']:
+                done = state['total'] - state['remaining']
+                print(f"\r已复制 {done}/{state['total']} 页", end="", flush=True)
+
+        job = DatabaseBackup(args.db, args.dir, keep=args.keep, pages=args.pages, pause=args.pause, progress=report)
+        success, result = job.run()
+        print()
+        if not success:
+            print(result)
+            return
+        print(f"备份完成: {result['path']}（{result['bytes']} 字节，耗时 {result['duration']:.2f} 秒）")
+        for path in result['removed']:
+            print(f"已删除旧备份: {path}")
+    elif args.command == "list":
+        backups = list_backups(args.db, args.dir)
+        if not backups:
+            print("没有备份")
+        for path in backups:
+            print(f"{path}\t{os.path.getsize(path)} 字节")
+    else:
+        path = args.backup
+        if path is None:
+            backups = list_backups(args.db, args.dir)
+            if not backups:
+                print("没有可恢复的备份")
+                return
+            path = backups[-1]
+        print(f"===== 从 {path} 恢复 =====")
+        success, message = restore_backup(path, args.db)
+        print(message)
+
+if __name__ == '__main__':
+    main()
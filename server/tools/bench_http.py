@@ -0,0 +1,140 @@
+import sys
+import os
+import argparse
+import http.client
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from vehicle_db import VehicleDB
+from http_pool import PooledHTTPServer
+from http_admin_server import AdminHTTPHandler
+from http_login_server import LoginHTTPHandler
+from http_user_server import UserHTTPHandler
+
+# 可测试的接口：名称 -> (处理器, 请求路径)
+ENDPOINTS = {
+    "occupancy": (AdminHTTPHandler, "/get_campus_occupancy"),
+    "vehicles": (AdminHTTPHandler, "/get_vehicles?limit=20"),
+    "vehicle_info": (UserHTTPHandler, "/get_user_vehicle_info?name=owner&vehicle_id=CAR00042"),
+    "login": (LoginHTTPHandler, "/verify_user_and_get_role?name=root&password=123456"),
+}
+
+def quiet_handler(handler_class):
+    """关闭访问日志，避免输出影响计时"""
+    class QuietHandler(handler_class):
+        def log_message(self, format, *args):
+            pass
+    return QuietHandler
+
+def per_request_handler(handler_class):
+    """改进前的处理方式：每个请求新建存储并初始化，用于对比"""
+    class PerRequestHandler(quiet_handler(handler_class)):
+        def __init__(self, request, client_address, server):
+            self.db = VehicleDB()
+            if not self.db.initialize(server.db_path):
+                raise RuntimeError("数据库初始化失败")
+            try:
+                BaseHTTPRequestHandler.__init__(self, request, client_address, server)
+            finally:
+                self.db.close_thread_resources()
+    return PerRequestHandler
+
+def prepare_database(db_path: str, vehicles: int) -> None:
+    """创建测试数据：一个用户及其名下的车辆"""
+    db = VehicleDB()
+    if not db.initialize(db_path):
+        raise RuntimeError("数据库初始化失败")
+    db.add_user("owner", "owner123")
+    for i in range(vehicles):
+        db.add_vehicle(f"CAR{i:05d}", "owner")
+    db.close()
+    db.close_thread_resources()
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def run_client(port: int, path: str, count: int, latencies: list) -> None:
+    for _ in range(count):
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                raise RuntimeError(f"请求失败: HTTP {response.status}")
+        finally:
+            conn.close()
+        latencies.append(time.perf_counter() - started)
+
+def bench(mode: str, handler_class, path: str, db_path: str, requests: int, concurrency: int,
+          workers: int) -> dict:
+    """启动服务器并发送请求，返回延迟统计"""
+    storage = VehicleDB()
+    if not storage.initialize(db_path):
+        raise RuntimeError("数据库初始化失败")
+    # per-request 模式的处理器忽略共享存储，每个请求自行创建
+    handler = quiet_handler(handler_class) if mode == "shared" else per_request_handler(handler_class)
+    httpd = PooledHTTPServer(('127.0.0.1', 0), handler, workers, storage=storage)
+    httpd.db_path = db_path
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+    try:
+        # 预热
+        run_client(port, path, 20, [])
+        latencies = []
+        per_client = max(1, requests // concurrency)
+        clients = [threading.Thread(target=run_client, args=(port, path, per_client, latencies))
+                   for _ in range(concurrency)]
+        started = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        storage.close()
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'mean': sum(latencies) / len(latencies),
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'throughput': len(latencies) / elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="对比共享存储与每请求初始化存储时HTTP接口的请求延迟")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="occupancy", help="测试的接口")
+    parser.add_argument("--requests", type=int, default=2000, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发客户端数")
+    parser.add_argument("--workers", type=int, default=8, help="服务器工作线程数")
+    parser.add_argument("--vehicles", type=int, default=1000, help="测试数据中的车辆数")
+    args = parser.parse_args()
+
+    handler_class, path = ENDPOINTS[args.endpoint]
+    directory = tempfile.mkdtemp(prefix="bench_http_")
+    db_path = os.path.join(directory, "bench.db")
+    try:
+        prepare_database(db_path, args.vehicles)
+        print(f"接口 {path}，{args.requests} 个请求，{args.concurrency} 个并发客户端，{args.workers} 个工作线程")
+        print(f"{'模式':<12}{'平均(ms)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'请求/秒':>10}")
+        results = []
+        for mode in ("per-request", "shared"):
+            result = bench(mode, handler_class, path, db_path, args.requests, args.concurrency, args.workers)
+            results.append(result)
+            print(f"{mode:<12}{result['mean'] * 1000:>10.2f}{result['p50'] * 1000:>10.2f}"
+                  f"{result['p95'] * 1000:>10.2f}{result['p99'] * 1000:>10.2f}{result['throughput']:>10.0f}")
+        print(f"平均延迟降低 {(1 - results[1]['mean'] / results[0]['mean']) * 100:.1f}%")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
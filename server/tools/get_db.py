@@ -4,6 +4,17 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
 from vehicle_db import VehicleDB  # 假设数据库类在vehicle_db.py中
 import json
 
+def write_json_array(f, key, rows):
+    """将一个列表字段逐条写入JSON文件，不在内存中保存整个列表，返回写入条数"""
+    f.write(f'  {json.dumps(key)}: [')
+    count = 0
+    for row in rows:
+        item = json.dumps(row, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+        f.write(("," if count else "") + "\n    " + item)
+        count += 1
+    f.write("\n  ]" if count else "]")
+    return count
+
 def main():
     # 初始化数据库连接
     db = VehicleDB()
@@ -12,76 +23,31 @@ def main():
         return
 
     try:
-        # 获取所有用户信息
-        print("===== 开始获取用户信息 =====")
-        users = []
-        offset = 0
-        limit = 20  # 分页查询每页数量
-        
-        while True:
-            success, data, total = db.get_users(limit=limit, offset=offset)
-            if not success:
-                print(f"获取用户信息失败: {data}")
-                break
-            
-            users.extend(data)
-            offset += limit
-            
-            # 当已获取数量达到总数时停止查询
-            if len(users) >= total:
-                break
-        
-        print(f"共获取到 {len(users)} 个用户信息")
+        # 流式读取各表并直接写入文件，内存占用与表大小无关
+        with open("db_export.json", "w", encoding="utf-8") as f:
+            f.write("{\n")
 
-        # 获取所有车辆信息
-        print("\n===== 开始获取车辆信息 =====")
-        vehicles = []
-        offset = 0
-        
-        while True:
-            success, data, total = db.get_vehicles(limit=limit, offset=offset)
-            if not success:
-                print(f"获取车辆信息失败: {data}")
-                break
-            
-            vehicles.extend(data)
-            offset += limit
-            
-            if len(vehicles) >= total:
-                break
-        
-        print(f"共获取到 {len(vehicles)} 条车辆信息")
+            # 获取所有用户信息
+            print("===== 开始获取用户信息 =====")
+            count = write_json_array(f, "users", db.iter_users())
+            print(f"共获取到 {count} 个用户信息")
+            f.write(",\n")
 
-        # 获取所有传感器信息
-        print("\n===== 开始获取传感器信息 =====")
-        sensors = []
-        offset = 0
-        
-        while True:
-            success, data, total = db.get_sensors(limit=limit, offset=offset)
-            if not success:
-                print(f"获取传感器信息失败: {data}")
-                break
-            
-            sensors.extend(data)
-            offset += limit
-            
-            if len(sensors) >= total:
-                break
-        
-        print(f"共获取到 {len(sensors)} 个传感器信息")
+            # 获取所有车辆信息
+            print("\n===== 开始获取车辆信息 =====")
+            count = write_json_array(f, "vehicles", db.iter_vehicles())
+            print(f"共获取到 {count} 条车辆信息")
+            f.write(",\n")
 
-        # 将结果保存为JSON文件
-        result = {
-            "users": users,
-            "vehicles": vehicles,
-            "sensors": sensors,
-            "timestamp": str(db._retry_operation(lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-        }
+            # 获取所有传感器信息
+            print("\n===== 开始获取传感器信息 =====")
+            count = write_json_array(f, "sensors", db.iter_sensors())
+            print(f"共获取到 {count} 个传感器信息")
+            f.write(",\n")
+
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f'  "timestamp": {json.dumps(timestamp)}\n}}')
 
-        with open("db_export.json", "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-        
         print("\n数据已成功导出到 db_export.json 文件")
 
     except Exception as e:
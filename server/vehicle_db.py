@@ -1,25 +1,1030 @@
 import sqlite3
 import hashlib
 import threading
-from datetime import datetime
-from typing import Tuple, List, Dict, Any, Optional
+import json
+import base64
+import queue
+import time
+import os
+import math
+import random
+from contextlib import contextmanager, nullcontext
+from urllib.parse import quote
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+import heapq
+import itertools
+from typing import Tuple, List, Dict, Any, Optional, Sequence, Iterator
+from storage import VehicleStorage
+from passage_archive import archive_dir, write_segment, remove_segment, read_segment, read_vehicle_rows, segment_summary
+
+# 按当前表内容重建行计数（迁移回填及手动修复共用）
+_COUNTER_REBUILD_SQL = [
+    "DELETE FROM row_counters WHERE scope NOT IN ('sensors_version', 'vehicle_state_seq')",
+    "INSERT INTO row_counters (scope, key, value) SELECT 'users', '', COUNT(*) FROM users",
+    "INSERT INTO row_counters (scope, key, value) SELECT 'vehicles', '', COUNT(*) FROM vehicles",
+    "INSERT INTO row_counters (scope, key, value) SELECT 'sensors', '', COUNT(*) FROM sensors",
+    "INSERT INTO row_counters (scope, key, value) SELECT 'passages', '', COUNT(*) FROM passage_records",
+    """INSERT INTO row_counters (scope, key, value)
+       SELECT 'vehicle_passages', vehicle_id, COUNT(*) FROM passage_records GROUP BY vehicle_id""",
+    """INSERT INTO row_counters (scope, key, value)
+       SELECT 'sensor_passages', CAST(sensor_id AS TEXT), COUNT(*) FROM passage_records GROUP BY sensor_id""",
+    "INSERT INTO row_counters (scope, key, value) SELECT 'campus_occupancy', '', COUNT(*) FROM vehicles WHERE is_on_campus",
+]
+
+def _backfill_last_passages(conn: sqlite3.Connection) -> None:
+    """按原表及各分区中 (passage_time, id) 最大的记录回填车辆的最近通行检查点"""
+    tables = [name for (name,) in conn.execute("SELECT name FROM passage_partitions").fetchall()]
+    for table in tables + ["passage_records"]:
+        conn.execute(f"""
+            UPDATE vehicles SET last_sensor_id = p.sensor_id, last_passage_time = p.passage_time,
+                                last_passage_id = p.id
+            FROM (SELECT vehicle_id, sensor_id, passage_time, id,
+                         ROW_NUMBER() OVER (PARTITION BY vehicle_id ORDER BY passage_time DESC, id DESC) AS rn
+                  FROM {table}) AS p
+            WHERE p.rn = 1 AND p.vehicle_id = vehicles.vehicle_id
+              AND (vehicles.last_passage_time IS NULL
+                   OR (p.passage_time, p.id) > (vehicles.last_passage_time, vehicles.last_passage_id))
+        """)
+
+# 数据库结构迁移列表：(版本号, 说明, SQL语句列表)
+# 版本号记录在 PRAGMA user_version 中，initialize 时按顺序执行尚未应用的迁移
+SCHEMA_MIGRATIONS = [
+    (1, "为通行记录热点查询添加索引", [
+        "CREATE INDEX IF NOT EXISTS idx_passage_vehicle_time ON passage_records (vehicle_id, passage_time DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_passage_sensor_time ON passage_records (sensor_id, passage_time DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_passage_time ON passage_records (passage_time)",
+        "CREATE INDEX IF NOT EXISTS idx_vehicles_registered_by ON vehicles (registered_by)",
+    ]),
+    (2, "通行记录索引加入id作为同一时间的排序键，支持游标分页", [
+        "DROP INDEX IF EXISTS idx_passage_vehicle_time",
+        "DROP INDEX IF EXISTS idx_passage_sensor_time",
+        "CREATE INDEX IF NOT EXISTS idx_passage_vehicle_time ON passage_records (vehicle_id, passage_time DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_passage_sensor_time ON passage_records (sensor_id, passage_time DESC, id DESC)",
+    ]),
+    (3, "添加由触发器维护的行计数表", [
+        """CREATE TABLE IF NOT EXISTS row_counters (
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL DEFAULT '',
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, key)
+        ) WITHOUT ROWID""",
+        *[f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_count_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO row_counters (scope, key, value) VALUES ('{table}', '', 1)
+                ON CONFLICT (scope, key) DO UPDATE SET value = value + 1;
+            END"""
+          for table in ("users", "vehicles", "sensors")],
+        *[f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_count_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE row_counters SET value = value - 1 WHERE scope = '{table}' AND key = '';
+            END"""
+          for table in ("users", "vehicles", "sensors")],
+        """CREATE TRIGGER IF NOT EXISTS trg_passage_records_count_insert AFTER INSERT ON passage_records
+            BEGIN
+                INSERT INTO row_counters (scope, key, value) VALUES ('passages', '', 1)
+                ON CONFLICT (scope, key) DO UPDATE SET value = value + 1;
+                INSERT INTO row_counters (scope, key, value) VALUES ('vehicle_passages', NEW.vehicle_id, 1)
+                ON CONFLICT (scope, key) DO UPDATE SET value = value + 1;
+                INSERT INTO row_counters (scope, key, value) VALUES ('sensor_passages', CAST(NEW.sensor_id AS TEXT), 1)
+                ON CONFLICT (scope, key) DO UPDATE SET value = value + 1;
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_passage_records_count_delete AFTER DELETE ON passage_records
+            BEGIN
+                UPDATE row_counters SET value = value - 1 WHERE scope = 'passages' AND key = '';
+                UPDATE row_counters SET value = value - 1 WHERE scope = 'vehicle_passages' AND key = OLD.vehicle_id;
+                UPDATE row_counters SET value = value - 1 WHERE scope = 'sensor_passages' AND key = CAST(OLD.sensor_id AS TEXT);
+            END""",
+        *_COUNTER_REBUILD_SQL,
+    ]),
+    (4, "传感器表变更时递增版本号，供进程内传感器缓存校验", [
+        "INSERT OR IGNORE INTO row_counters (scope, key, value) VALUES ('sensors_version', '', 0)",
+        *[f"""CREATE TRIGGER IF NOT EXISTS trg_sensors_version_{event.lower()} AFTER {event} ON sensors
+            BEGIN
+                UPDATE row_counters SET value = value + 1 WHERE scope = 'sensors_version' AND key = '';
+            END"""
+          for event in ("INSERT", "UPDATE", "DELETE")],
+    ]),
+    (5, "添加通行记录按月分区登记表和数据库设置表", [
+        """CREATE TABLE IF NOT EXISTS passage_partitions (
+            name TEXT PRIMARY KEY NOT NULL,
+            month TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS db_settings (
+            key TEXT PRIMARY KEY NOT NULL,
+            value TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    ]),
+    (6, "添加分批清理任务进度表", [
+        """CREATE TABLE IF NOT EXISTS purge_jobs (
+            name TEXT PRIMARY KEY NOT NULL,
+            cutoff TEXT NOT NULL,
+            source TEXT,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            max_id INTEGER NOT NULL DEFAULT 0,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'running',
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )""",
+    ]),
+    (7, "添加通行记录归档段目录及按车辆索引", [
+        """CREATE TABLE IF NOT EXISTS passage_archives (
+            name TEXT PRIMARY KEY NOT NULL,
+            month TEXT NOT NULL,
+            min_time TEXT NOT NULL,
+            max_time TEXT NOT NULL,
+            records INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS passage_archive_vehicles (
+            vehicle_id TEXT NOT NULL,
+            archive TEXT NOT NULL,
+            records INTEGER NOT NULL,
+            min_time TEXT NOT NULL,
+            max_time TEXT NOT NULL,
+            PRIMARY KEY (vehicle_id, archive)
+        ) WITHOUT ROWID""",
+    ]),
+    (8, "添加传感器小时流量汇总表", [
+        """CREATE TABLE IF NOT EXISTS sensor_hourly_rollups (
+            sensor_id INTEGER NOT NULL,
+            hour_bucket TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            distinct_vehicles_estimate INTEGER NOT NULL DEFAULT 0,
+            vehicles_sketch BLOB NOT NULL,
+            PRIMARY KEY (sensor_id, hour_bucket)
+        ) WITHOUT ROWID""",
+    ]),
+    (9, "添加由触发器维护的在校车辆计数", [
+        """CREATE TRIGGER IF NOT EXISTS trg_vehicles_occupancy_insert AFTER INSERT ON vehicles
+            WHEN NEW.is_on_campus
+            BEGIN
+                INSERT INTO row_counters (scope, key, value) VALUES ('campus_occupancy', '', 1)
+                ON CONFLICT (scope, key) DO UPDATE SET value = value + 1;
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_vehicles_occupancy_delete AFTER DELETE ON vehicles
+            WHEN OLD.is_on_campus
+            BEGIN
+                UPDATE row_counters SET value = value - 1 WHERE scope = 'campus_occupancy' AND key = '';
+            END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_vehicles_occupancy_update AFTER UPDATE OF is_on_campus ON vehicles
+            WHEN (NEW.is_on_campus != 0) != (OLD.is_on_campus != 0)
+            BEGIN
+                INSERT INTO row_counters (scope, key, value)
+                VALUES ('campus_occupancy', '', CASE WHEN NEW.is_on_campus THEN 1 ELSE -1 END)
+                ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value;
+            END""",
+        """INSERT INTO row_counters (scope, key, value)
+           SELECT 'campus_occupancy', '', COUNT(*) FROM vehicles WHERE is_on_campus
+           ON CONFLICT (scope, key) DO UPDATE SET value = excluded.value""",
+    ]),
+    (10, "为已有通行记录分区添加时间索引，支持按时间范围查询", [
+        lambda conn: [conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_time ON {name} (passage_time)")
+                      for (name,) in conn.execute("SELECT name FROM passage_partitions").fetchall()],
+    ]),
+    (11, "车辆表记录最近通行检查点，用于车辆状态写回缓存的恢复", [
+        "ALTER TABLE vehicles ADD COLUMN last_sensor_id INTEGER",
+        "ALTER TABLE vehicles ADD COLUMN last_passage_time TIMESTAMP",
+        "ALTER TABLE vehicles ADD COLUMN last_passage_id INTEGER",
+        _backfill_last_passages,
+    ]),
+    (12, "添加通行事件发件箱及消费者进度表", [
+        """CREATE TABLE IF NOT EXISTS passage_outbox (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            passage_id INTEGER NOT NULL,
+            vehicle_id TEXT NOT NULL,
+            sensor_id INTEGER NOT NULL,
+            passage_time TIMESTAMP NOT NULL,
+            is_on_campus BOOLEAN NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS outbox_consumers (
+            name TEXT PRIMARY KEY NOT NULL,
+            last_seq INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    ]),
+    (13, "记录车辆表状态已包含的发件箱事件序号，车辆状态按写入顺序恢复", [
+        """INSERT OR IGNORE INTO row_counters (scope, key, value)
+           SELECT 'vehicle_state_seq', '', COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'passage_outbox'), 0)""",
+    ]),
+    (14, "归档车辆索引记录车辆数据块在段文件中的位置，按车辆只读取该块", [
+        "ALTER TABLE passage_archive_vehicles ADD COLUMN block_offset INTEGER",
+        "ALTER TABLE passage_archive_vehicles ADD COLUMN block_length INTEGER",
+    ]),
+]
+
+# 游标分页使用的排序键：列表类型 -> 结果字典中的字段
+PAGE_CURSOR_KEYS = {
+    "users": ("id",),
+    "vehicles": ("vehicle_id",),
+    "sensors": ("id",),
+    "passages": ("passage_time", "id"),
+}
+
+def encode_page_cursor(kind: str, values: List[Any]) -> str:
+    """将排序键编码为不透明的分页游标（URL安全）"""
+    raw = json.dumps([kind] + list(values), ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_page_cursor(kind: str, token: str) -> Optional[List[Any]]:
+    """解析分页游标，格式无效或类型不符时返回None"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        return None
+    if not isinstance(values, list) or len(values) != len(PAGE_CURSOR_KEYS[kind]) + 1 or values[0] != kind:
+        return None
+    return values[1:]
+
+def parse_page_cursor(value: Any) -> Tuple[int, Optional[str]]:
+    """解析HTTP分页参数：纯数字视为偏移量（兼容旧接口），否则视为游标
+
+    返回 (offset, after)
+    """
+    value = str(value if value is not None else '').strip()
+    if value == '':
+        return (0, None)
+    if value.isdigit():
+        return (int(value), None)
+    return (0, value)
+
+def next_page_cursor(kind: str, rows: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    """根据本页最后一行生成下一页游标，本页不足limit条时返回None"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_page_cursor(kind, [last[key] for key in PAGE_CURSOR_KEYS[kind]])
+
+def split_page(kind: str, rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """拆分按 limit + 1 条查询的结果，返回 (本页的行, 下一页游标)
+
+    多取的一行只用于判断是否还有下一页，最后一页恰好满 limit 条时不再返回游标
+    """
+    if len(rows) <= limit:
+        return (rows, None)
+    rows = rows[:limit]
+    return (rows, next_page_cursor(kind, rows, limit))
+
+# iter_* 流式查询可选的行类型：使用 __slots__ 的轻量记录，字段即查询列
+class _Record:
+    __slots__ = ()
+
+    def __init__(self, row: Sequence[Any]):
+        for name, value in zip(self.__slots__, row):
+            setattr(self, name, value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{n}={getattr(self, n)!r}' for n in self.__slots__)})"
+
+class UserRecord(_Record):
+    __slots__ = ('id', 'name', 'is_admin', 'created_at')
+
+class VehicleRecord(_Record):
+    __slots__ = ('vehicle_id', 'is_on_campus', 'registered_by_name', 'created_at')
+
+class SensorRecord(_Record):
+    __slots__ = ('id', 'sensor_id', 'location', 'description', 'is_active', 'is_gate', 'created_at')
+
+class PassageRecord(_Record):
+    __slots__ = ('id', 'vehicle_id', 'sensor_id', 'location', 'passage_time', 'created_at')
+
+# SQLite性能配置预设，每个线程连接建立时应用
+# durable：每次提交都完整落盘；throughput：WAL下降低同步级别并加大缓存，掉电时可能丢失最近提交
+SQLITE_PROFILES = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+    "throughput": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 10000,
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+
+# 各PRAGMA允许的取值，整数型配置为None
+_PRAGMA_CHOICES = {
+    "journal_mode": ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"),
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "busy_timeout": None,
+    "cache_size": None,
+    "mmap_size": None,
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+
+# PRAGMA 查询结果为整数编码的配置项，读回时转换为名称
+_PRAGMA_NAMES = {
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+
+# 锁冲突重试策略：busy_timeout 内由SQLite忙等待处理器等待，仍冲突时按指数退避重试
+# 首次等待约 base_delay 秒，之后每次翻倍直至 max_delay，自首次执行起超过 deadline 秒不再重试
+RETRY_POLICY = {
+    "base_delay": 0.01,
+    "max_delay": 1.0,
+    "deadline": 30.0,
+}
+
+# 可重试的SQLite主错误码：SQLITE_BUSY（含WAL快照过期）、SQLITE_LOCKED（共享缓存表锁）
+_BUSY_ERROR_CODES = (5, 6)
+
+def _is_busy_error(error: BaseException) -> bool:
+    """是否为锁冲突导致的可重试错误（按扩展错误码的低8位判断，其他错误不重试）"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is None:
+        # 非SQLite返回的错误没有错误码，按错误信息判断
+        message = str(error)
+        return "database is locked" in message or "database table is locked" in message
+    return code & 0xFF in _BUSY_ERROR_CODES
+
+def _raise_if_busy(error: BaseException) -> None:
+    """操作内部捕获异常时调用：锁冲突向外抛出交由重试处理，不作为失败结果返回"""
+    if _is_busy_error(error):
+        raise error
+
+def _partition_ddl(table: str, month: str, id_base: int = 0) -> List[str]:
+    """生成按月分区表的建表、索引和计数触发器语句
+
+    分区表结构与 passage_records 相同，自增ID从 id_base + (yyyymm << 32) 开始，
+    保证各分区及原表之间ID不冲突且随月份递增。
+    """
+    first_id = id_base + (int(month.replace('-', '')) << 32)
+    return [
+        f"""CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            vehicle_id TEXT NOT NULL,
+            sensor_id INTEGER NOT NULL,
+            passage_time TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (vehicle_id) REFERENCES vehicles(vehicle_id),
+            FOREIGN KEY (sensor_id) REFERENCES sensors(id)
+        )""",
+        f"INSERT INTO sqlite_sequence (name, seq) VALUES ('{table}', {first_id})",
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_vehicle_time ON {table} (vehicle_id, passage_time DESC, id DESC)",
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_sensor_time ON {table} (sensor_id, passage_time DESC, id DESC)",
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_time ON {table} (passage_time)",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_count_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO row_counters (scope, key, value) VALUES ('passages', '', 1)
+                ON CONFLICT (scope, key) DO UPDATE SET value = value + 1;
+                INSERT INTO row_counters (scope, key, value) VALUES ('vehicle_passages', NEW.vehicle_id, 1)
+                ON CONFLICT (scope, key) DO UPDATE SET value = value + 1;
+                INSERT INTO row_counters (scope, key, value) VALUES ('sensor_passages', CAST(NEW.sensor_id AS TEXT), 1)
+                ON CONFLICT (scope, key) DO UPDATE SET value = value + 1;
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_count_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE row_counters SET value = value - 1 WHERE scope = 'passages' AND key = '';
+                UPDATE row_counters SET value = value - 1 WHERE scope = 'vehicle_passages' AND key = OLD.vehicle_id;
+                UPDATE row_counters SET value = value - 1 WHERE scope = 'sensor_passages' AND key = CAST(OLD.sensor_id AS TEXT);
+            END""",
+    ]
+
+# 小时汇总中去重车辆数的HyperLogLog估算：256个寄存器（每个1字节），标准误差约6.5%，
+# 基数较小时使用线性计数，结果接近精确值
+_HLL_BITS = 8
+_HLL_REGISTERS = 1 << _HLL_BITS
+
+def _hll_add(sketch: bytearray, value: str) -> None:
+    """将值加入HyperLogLog寄存器"""
+    h = int.from_bytes(hashlib.sha1(value.encode('utf-8')).digest()[:8], 'big')
+    index = h >> (64 - _HLL_BITS)
+    rest = h & ((1 << (64 - _HLL_BITS)) - 1)
+    rank = (64 - _HLL_BITS) - rest.bit_length() + 1
+    if rank > sketch[index]:
+        sketch[index] = rank
+
+def _hll_merge(target: bytearray, sketch: bytes) -> None:
+    """合并寄存器（取各寄存器最大值），得到两个集合并集的估算"""
+    for i, rank in enumerate(sketch):
+        if rank > target[i]:
+            target[i] = rank
+
+def _hll_estimate(sketch: bytes) -> int:
+    """估算去重数量"""
+    m = _HLL_REGISTERS
+    estimate = (0.7213 / (1 + 1.079 / m)) * m * m / sum(2.0 ** -rank for rank in sketch)
+    zeros = sketch.count(0)
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return int(round(estimate))
+
+# 车辆表状态的检查点推进到最新的发件箱事件：车辆表已包含此前写入的全部通行（按写入顺序，而非通行时间）
+_ADVANCE_VEHICLE_STATE_SEQ_SQL = """UPDATE row_counters
+                                    SET value = COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'passage_outbox'), 0)
+                                    WHERE scope = 'vehicle_state_seq' AND key = ''"""
+
+# 写入车辆状态：(is_on_campus, last_sensor_id, last_passage_time, last_passage_id, vehicle_id)
+_VEHICLE_STATE_UPDATE_SQL = """UPDATE vehicles SET is_on_campus = ?, last_sensor_id = ?, last_passage_time = ?,
+                                  last_passage_id = ?, updated_at = CURRENT_TIMESTAMP
+                              WHERE vehicle_id = ?"""
+
+def _advance_vehicle_state(state: Tuple[int, Any, Any, Any], sensor_id: int, passage_time: str,
+                           passage_id: int, is_gate: bool) -> Tuple[int, Any, Any, Any]:
+    """按一条通行记录推进车辆状态 (is_on_campus, last_sensor_id, last_passage_time, last_passage_id)
+
+    校门传感器反转在校状态；最近通行取 (passage_time, id) 最大的记录
+    """
+    is_on_campus, last_sensor_id, last_time, last_id = state
+    if is_gate:
+        is_on_campus = 0 if is_on_campus else 1
+    if last_time is None or (passage_time, passage_id) > (last_time, last_id):
+        last_sensor_id, last_time, last_id = sensor_id, passage_time, passage_id
+    return (is_on_campus, last_sensor_id, last_time, last_id)
+
+def _operation_name(operation) -> str:
+    """重试统计使用的方法名：取定义操作闭包的外层函数名"""
+    qualname = getattr(operation, '__qualname__', None) or type(operation).__name__
+    return qualname.split('.<locals>')[0].split('.')[-1]
+
+class WriterStoppedError(RuntimeError):
+    """写线程已停止，写操作未执行"""
+
+class GroupCommitWriter:
+    """单写线程：独占写连接，按批次组提交队列中的写操作
+
+    每个写操作在批事务内的保存点中执行，返回 (False, ...) 或抛出异常时只回滚该操作；
+    批次达到 max_batch 个操作或自首个操作起超过 max_delay_ms 毫秒后统一提交，
+    提交完成后再通知各调用方的Future。停止后（或写线程异常退出后）不再接受写操作，
+    未执行的操作以 WriterStoppedError 结束，调用方不会无限等待。
+    """
+
+    def __init__(self, db: 'VehicleDB', max_batch: int = 64, max_delay_ms: float = 5, queue_size: int = 10000):
+        self.db = db
+        self.max_batch = max(1, int(max_batch))
+        self.max_delay = max(0.0, max_delay_ms / 1000)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        # 保护 closed 与入队：停止标记设置后不会再有操作排在结束标记之后
+        self.lock = threading.Lock()
+        self.closed = False
+        self.stats = {'batches': 0, 'operations': 0}
+
+    def start(self) -> None:
+        """启动写线程"""
+        self.thread = threading.Thread(target=self._run, name="vehicle-db-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """处理完已入队的写操作后停止写线程"""
+        thread = self.thread
+        if thread is None:
+            return
+        with self.lock:
+            self.closed = True
+        # 写线程已退出时队列不再被消费，无需放入结束标记
+        while thread.is_alive():
+            try:
+                self.queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        thread.join()
+        self.thread = None
+
+    def is_writer_thread(self) -> bool:
+        """当前线程是否为写线程"""
+        return self.thread is not None and threading.current_thread() is self.thread
+
+    def submit(self, operation) -> Future:
+        """提交写操作，返回在提交后完成的Future；写线程已停止时抛出 WriterStoppedError"""
+        if self.thread is None:
+            raise WriterStoppedError("写线程未启动")
+        future = Future()
+        while True:
+            # 队列已满时分段等待，期间不持有锁，停止和写线程退出不会被阻塞
+            with self.lock:
+                if self.closed:
+                    raise WriterStoppedError("写线程已停止")
+                try:
+                    self.queue.put((operation, future), timeout=0.1)
+                    return future
+                except queue.Full:
+                    pass
+
+    def _run(self) -> None:
+        self.db.local.group_commit = True
+        conn = self.db._get_thread_connection()
+        stopping = False
+        batch = []
+        try:
+            while not stopping:
+                item = self.queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit_batch(conn, batch)
+        finally:
+            with self.lock:
+                self.closed = True
+            # 异常退出时的当前批次及结束标记之后残留的操作均未执行
+            error = WriterStoppedError("写线程已停止")
+            pending = [future for _, future in batch]
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    pending.append(item[1])
+            for future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            self.db.close_thread_resources()
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch) -> None:
+        outcomes = []
+        try:
+            self.db._retry_operation(lambda: conn.execute("BEGIN IMMEDIATE"))
+            for operation, _ in batch:
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    result = operation()
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((False, e))
+                    continue
+                if isinstance(result, tuple) and result and result[0] is False:
+                    conn.execute("ROLLBACK TO write_op")
+                conn.execute("RELEASE write_op")
+                outcomes.append((True, result))
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            # 批次中的操作可能已推进内存中的车辆状态，回滚后按数据库重建
+            if self.db.vehicle_states is not None:
+                try:
+                    self.db.vehicle_states.recover()
+                except Exception as recover_error:
+                    print(f"恢复车辆状态失败: {recover_error}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.stats['batches'] += 1
+        self.stats['operations'] += len(batch)
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+class ReadConnectionPool:
+    """只读连接池：mode=ro + query_only 连接，限制最大连接数并回收空闲连接
+
+    连接在请求期间被独占借出，归还后放回空闲列表；超过 idle_timeout 秒未使用的
+    空闲连接会被关闭，借出前距上次检查超过 health_check_interval 秒时执行健康检查。
+    共享连接池的服务器通过 reserve 按工作线程数预留，连接上限不低于预留总数。
+    """
+
+    def __init__(self, db_path: str, max_size: int = 8, idle_timeout: float = 300,
+                 health_check_interval: float = 30, pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = os.path.abspath(db_path)
+        self.max_size = max(1, int(max_size))
+        self.base_size = self.max_size
+        self.reserved = 0
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.pragmas = dict(pragmas or SQLITE_PROFILES["durable"])
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.idle = []  # [(conn, 上次使用时间, 上次检查时间)]
+        self.size = 0
+        self.stats = {'opened': 0, 'closed': 0, 'checkouts': 0, 'timeouts': 0, 'health_failures': 0}
+
+    def _open(self) -> sqlite3.Connection:
+        timeout = self.pragmas.get("busy_timeout", 5000) / 1000
+        conn = sqlite3.connect(f"file:{quote(self.db_path)}?mode=ro", uri=True,
+                               timeout=timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = 1")
+        # 日志模式和同步级别由写连接决定，只读连接只应用缓存相关配置
+        for key in ("busy_timeout", "cache_size", "mmap_size", "temp_store"):
+            if key in self.pragmas:
+                conn.execute(f"PRAGMA {key} = {self.pragmas[key]}")
+        self.stats['opened'] += 1
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self.size -= 1
+        self.stats['closed'] += 1
+
+    def _evict_idle(self, now: float) -> None:
+        keep = []
+        for entry in self.idle:
+            if now - entry[1] > self.idle_timeout:
+                self._discard(entry[0])
+            else:
+                keep.append(entry)
+        self.idle = keep
+
+    def acquire(self, timeout: Optional[float] = 5.0) -> Optional[sqlite3.Connection]:
+        """借出一个只读连接，连接数已满且超时仍无空闲连接时返回None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.available:
+            while True:
+                now = time.monotonic()
+                self._evict_idle(now)
+                if self.idle:
+                    conn, _, checked = self.idle.pop()
+                    if now - checked > self.health_check_interval:
+                        try:
+                            conn.execute("SELECT 1").fetchone()
+                        except sqlite3.Error:
+                            self.stats['health_failures'] += 1
+                            self._discard(conn)
+                            continue
+                    self.stats['checkouts'] += 1
+                    return conn
+                if self.size < self.max_size:
+                    self.size += 1
+                    break
+                remaining = None if deadline is None else deadline - now
+                if remaining is not None and remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    return None
+                self.available.wait(remaining)
+        # 在锁外建立新连接
+        try:
+            conn = self._open()
+        except Exception:
+            with self.available:
+                self.size -= 1
+                self.available.notify()
+            raise
+        with self.lock:
+            self.stats['checkouts'] += 1
+        return conn
+
+    def reserve(self, count: int) -> None:
+        """为count个并发使用方预留连接（负数取消预留），连接上限取初始上限与预留总数的较大者"""
+        with self.available:
+            self.reserved = max(0, self.reserved + int(count))
+            self.max_size = max(self.base_size, self.reserved)
+            self.available.notify_all()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """归还连接，未结束的读事务会被回滚"""
+        with self.available:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                now = time.monotonic()
+                self.idle.append((conn, now, now))
+            except sqlite3.Error:
+                self._discard(conn)
+            self.available.notify()
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        with self.available:
+            for conn, _, _ in self.idle:
+                self._discard(conn)
+            self.idle = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """查询连接池状态"""
+        with self.lock:
+            return dict(self.stats, size=self.size, idle=len(self.idle), max_size=self.max_size)
+
+# 内存数据库共享缓存URI的序号，保证每个实例使用独立的库
+_memory_db_ids = itertools.count(1)
+
+# 进程内按数据库文件共享的只读连接池
+_read_pools = {}
+_read_pools_lock = threading.Lock()
+
+def get_read_pool(db_path: str, **options) -> ReadConnectionPool:
+    """获取（不存在时创建）指定数据库文件的只读连接池，options仅在首次创建时生效"""
+    key = os.path.abspath(db_path)
+    with _read_pools_lock:
+        pool = _read_pools.get(key)
+        if pool is None:
+            pool = ReadConnectionPool(db_path, **options)
+            _read_pools[key] = pool
+        return pool
+
+class SensorRegistry:
+    """进程内传感器缓存：sensor_id字符串 -> (id, is_active, is_gate)
+
+    本进程的传感器写操作提交后主动失效；其他进程的修改通过 sensors_version
+    版本号发现，版本号最多每 check_interval 秒查询一次，其余查询不执行SQL。
+    """
+
+    def __init__(self, db: 'VehicleDB', check_interval: float = 1.0):
+        self.db = db
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.by_sensor_id = {}
+        self.by_id = {}
+        self.version = None
+        self.checked_at = 0.0
+        self.loaded = False
+
+    def invalidate(self) -> None:
+        """使缓存失效，下次查询时重新加载"""
+        with self.lock:
+            self.loaded = False
 
-class VehicleDB:
+    def lookup(self, sensor_id: str) -> Optional[Tuple[int, bool, bool]]:
+        """按传感器标识查询 (id, is_active, is_gate)，不存在时返回None"""
+        with self.lock:
+            self._ensure_fresh()
+            return self.by_sensor_id.get(sensor_id)
+
+    def lookup_id(self, id: int) -> Optional[Tuple[str, bool, bool]]:
+        """按传感器自增ID查询 (sensor_id, is_active, is_gate)，不存在时返回None"""
+        with self.lock:
+            self._ensure_fresh()
+            return self.by_id.get(id)
+
+    def _ensure_fresh(self) -> None:
+        now = time.monotonic()
+        if self.loaded and now - self.checked_at < self.check_interval:
+            return
+        cursor = self.db._get_read_cursor()
+        version = self.db._read_counter(cursor, "sensors_version")
+        self.checked_at = now
+        if self.loaded and version == self.version:
+            return
+        cursor.execute("SELECT id, sensor_id, is_active, is_gate FROM sensors")
+        by_sensor_id = {}
+        by_id = {}
+        for row in cursor.fetchall():
+            by_sensor_id[row['sensor_id']] = (row['id'], bool(row['is_active']), bool(row['is_gate']))
+            by_id[row['id']] = (row['sensor_id'], bool(row['is_active']), bool(row['is_gate']))
+        self.by_sensor_id = by_sensor_id
+        self.by_id = by_id
+        self.version = version
+        self.loaded = True
+
+class VehicleStateTable:
+    """进程内车辆状态表（写回缓存）：vehicle_id -> (is_on_campus, last_sensor_id, last_passage_time, last_passage_id)
+
+    通行记录写入时在 lock 内读取并推进状态，提交后只更新内存并记为脏，不再逐条 UPDATE 车辆表；
+    后台线程每 flush_interval 秒（或脏车辆达到 max_dirty 时）批量写回。发件箱即为日志：
+    写回时在同一事务中记录车辆表已包含的发件箱序号（vehicle_state_seq），recover 按写入顺序
+    重放其后的事件恢复状态，补录的历史通行同样不会丢失。假定本进程是唯一写入通行记录的进程。
+    """
+
+    def __init__(self, db: 'VehicleDB', flush_interval: float = 1.0, max_dirty: int = 1000):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_dirty = max(1, int(max_dirty))
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()
+        self.states = {}
+        self.dirty = set()
+        self.occupancy = 0
+        # 车辆表状态已包含的发件箱序号
+        self.checkpoint = 0
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.stats = {'flushes': 0, 'flushed': 0, 'recovered': 0}
+
+    def start(self) -> None:
+        """恢复全部车辆状态并写回，然后启动后台写回线程"""
+        self.recover()
+        self.flush()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="vehicle-state-flusher", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """停止后台线程并写回剩余的脏状态"""
+        if self.thread is not None:
+            self.stopping.set()
+            self.wakeup.set()
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                self.wakeup.wait(self.flush_interval)
+                self.wakeup.clear()
+                # 停止时的最后一次写回由 stop 完成
+                if self.stopping.is_set():
+                    break
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"车辆状态写回失败: {e}")
+        finally:
+            self.db.close_thread_resources()
+
+    def recover(self) -> int:
+        """丢弃内存状态，按车辆表及检查点之后的发件箱事件重建全部车辆状态，返回重放过的车辆数"""
+        cursor = self.db._get_thread_cursor()
+        with self.lock:
+            self.checkpoint = self.db._read_counter(cursor, "vehicle_state_seq")
+            states, replayed = self._replay(cursor)
+            self.states = states
+            self.dirty = replayed
+            self.occupancy = sum(state[0] for state in states.values())
+            self.stats['recovered'] += len(replayed)
+            return len(replayed)
+
+    def _replay(self, cursor: sqlite3.Cursor, vehicle_ids: Optional[List[str]] = None) -> Tuple[Dict[str, Tuple], set]:
+        """读取车辆表中的状态，按写入顺序重放检查点之后的发件箱事件（vehicle_ids为None时处理全部车辆）
+
+        事件中记录了写入时的在校状态，直接采用；最近通行仍取 (passage_time, id) 最大的记录
+        """
+        if vehicle_ids is None:
+            chunks = [None]
+        else:
+            chunks = [vehicle_ids[i:i + 500] for i in range(0, len(vehicle_ids), 500)]
+        checkpoint = self.db._read_counter(cursor, "vehicle_state_seq")
+        states = {}
+        events = []
+        for chunk in chunks:
+            condition = "" if chunk is None else f"v.vehicle_id IN ({','.join('?' * len(chunk))})"
+            params = chunk or []
+            cursor.execute(f"""
+                SELECT v.vehicle_id, v.is_on_campus, v.last_sensor_id, v.last_passage_time, v.last_passage_id
+                FROM vehicles v {'WHERE ' + condition if condition else ''}
+            """, params)
+            for row in cursor.fetchall():
+                states[row[0]] = (int(bool(row[1])), row[2], row[3], row[4])
+            cursor.execute(f"""
+                SELECT o.seq, o.vehicle_id, o.sensor_id, o.passage_time, o.passage_id, o.is_on_campus
+                FROM passage_outbox o
+                JOIN vehicles v ON v.vehicle_id = o.vehicle_id
+                WHERE o.seq > ? {'AND ' + condition if condition else ''}
+            """, [checkpoint] + params)
+            events += [tuple(row) for row in cursor.fetchall()]
+        events.sort()
+        replayed = set()
+        for _, vehicle_id, sensor_id, passage_time, passage_id, is_on_campus in events:
+            state = _advance_vehicle_state(states[vehicle_id], sensor_id, passage_time, passage_id, False)
+            states[vehicle_id] = (int(bool(is_on_campus)),) + state[1:]
+            replayed.add(vehicle_id)
+        return states, replayed
+
+    def get(self, vehicle_id: str) -> Optional[Tuple[int, Any, Any, Any]]:
+        """查询内存中的车辆状态，未加载时返回None"""
+        with self.lock:
+            return self.states.get(vehicle_id)
+
+    def get_many(self, cursor: sqlite3.Cursor, vehicle_ids: List[str]) -> Dict[str, Tuple[int, Any, Any, Any]]:
+        """查询车辆状态，内存中没有的车辆（如其他进程添加的）按检查点重放加载，不存在的车辆不返回"""
+        with self.lock:
+            missing = [v for v in vehicle_ids if v not in self.states]
+            if missing:
+                states, replayed = self._replay(cursor, missing)
+                for vehicle_id, state in states.items():
+                    self.states[vehicle_id] = state
+                    self.occupancy += state[0]
+                self.dirty |= replayed
+            return {v: self.states[v] for v in vehicle_ids if v in self.states}
+
+    def put_many(self, states: Dict[str, Tuple[int, Any, Any, Any]]) -> None:
+        """更新车辆状态（在通行记录提交后调用）并记为脏"""
+        with self.lock:
+            for vehicle_id, state in states.items():
+                old = self.states.get(vehicle_id)
+                self.occupancy += state[0] - (old[0] if old else 0)
+                self.states[vehicle_id] = state
+                self.dirty.add(vehicle_id)
+            if len(self.dirty) >= self.max_dirty:
+                self.wakeup.set()
+
+    def add(self, vehicle_id: str, is_on_campus: bool) -> None:
+        """登记新车辆（车辆表中已有相同状态，不记为脏）"""
+        with self.lock:
+            old = self.states.get(vehicle_id)
+            self.occupancy += int(bool(is_on_campus)) - (old[0] if old else 0)
+            self.states[vehicle_id] = (int(bool(is_on_campus)), None, None, None)
+            self.dirty.discard(vehicle_id)
+
+    def discard(self, vehicle_ids: List[str]) -> None:
+        """移除已删除车辆的状态"""
+        with self.lock:
+            for vehicle_id in vehicle_ids:
+                old = self.states.pop(vehicle_id, None)
+                if old:
+                    self.occupancy -= old[0]
+                self.dirty.discard(vehicle_id)
+
+    def flush(self) -> int:
+        """将脏状态批量写回车辆表（经写线程组提交）并推进检查点，返回写回的车辆数"""
+        def operation():
+            cursor = self.db._get_thread_cursor()
+            # 通行写入在 lock 内提交并更新内存，此时已写入的事件都已反映在内存状态中
+            with self.lock:
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'passage_outbox'")
+                row = cursor.fetchone()
+                seq = row[0] if row else 0
+                batch = {v: self.states[v] for v in self.dirty if v in self.states}
+                self.dirty.clear()
+            if not batch and seq == self.checkpoint:
+                return (True, 0)
+            try:
+                cursor.executemany(_VEHICLE_STATE_UPDATE_SQL,
+                                   [state + (vehicle_id,) for vehicle_id, state in batch.items()])
+                cursor.execute("UPDATE row_counters SET value = ? WHERE scope = 'vehicle_state_seq' AND key = ''",
+                               (seq,))
+                self.db._commit()
+            except Exception:
+                self.db._rollback()
+                with self.lock:
+                    self.dirty |= batch.keys()
+                raise
+            self.checkpoint = seq
+            return (True, len(batch))
+
+        with self.flush_lock:
+            flushed = self.db._execute_write(operation)[1]
+        if flushed:
+            self.stats['flushes'] += 1
+            self.stats['flushed'] += flushed
+        return flushed
+
+class VehicleDB(VehicleStorage):
     def __init__(self):
         self.initialized = False
         self.db_path = None
+        self.pragmas = dict(SQLITE_PROFILES["durable"])
         self.lock = threading.Lock()
         self.local = threading.local()
-
-    def initialize(self, db_path: str = "vehicle_db.db") -> bool:
-        """初始化数据库，创建表并添加默认管理员"""
+        self.writer = None
+        self.sensor_registry = SensorRegistry(self)
+        self.partitioning = False
+        # 通行记录自增ID基数，分片模式下各分片取不同值，保证ID在分片之间不冲突
+        self.id_base = 0
+        # 内存数据库（":memory:"）的共享缓存URI及保持库存活的连接
+        self.memory_uri = None
+        self.memory_anchor = None
+        # 共享缓存使用表级锁，冲突时立即报错（不受busy_timeout影响），内存数据库的操作逐个执行
+        self.memory_lock = threading.RLock()
+        # 车辆状态写回缓存（enable_vehicle_state_table 启用）
+        self.vehicle_states = None
+        # 锁冲突重试策略及按方法统计的重试次数、等锁时间、最终失败次数
+        self.retry_policy = dict(RETRY_POLICY)
+        self.retry_stats = {}
+        self.retry_stats_lock = threading.Lock()
+
+    def initialize(self, db_path: str = "vehicle_db.db", profile: Any = "durable",
+                   pragmas: Optional[Dict[str, Any]] = None) -> bool:
+        """初始化数据库，创建表并添加默认管理员
+
+        profile 为 SQLITE_PROFILES 中的预设名或自定义配置字典，pragmas 用于覆盖单项配置
+        """
         with self.lock:
             if self.initialized:
                 return True
             
             self.db_path = db_path
             try:
-                conn = sqlite3.connect(db_path)
+                self.pragmas = self._resolve_pragmas(profile, pragmas)
+                if db_path == ":memory:":
+                    # 共享缓存内存库在最后一个连接关闭时销毁，保持一个连接直到close
+                    self.memory_uri = f"file:vehicle_db_mem_{next(_memory_db_ids)}?mode=memory&cache=shared"
+                    self.memory_anchor = self._connect()
+                conn = self._connect()
+                # 新建数据库使用增量自动清理，删除数据后可用incremental_vacuum回收空间（已有表时不生效）
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                self._apply_pragmas(conn)
                 cursor = conn.cursor()
 
                 # 创建用户表
@@ -73,6 +1078,22 @@ class VehicleDB:
                 )
                 ''')
 
+                # 执行未应用的结构迁移
+                self._apply_migrations(conn)
+
+                # 读取通行记录分区模式
+                cursor.execute("SELECT value FROM db_settings WHERE key = 'passage_partitioning'")
+                row = cursor.fetchone()
+                self.partitioning = bool(row and row[0] == 'monthly')
+
+                # 设置通行记录自增ID起点（仅对尚未写入过记录的表生效）
+                if self.id_base:
+                    cursor.execute(
+                        """INSERT INTO sqlite_sequence (name, seq) SELECT 'passage_records', ?
+                           WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'passage_records')""",
+                        (self.id_base,)
+                    )
+
                 # 添加默认管理员
                 cursor.execute("SELECT id FROM users WHERE name = 'root'")
                 if not cursor.fetchone():
@@ -92,6 +1113,81 @@ class VehicleDB:
                 if 'conn' in locals():
                     conn.close()
     
+    def _resolve_pragmas(self, profile: Any, overrides: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """合并预设与覆盖项，并校验配置合法性"""
+        if isinstance(profile, str):
+            if profile not in SQLITE_PROFILES:
+                raise ValueError(f"未知的性能配置: {profile}")
+            settings = dict(SQLITE_PROFILES[profile])
+        else:
+            settings = dict(SQLITE_PROFILES["durable"])
+            settings.update(profile or {})
+        settings.update(overrides or {})
+
+        for key, value in settings.items():
+            if key not in _PRAGMA_CHOICES:
+                raise ValueError(f"不支持的PRAGMA配置: {key}")
+            choices = _PRAGMA_CHOICES[key]
+            if choices is None:
+                settings[key] = int(value)
+            elif str(value).upper() not in choices:
+                raise ValueError(f"PRAGMA {key} 的取值无效: {value}")
+            else:
+                settings[key] = str(value).upper()
+        return settings
+
+    def _apply_pragmas(self, conn: sqlite3.Connection) -> None:
+        """将性能配置应用到连接（取值已在_resolve_pragmas中校验）"""
+        for key, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {key} = {value}")
+
+    def get_pragma_settings(self) -> Dict[str, Any]:
+        """读取当前线程连接上实际生效的PRAGMA配置"""
+        def operation():
+            cursor = self._get_thread_cursor()
+            settings = {}
+            for key in self.pragmas:
+                cursor.execute(f"PRAGMA {key}")
+                value = cursor.fetchone()[0]
+                if key in _PRAGMA_NAMES:
+                    value = _PRAGMA_NAMES[key][value]
+                elif isinstance(value, str):
+                    value = value.upper()
+                settings[key] = value
+            return settings
+
+        return self._retry_operation(operation)
+
+    def _apply_migrations(self, conn: sqlite3.Connection) -> None:
+        """按版本号顺序执行结构迁移，每个迁移在独立事务中完成"""
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, description, statements in SCHEMA_MIGRATIONS:
+            if version <= current:
+                continue
+            try:
+                conn.execute("BEGIN")
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                # PRAGMA 不支持参数绑定，版本号为内部整数常量
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.commit()
+                current = version
+            except Exception as e:
+                conn.rollback()
+                raise RuntimeError(f"数据库迁移 {version}（{description}）失败: {e}")
+
+    def get_schema_version(self) -> int:
+        """查询当前数据库结构版本"""
+        def operation():
+            cursor = self._get_thread_cursor()
+            cursor.execute("PRAGMA user_version")
+            return cursor.fetchone()[0]
+
+        return self._retry_operation(operation)
+
     def initialize_test_data(self) -> bool:
         """添加测试数据，返回是否成功"""
         def operation():
@@ -192,19 +1288,60 @@ class VehicleDB:
             print(f"测试数据插入过程发生异常: {e}")
             return False
 
+    def _connect(self, timeout: float = 5.0) -> sqlite3.Connection:
+        """打开新连接；内存数据库使用共享缓存URI，使各线程的连接访问同一个库"""
+        if self.db_path == ":memory:":
+            return sqlite3.connect(self.memory_uri, uri=True, timeout=timeout)
+        return sqlite3.connect(self.db_path, timeout=timeout)
+
     def _get_thread_connection(self) -> sqlite3.Connection:
         """获取线程专属数据库连接"""
         if not hasattr(self.local, 'conn'):
             if not self.initialized:
                 raise RuntimeError("数据库未初始化，请先调用initialize方法")
-            self.local.conn = sqlite3.connect(self.db_path)
+            timeout = self.pragmas.get("busy_timeout", 5000) / 1000
+            self.local.conn = self._connect(timeout)
             self.local.conn.row_factory = sqlite3.Row
+            self._apply_pragmas(self.local.conn)
         return self.local.conn
 
     def _get_thread_cursor(self) -> sqlite3.Cursor:
         """获取线程专属游标"""
         return self._get_thread_connection().cursor()
 
+    @contextmanager
+    def read_session(self, timeout: Optional[float] = 5.0):
+        """在上下文期间为当前线程借用只读连接，期间的查询走只读连接池
+
+        内存数据库不使用连接池；连接池已满且超时时退回线程专属连接
+        """
+        if getattr(self.local, 'read_conn', None) is not None or self.db_path == ":memory:":
+            yield
+            return
+        pool = get_read_pool(self.db_path, pragmas=self.pragmas)
+        conn = pool.acquire(timeout)
+        if conn is None:
+            yield
+            return
+        self.local.read_conn = conn
+        try:
+            yield
+        finally:
+            self.local.read_conn = None
+            pool.release(conn)
+
+    def reserve_read_connections(self, count: int) -> None:
+        """在只读连接池中为count个并发请求预留连接（负数取消预留），内存数据库不使用连接池"""
+        if self.db_path != ":memory:":
+            get_read_pool(self.db_path, pragmas=self.pragmas).reserve(count)
+
+    def _get_read_cursor(self) -> sqlite3.Cursor:
+        """获取查询用游标：处于read_session中时使用只读连接，否则使用线程专属连接"""
+        conn = getattr(self.local, 'read_conn', None)
+        if conn is not None:
+            return conn.cursor()
+        return self._get_thread_cursor()
+
     def close_thread_resources(self) -> None:
         """关闭当前线程的数据库连接"""
         if hasattr(self.local, 'conn'):
@@ -212,23 +1349,228 @@ class VehicleDB:
             del self.local.conn
 
     def close(self) -> None:
-        """标记数据库为未初始化状态"""
+        """标记数据库为未初始化状态（内存数据库同时释放）"""
+        self.disable_vehicle_state_table()
+        self.stop_writer()
         with self.lock:
             self.initialized = False
+            if self.memory_anchor is not None:
+                self.memory_anchor.close()
+                self.memory_anchor = None
 
-    def _retry_operation(self, operation, max_retries: int = 3, delay: float = 0.1) -> Any:
-        """带重试机制的数据库操作"""
-        for i in range(max_retries):
+    def start_writer(self, max_batch: int = 64, max_delay_ms: float = 5, queue_size: int = 10000) -> None:
+        """启用单写线程，之后所有写操作经队列由写线程组提交"""
+        with self.lock:
+            if not self.initialized:
+                raise RuntimeError("数据库未初始化，请先调用initialize方法")
+            if self.writer is not None:
+                return
+            self.writer = GroupCommitWriter(self, max_batch, max_delay_ms, queue_size)
+            self.writer.start()
+
+    def stop_writer(self) -> None:
+        """停止单写线程，之后写操作恢复在调用线程中直接提交"""
+        writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.stop()
+
+    def enable_vehicle_state_table(self, flush_interval: float = 1.0, max_dirty: int = 1000) -> int:
+        """启用车辆状态写回缓存：恢复并加载全部车辆状态，之后通行记录只更新内存，由后台线程批量写回
+
+        返回恢复时重放过通行记录的车辆数（上次未写回即退出的车辆）
+        """
+        with self.lock:
+            if not self.initialized:
+                raise RuntimeError("数据库未初始化，请先调用initialize方法")
+            if self.vehicle_states is not None:
+                return 0
+            states = VehicleStateTable(self, flush_interval, max_dirty)
+            states.start()
+            self.vehicle_states = states
+            return states.stats['recovered']
+
+    def disable_vehicle_state_table(self) -> None:
+        """写回全部车辆状态并停用写回缓存，之后通行记录恢复直接更新车辆表（应在停止写入后调用）"""
+        states, self.vehicle_states = self.vehicle_states, None
+        if states is not None:
+            states.stop()
+
+    def flush_vehicle_states(self) -> int:
+        """立即写回内存中的车辆状态，返回写回的车辆数（未启用写回缓存时返回0）"""
+        states = self.vehicle_states
+        return states.flush() if states is not None else 0
+
+    def _execute_write(self, operation) -> Any:
+        """执行写操作：启用写线程时入队等待组提交，否则在当前线程执行"""
+        writer = self.writer
+        if writer is None or writer.is_writer_thread():
+            return self._retry_operation(operation)
+        # 批事务开始时等待写锁超时会使整批失败，调用方按退避策略重新入队；
+        # 不持有 memory_lock 等待，写线程执行批次时需要获取该锁
+        try:
+            return self._retry_operation_unlocked(lambda: writer.submit(operation).result(),
+                                                  _operation_name(operation))
+        except WriterStoppedError:
+            # 写线程在入队前后停止，操作未执行，改在当前线程直接执行
+            return self._retry_operation(operation)
+
+    def _commit(self) -> None:
+        """提交当前线程的写事务（写线程中由批次统一提交）"""
+        if not getattr(self.local, 'group_commit', False):
+            self._get_thread_connection().commit()
+
+    def _rollback(self) -> None:
+        """回滚当前线程的写事务（写线程中由保存点回滚）"""
+        if not getattr(self.local, 'group_commit', False):
+            self._get_thread_connection().rollback()
+
+    def _retry_operation(self, operation, name: Optional[str] = None) -> Any:
+        """带重试机制的数据库操作：锁冲突时按 retry_policy 指数退避重试，其他错误直接抛出"""
+        if self.db_path == ":memory:":
+            with self.memory_lock:
+                return self._retry_operation_unlocked(operation, name)
+        return self._retry_operation_unlocked(operation, name)
+
+    def _retry_operation_unlocked(self, operation, name: Optional[str]) -> Any:
+        policy = self.retry_policy
+        first_started = time.monotonic()
+        deadline = first_started + policy['deadline']
+        delay = policy['base_delay']
+        retries = 0
+        while True:
+            started = time.monotonic()
             try:
-                return operation()
-            except sqlite3.OperationalError as e:
-                if "database is locked" in str(e) and i < max_retries - 1:
-                    import time
-                    time.sleep(delay * (i + 1))
-                    continue
-                raise
+                result = operation()
             except Exception as e:
-                raise
+                if not _is_busy_error(e):
+                    raise
+                now = time.monotonic()
+                if now >= deadline:
+                    self._record_retries(name or _operation_name(operation), retries, now - first_started, True)
+                    raise
+                # 快照过期等错误需结束当前事务后重新开始
+                self._reset_thread_transaction()
+                # 等量抖动：在 [delay/2, delay] 内随机等待，避免冲突的线程同时重试
+                time.sleep(min(random.uniform(delay / 2, delay), deadline - now))
+                delay = min(delay * 2, policy['max_delay'])
+                retries += 1
+                continue
+            if retries:
+                self._record_retries(name or _operation_name(operation), retries, started - first_started, False)
+            return result
+
+    def _reset_thread_transaction(self) -> None:
+        """回滚当前线程连接上未结束的事务（写线程的批事务由写线程自行处理）"""
+        if getattr(self.local, 'group_commit', False):
+            return
+        for conn in (getattr(self.local, 'conn', None), getattr(self.local, 'read_conn', None)):
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+
+    def _record_retries(self, name: str, retries: int, waited: float, failed: bool) -> None:
+        """记录一次发生锁冲突的操作（无冲突的操作不计入，避免热路径加锁）"""
+        with self.retry_stats_lock:
+            stats = self.retry_stats.get(name)
+            if stats is None:
+                stats = self.retry_stats[name] = {'contended': 0, 'retries': 0, 'lock_wait': 0.0, 'failures': 0}
+            stats['contended'] += 1
+            stats['retries'] += retries
+            stats['lock_wait'] += waited
+            if failed:
+                stats['failures'] += 1
+
+    def get_retry_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按方法返回锁冲突统计：发生冲突的调用数、重试次数、等锁总秒数、超过期限的最终失败次数"""
+        with self.retry_stats_lock:
+            return {name: dict(stats) for name, stats in self.retry_stats.items()}
+
+    def reset_retry_stats(self) -> None:
+        """清空锁冲突统计"""
+        with self.retry_stats_lock:
+            self.retry_stats.clear()
+
+    def _read_counter(self, cursor: sqlite3.Cursor, scope: str, key: str = '') -> int:
+        """读取触发器维护的行计数"""
+        cursor.execute("SELECT value FROM row_counters WHERE scope = ? AND key = ?", (scope, key))
+        row = cursor.fetchone()
+        return row['value'] if row else 0
+
+    def rebuild_row_counters(self) -> Tuple[bool, str]:
+        """按表内容重新统计行计数，用于修复计数表"""
+        def operation():
+            cursor = self._get_thread_cursor()
+            try:
+                for statement in _COUNTER_REBUILD_SQL:
+                    cursor.execute(statement)
+                # 累加各分区表中的通行记录
+                for table in self._passage_sources(cursor)[:-1]:
+                    cursor.execute(f"""INSERT INTO row_counters (scope, key, value)
+                        SELECT 'passages', '', COUNT(*) FROM {table} WHERE 1
+                        ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value""")
+                    cursor.execute(f"""INSERT INTO row_counters (scope, key, value)
+                        SELECT 'vehicle_passages', vehicle_id, COUNT(*) FROM {table} GROUP BY vehicle_id
+                        ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value""")
+                    cursor.execute(f"""INSERT INTO row_counters (scope, key, value)
+                        SELECT 'sensor_passages', CAST(sensor_id AS TEXT), COUNT(*) FROM {table} GROUP BY sensor_id
+                        ON CONFLICT (scope, key) DO UPDATE SET value = value + excluded.value""")
+                self._commit()
+                return (True, "行计数重建成功")
+            except Exception as e:
+                self._rollback()
+                _raise_if_busy(e)
+                return (False, f"重建失败: {str(e)}")
+
+        return self._execute_write(operation)
+
+    def get_campus_occupancy(self) -> Tuple[bool, Any]:
+        """查询当前在校车辆数（读取触发器维护的计数，O(1)；启用车辆状态表时读取内存计数）"""
+        states = self.vehicle_states
+        if states is not None:
+            with states.lock:
+                return (True, states.occupancy)
+
+        def operation():
+            cursor = self._get_read_cursor()
+            try:
+                return (True, self._read_counter(cursor, "campus_occupancy"))
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}")
+
+        return self._retry_operation(operation)
+
+    def reconcile_campus_occupancy(self, repair: bool = True) -> Tuple[bool, Any]:
+        """按车辆表核对在校车辆计数，repair为True时将不一致的计数修正为实际值"""
+        # 启用车辆状态表时先写回内存状态，使车辆表为最新
+        self.flush_vehicle_states()
+
+        def operation():
+            cursor = self._get_thread_cursor()
+            try:
+                counter = self._read_counter(cursor, "campus_occupancy")
+                cursor.execute("SELECT COUNT(*) FROM vehicles WHERE is_on_campus")
+                actual = cursor.fetchone()[0]
+                repaired = False
+                if counter != actual and repair:
+                    cursor.execute(
+                        """INSERT INTO row_counters (scope, key, value) VALUES ('campus_occupancy', '', ?)
+                           ON CONFLICT (scope, key) DO UPDATE SET value = excluded.value""",
+                        (actual,)
+                    )
+                    self._commit()
+                    repaired = True
+                return (True, {
+                    'counter': counter,
+                    'actual': actual,
+                    'consistent': counter == actual,
+                    'repaired': repaired
+                })
+            except Exception as e:
+                self._rollback()
+                _raise_if_busy(e)
+                return (False, f"核对失败: {str(e)}")
+
+        return self._execute_write(operation)
 
     def _hash_password(self, password: str) -> str:
         """密码哈希处理"""
@@ -249,17 +1591,18 @@ class VehicleDB:
                     "INSERT INTO users (name, password, is_admin) VALUES (?, ?, ?)",
                     (name, hashed_pwd, is_admin)
                 )
-                self._get_thread_connection().commit()
+                self._commit()
                 return (True, "用户添加成功")
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"添加失败: {str(e)}")
 
-        return self._retry_operation(operation)
+        return self._execute_write(operation)
 
     def verify_user(self, name: str, password: str) -> Tuple[bool, int, bool]:
         """验证用户密码"""
         def operation():
-            cursor = self._get_thread_cursor()
+            cursor = self._get_read_cursor()
             try:
                 cursor.execute("SELECT id, password, is_admin FROM users WHERE name = ?", (name,))
                 user = cursor.fetchone()
@@ -271,6 +1614,7 @@ class VehicleDB:
                     return (True, user['id'], user['is_admin'])
                 return (False, -1, False)
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, -1, False)
 
         return self._retry_operation(operation)
@@ -296,12 +1640,13 @@ class VehicleDB:
                     "UPDATE users SET password = ?, updated_at = CURRENT_TIMESTAMP WHERE name = ?",
                     (hashed_new, name)
                 )
-                self._get_thread_connection().commit()
+                self._commit()
                 return (True, "密码修改成功")
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"修改失败: {str(e)}")
 
-        return self._retry_operation(operation)
+        return self._execute_write(operation)
 
     def delete_user(self, name: str, password: Optional[str]) -> Tuple[bool, str]:
         """删除用户"""
@@ -320,19 +1665,24 @@ class VehicleDB:
                         return (False, "密码不正确，无法删除")
 
                 # 删除用户及关联数据
+                cursor.execute("SELECT vehicle_id FROM vehicles WHERE registered_by = ?", (user['id'],))
+                vehicle_ids = [row['vehicle_id'] for row in cursor.fetchall()]
                 cursor.execute("DELETE FROM vehicles WHERE registered_by = ?", (user['id'],))
                 cursor.execute("DELETE FROM users WHERE id = ?", (user['id'],))
-                self._get_thread_connection().commit()
+                self._commit()
+                if self.vehicle_states is not None:
+                    self.vehicle_states.discard(vehicle_ids)
                 return (True, "用户删除成功")
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"删除失败: {str(e)}")
 
-        return self._retry_operation(operation)
+        return self._execute_write(operation)
 
     def get_user_id_by_name(self, name: str) -> Tuple[bool, int]:
         """根据用户名获取用户ID"""
         def operation():
-            cursor = self._get_thread_cursor()
+            cursor = self._get_read_cursor()
             try:
                 cursor.execute("SELECT id FROM users WHERE name = ?", (name,))
                 user = cursor.fetchone()
@@ -340,6 +1690,7 @@ class VehicleDB:
                     return (False, -1)
                 return (True, user['id'])
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, -1)
         
         return self._retry_operation(operation)
@@ -364,12 +1715,16 @@ class VehicleDB:
                        VALUES (?, ?, ?, ?, ?)""",
                     (sensor_id, location, description, is_active, is_gate)
                 )
-                self._get_thread_connection().commit()
+                self._commit()
                 return (True, "传感器添加成功")
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"添加失败: {str(e)}")
 
-        return self._retry_operation(operation)
+        result = self._execute_write(operation)
+        # 提交后使进程内传感器缓存失效
+        self.sensor_registry.invalidate()
+        return result
 
     def delete_sensor(self, sensor_id: str) -> Tuple[bool, str]:
         """删除传感器"""
@@ -381,16 +1736,22 @@ class VehicleDB:
                 if not sensor:
                     return (False, "传感器不存在")
                 
-                # 删除关联的通行记录
-                cursor.execute("DELETE FROM passage_records WHERE sensor_id = ?", (sensor['id'],))
+                # 删除关联的通行记录（含各分区）
+                for table in self._passage_sources(cursor):
+                    cursor.execute(f"DELETE FROM {table} WHERE sensor_id = ?", (sensor['id'],))
+                cursor.execute("DELETE FROM sensor_hourly_rollups WHERE sensor_id = ?", (sensor['id'],))
                 # 删除传感器
                 cursor.execute("DELETE FROM sensors WHERE id = ?", (sensor['id'],))
-                self._get_thread_connection().commit()
+                self._commit()
                 return (True, "传感器删除成功")
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"删除失败: {str(e)}")
 
-        return self._retry_operation(operation)
+        result = self._execute_write(operation)
+        # 提交后使进程内传感器缓存失效
+        self.sensor_registry.invalidate()
+        return result
 
     # 车辆管理函数
     def add_vehicle(self, vehicle_id: str, registered_by: int, is_on_campus: bool = False) -> Tuple[bool, str]:
@@ -415,12 +1776,15 @@ class VehicleDB:
                        VALUES (?, ?, ?)""",
                     (vehicle_id, is_on_campus, user_id)
                 )
-                self._get_thread_connection().commit()
+                self._commit()
+                if self.vehicle_states is not None:
+                    self.vehicle_states.add(vehicle_id, is_on_campus)
                 return (True, "车辆注册成功")
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"注册失败: {str(e)}")
 
-        return self._retry_operation(operation)
+        return self._execute_write(operation)
 
     def delete_vehicle(self, vehicle_id: str) -> Tuple[bool, str]:
         """删除车辆"""
@@ -431,78 +1795,360 @@ class VehicleDB:
                 if not cursor.fetchone():
                     return (False, "车辆不存在")
                 
-                # 删除关联的通行记录
-                cursor.execute("DELETE FROM passage_records WHERE vehicle_id = ?", (vehicle_id,))
+                # 删除关联的通行记录（含各分区）
+                for table in self._passage_sources(cursor):
+                    cursor.execute(f"DELETE FROM {table} WHERE vehicle_id = ?", (vehicle_id,))
+                # 归档段文件不修改，删除车辆索引后查询不再返回其归档记录
+                cursor.execute("DELETE FROM passage_archive_vehicles WHERE vehicle_id = ?", (vehicle_id,))
                 # 删除车辆
                 cursor.execute("DELETE FROM vehicles WHERE vehicle_id = ?", (vehicle_id,))
-                self._get_thread_connection().commit()
+                self._commit()
+                if self.vehicle_states is not None:
+                    self.vehicle_states.discard([vehicle_id])
                 return (True, "车辆删除成功")
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"删除失败: {str(e)}")
 
-        return self._retry_operation(operation)
+        return self._execute_write(operation)
 
     # 通行记录管理函数
     def add_passage_record(self, vehicle_id: str, sensor_id: int) -> Tuple[bool, str]:
         """添加通行记录并根据校门传感器状态反转车辆在校状态"""
         def operation():
             cursor = self._get_thread_cursor()
+            state_table = self.vehicle_states
             try:
-                # 检查车辆是否存在
-                cursor.execute("SELECT vehicle_id, is_on_campus FROM vehicles WHERE vehicle_id = ?", (vehicle_id,))
-                vehicle = cursor.fetchone()
-                if not vehicle:
-                    return (False, "车辆不存在")
-                
-                # 检查传感器是否存在并获取是否为校门传感器
-                cursor.execute("SELECT id, is_gate FROM sensors WHERE id = ?", (sensor_id,))
-                sensor = cursor.fetchone()
-                if not sensor:
-                    return (False, "传感器不存在")
-                
-                # 添加通行记录
-                passage_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                cursor.execute(
-                    """INSERT INTO passage_records (vehicle_id, sensor_id, passage_time) 
-                       VALUES (?, ?, ?)""",
-                    (vehicle_id, sensor_id, passage_time)
-                )
-                
-                # 如果是校门传感器，反转车辆在校状态
-                is_on_campus = vehicle['is_on_campus']
-                if sensor['is_gate']:
-                    is_on_campus = not is_on_campus
-                
-                # 更新车辆状态
-                cursor.execute(
-                    """UPDATE vehicles SET is_on_campus = ?, updated_at = CURRENT_TIMESTAMP 
-                       WHERE vehicle_id = ?""",
-                    (is_on_campus, vehicle_id)
-                )
-                
-                self._get_thread_connection().commit()
+                with self._vehicle_state_lock(state_table):
+                    # 检查车辆是否存在并读取当前状态（启用车辆状态表时读取内存）
+                    state = self._load_vehicle_states(cursor, state_table, [vehicle_id]).get(vehicle_id)
+                    if state is None:
+                        return (False, "车辆不存在")
+                    
+                    # 检查传感器是否存在并获取是否为校门传感器（查询进程内缓存）
+                    sensor = self.sensor_registry.lookup_id(sensor_id)
+                    if not sensor:
+                        return (False, "传感器不存在")
+                    
+                    # 添加通行记录
+                    passage_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    table = self._passage_table_for(cursor, passage_time)
+                    cursor.execute(
+                        f"""INSERT INTO {table} (vehicle_id, sensor_id, passage_time) 
+                           VALUES (?, ?, ?)""",
+                        (vehicle_id, sensor_id, passage_time)
+                    )
+                    self._add_to_hourly_rollups(cursor, [(vehicle_id, sensor_id, passage_time)])
+                    
+                    # 如果是校门传感器，反转车辆在校状态
+                    passage_id = cursor.lastrowid
+                    state = _advance_vehicle_state(state, sensor_id, passage_time, passage_id, sensor[2])
+                    self._append_outbox(cursor, [(passage_id, vehicle_id, sensor_id, passage_time, state[0])])
+                    self._save_vehicle_states(cursor, state_table, {vehicle_id: state})
                 return (True, "通行记录添加成功")
             except Exception as e:
+                # 通行记录、小时汇总、在校计数触发器和发件箱在同一事务中，失败时整体回滚
+                self._rollback()
+                _raise_if_busy(e)
                 return (False, f"添加失败: {str(e)}")
 
+        return self._execute_write(operation)
+
+    def add_passage_records_bulk(self, events: Sequence[Tuple[str, int, Any]]) -> Tuple[bool, Any]:
+        """批量添加通行记录，在一个事务中写入
+
+        events 为 (vehicle_id, sensor_id, timestamp) 序列，timestamp 可为datetime、
+        "%Y-%m-%d %H:%M:%S"格式字符串或None（使用当前时间）。校门传感器按事件顺序
+        逐条反转车辆在校状态。成功时返回 (True, 每条事件的(是否成功, 结果信息)列表)
+        """
+        def operation():
+            cursor = self._get_thread_cursor()
+            state_table = self.vehicle_states
+            try:
+                with self._vehicle_state_lock(state_table):
+                    return self._add_passages_bulk(cursor, state_table, events)
+            except Exception as e:
+                self._rollback()
+                _raise_if_busy(e)
+                return (False, f"批量添加失败: {str(e)}")
+
+        return self._execute_write(operation)
+
+    def _add_passages_bulk(self, cursor: sqlite3.Cursor, state_table: Optional[VehicleStateTable],
+                           events: Sequence[Tuple[str, int, Any]]) -> Tuple[bool, Any]:
+        """add_passage_records_bulk 的事务主体（调用方持有车辆状态锁）"""
+        # 预先加载涉及的车辆状态和传感器类型
+        states = self._load_vehicle_states(cursor, state_table, list({e[0] for e in events if len(e) == 3}))
+        gates = {}
+        for sensor_id in {e[1] for e in events if len(e) == 3}:
+            sensor = self.sensor_registry.lookup_id(sensor_id)
+            if sensor:
+                gates[sensor_id] = sensor[2]
+
+        results = []
+        rows = []
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for event in events:
+            if len(event) != 3:
+                results.append((False, "事件格式无效"))
+                continue
+            vehicle_id, sensor_id, timestamp = event
+            if vehicle_id not in states:
+                results.append((False, "车辆不存在"))
+                continue
+            if sensor_id not in gates:
+                results.append((False, "传感器不存在"))
+                continue
+            if timestamp is None:
+                passage_time = now
+            elif isinstance(timestamp, datetime):
+                passage_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            else:
+                try:
+                    passage_time = datetime.strptime(str(timestamp), "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    results.append((False, "时间格式无效"))
+                    continue
+            rows.append((vehicle_id, sensor_id, passage_time))
+            results.append((True, "通行记录添加成功"))
+
+        # 按目标表（分区）分组后批量写入，同一事务内各表的自增ID连续分配
+        rows_by_table = {}
+        for index, row in enumerate(rows):
+            rows_by_table.setdefault(self._passage_table_for(cursor, row[2]), []).append(index)
+        passage_ids = [0] * len(rows)
+        for table, indexes in rows_by_table.items():
+            cursor.executemany(
+                f"""INSERT INTO {table} (vehicle_id, sensor_id, passage_time) 
+                   VALUES (?, ?, ?)""",
+                [rows[i] for i in indexes]
+            )
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+            last_id = cursor.fetchone()[0]
+            for offset, i in enumerate(indexes):
+                passage_ids[i] = last_id - len(indexes) + 1 + offset
+        self._add_to_hourly_rollups(cursor, rows)
+
+        # 校门传感器按事件顺序反转车辆在校状态
+        touched = {}
+        outbox = []
+        for (vehicle_id, sensor_id, passage_time), passage_id in zip(rows, passage_ids):
+            states[vehicle_id] = _advance_vehicle_state(states[vehicle_id], sensor_id, passage_time,
+                                                        passage_id, gates[sensor_id])
+            touched[vehicle_id] = states[vehicle_id]
+            outbox.append((passage_id, vehicle_id, sensor_id, passage_time, states[vehicle_id][0]))
+        self._append_outbox(cursor, outbox)
+        self._save_vehicle_states(cursor, state_table, touched)
+        return (True, results)
+
+    def _append_outbox(self, cursor: sqlite3.Cursor, events: Sequence[Tuple[int, str, int, str, int]]) -> None:
+        """在写入通行记录的事务中追加发件箱事件 (passage_id, vehicle_id, sensor_id, passage_time, is_on_campus)"""
+        cursor.executemany(
+            """INSERT INTO passage_outbox (passage_id, vehicle_id, sensor_id, passage_time, is_on_campus)
+               VALUES (?, ?, ?, ?, ?)""",
+            events
+        )
+
+    @staticmethod
+    def _vehicle_state_lock(state_table: Optional[VehicleStateTable]):
+        """写入通行记录期间持有的锁：启用车辆状态表时为其锁，保证状态读改写的原子性"""
+        return state_table.lock if state_table is not None else nullcontext()
+
+    def _load_vehicle_states(self, cursor: sqlite3.Cursor, state_table: Optional[VehicleStateTable],
+                             vehicle_ids: List[str]) -> Dict[str, Tuple[int, Any, Any, Any]]:
+        """读取车辆状态 vehicle_id -> (is_on_campus, last_sensor_id, last_passage_time, last_passage_id)
+
+        启用车辆状态表时读取内存，否则查询车辆表（分块避免超出参数上限）；不存在的车辆不返回
+        """
+        if state_table is not None:
+            return state_table.get_many(cursor, vehicle_ids)
+        states = {}
+        for i in range(0, len(vehicle_ids), 500):
+            chunk = vehicle_ids[i:i + 500]
+            cursor.execute(
+                f"""SELECT vehicle_id, is_on_campus, last_sensor_id, last_passage_time, last_passage_id
+                    FROM vehicles WHERE vehicle_id IN ({','.join('?' * len(chunk))})""",
+                chunk
+            )
+            for row in cursor.fetchall():
+                states[row['vehicle_id']] = (int(bool(row['is_on_campus'])), row['last_sensor_id'],
+                                             row['last_passage_time'], row['last_passage_id'])
+        return states
+
+    def _save_vehicle_states(self, cursor: sqlite3.Cursor, state_table: Optional[VehicleStateTable],
+                             states: Dict[str, Tuple[int, Any, Any, Any]]) -> None:
+        """提交通行记录及车辆状态：启用车辆状态表时提交后只更新内存（由后台批量写回），否则在同一事务中更新车辆表"""
+        if state_table is None:
+            cursor.executemany(_VEHICLE_STATE_UPDATE_SQL,
+                               [state + (vehicle_id,) for vehicle_id, state in states.items()])
+            cursor.execute(_ADVANCE_VEHICLE_STATE_SEQ_SQL)
+        self._commit()
+        if state_table is not None:
+            state_table.put_many(states)
+
+    @staticmethod
+    def _hour_bucket(passage_time: str) -> str:
+        return passage_time[:13] + ":00:00"
+
+    def _add_to_hourly_rollups(self, cursor: sqlite3.Cursor, rows: Sequence[Tuple[str, int, str]]) -> None:
+        """将新写入的 (vehicle_id, sensor_id, passage_time) 累加到小时汇总（在写入通行记录的事务中调用）"""
+        buckets = {}
+        for vehicle_id, sensor_id, passage_time in rows:
+            buckets.setdefault((sensor_id, self._hour_bucket(passage_time)), []).append(vehicle_id)
+        for (sensor_id, hour_bucket), vehicle_ids in buckets.items():
+            cursor.execute(
+                "SELECT vehicles_sketch FROM sensor_hourly_rollups WHERE sensor_id = ? AND hour_bucket = ?",
+                (sensor_id, hour_bucket)
+            )
+            row = cursor.fetchone()
+            sketch = bytearray(row[0]) if row else bytearray(_HLL_REGISTERS)
+            for vehicle_id in vehicle_ids:
+                _hll_add(sketch, vehicle_id)
+            cursor.execute(
+                """INSERT INTO sensor_hourly_rollups
+                       (sensor_id, hour_bucket, count, distinct_vehicles_estimate, vehicles_sketch)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (sensor_id, hour_bucket) DO UPDATE SET
+                       count = count + excluded.count,
+                       distinct_vehicles_estimate = excluded.distinct_vehicles_estimate,
+                       vehicles_sketch = excluded.vehicles_sketch""",
+                (sensor_id, hour_bucket, len(vehicle_ids), _hll_estimate(sketch), bytes(sketch))
+            )
+
+    def get_sensor_hourly_traffic(self, sensor_id: int, start_time: str,
+                                  end_time: str) -> Tuple[bool, Any]:
+        """查询传感器在 [start_time, end_time) 内各小时的通行量及去重车辆估算
+
+        汇总按整点小时统计，两端均向下取整到整点：包含 start_time 所在的小时，不包含 end_time 所在的小时
+        （end_time 为整点时即左闭右开，非整点时该小时中 end_time 之前的通行也不计入）。
+        直接读取小时汇总表，耗时与小时数成正比，与通行记录数无关；
+        返回各小时数据及整个时段的总通行量和去重车辆估算（合并各小时的估算寄存器）
+        """
+        def operation():
+            cursor = self._get_read_cursor()
+            try:
+                cursor.execute("SELECT id FROM sensors WHERE id = ?", (sensor_id,))
+                if not cursor.fetchone():
+                    return (False, "传感器不存在")
+                cursor.execute("""
+                    SELECT hour_bucket, count, distinct_vehicles_estimate, vehicles_sketch
+                    FROM sensor_hourly_rollups
+                    WHERE sensor_id = ? AND hour_bucket >= ? AND hour_bucket < ?
+                    ORDER BY hour_bucket
+                """, (sensor_id, self._hour_bucket(start_time), self._hour_bucket(end_time)))
+                hours = []
+                merged = bytearray(_HLL_REGISTERS)
+                for row in cursor.fetchall():
+                    hours.append({
+                        'hour_bucket': row['hour_bucket'],
+                        'count': row['count'],
+                        'distinct_vehicles_estimate': row['distinct_vehicles_estimate']
+                    })
+                    _hll_merge(merged, row['vehicles_sketch'])
+                return (True, {
+                    'sensor_id': sensor_id,
+                    'hours': hours,
+                    'total': sum(h['count'] for h in hours),
+                    'distinct_vehicles_estimate': _hll_estimate(merged)
+                })
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}")
+
         return self._retry_operation(operation)
 
+    def rebuild_sensor_hourly_rollups(self, start_month: Optional[str] = None,
+                                      end_month: Optional[str] = None) -> Tuple[bool, Any]:
+        """按通行记录（含分区和归档）回填小时汇总，start_month/end_month为YYYY-MM（均含）
+
+        每个月份一个写事务：先删除该月汇总再重新统计，期间新写入的记录等待事务结束后再累加
+        """
+        def list_months():
+            cursor = self._get_thread_cursor()
+            try:
+                months = set()
+                for table in self._passage_sources(cursor):
+                    cursor.execute(f"SELECT DISTINCT substr(passage_time, 1, 7) FROM {table}")
+                    months.update(row[0] for row in cursor.fetchall())
+                cursor.execute("SELECT DISTINCT month FROM passage_archives")
+                months.update(row[0] for row in cursor.fetchall())
+                return (True, sorted(m for m in months
+                                     if (start_month is None or m >= start_month)
+                                     and (end_month is None or m <= end_month)))
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}")
+
+        success, months = self._retry_operation(list_months)
+        if not success:
+            return (False, months)
+
+        records = 0
+        for month in months:
+            success, result = self._execute_write(lambda: self._rebuild_month_rollups(month))
+            if not success:
+                return (False, result)
+            records += result
+        return (True, {'months': len(months), 'records': records})
+
+    def _rebuild_month_rollups(self, month: str) -> Tuple[bool, Any]:
+        """重建一个月份的小时汇总（在写事务中执行）"""
+        cursor = self._get_thread_cursor()
+        try:
+            start, end = f"{month}-01 00:00:00", self._month_end(month)
+            cursor.execute(
+                "DELETE FROM sensor_hourly_rollups WHERE hour_bucket >= ? AND hour_bucket <= ?",
+                (start, end)
+            )
+            rows = []
+            for table in self._passage_sources(cursor):
+                cursor.execute(f"""
+                    SELECT vehicle_id, sensor_id, passage_time FROM {table}
+                    WHERE passage_time >= ? AND passage_time <= ?
+                """, (start, end))
+                rows += [tuple(row) for row in cursor.fetchall()]
+            if self.db_path != ":memory:":
+                cursor.execute("SELECT name FROM passage_archives WHERE month = ?", (month,))
+                for archive in cursor.fetchall():
+                    rows += [(row[1], row[2], row[3])
+                             for row in read_segment(archive_dir(self.db_path), archive['name'])]
+            self._add_to_hourly_rollups(cursor, rows)
+            self._commit()
+            return (True, len(rows))
+        except Exception as e:
+            self._rollback()
+            _raise_if_busy(e)
+            return (False, f"回填失败: {str(e)}")
+
     # 列表查询函数
-    def get_users(self, limit: int = 20, offset: int = 0) -> Tuple[bool, Any, int]:
-        """分页查询用户列表"""
+    def get_users(self, limit: int = 20, offset: int = 0, after: Optional[str] = None,
+                  with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        """分页查询用户列表，after为上一页返回的游标（提供时忽略offset）"""
         def operation():
-            cursor = self._get_thread_cursor()
+            cursor = self._get_read_cursor()
             try:
-                # 查询总数
-                cursor.execute("SELECT COUNT(*) as total FROM users")
-                total = cursor.fetchone()['total']
+                # 查询总数（读取计数表，with_total为False时跳过）
+                total = self._read_counter(cursor, "users") if with_total else None
                 
                 # 查询用户列表
-                cursor.execute("""
-                    SELECT id, name, is_admin, created_at 
-                    FROM users 
-                    LIMIT ? OFFSET ?
-                """, (limit, offset))
+                if after is not None:
+                    key = decode_page_cursor("users", after)
+                    if key is None:
+                        return (False, "无效的分页游标", 0)
+                    cursor.execute("""
+                        SELECT id, name, is_admin, created_at 
+                        FROM users 
+                        WHERE id > ?
+                        ORDER BY id
+                        LIMIT ?
+                    """, (key[0], limit))
+                else:
+                    cursor.execute("""
+                        SELECT id, name, is_admin, created_at 
+                        FROM users 
+                        ORDER BY id
+                        LIMIT ? OFFSET ?
+                    """, (limit, offset))
                 
                 users = []
                 for row in cursor.fetchall():
@@ -515,57 +2161,86 @@ class VehicleDB:
                 
                 return (True, users, total)
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"查询失败: {str(e)}", 0)
 
         return self._retry_operation(operation)
 
-    def get_vehicles(self, limit: int = 20, offset: int = 0) -> Tuple[bool, Any, int]:
-        """分页查询车辆列表"""
+    def get_vehicles(self, limit: int = 20, offset: int = 0, after: Optional[str] = None,
+                     with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        """分页查询车辆列表，after为上一页返回的游标（提供时忽略offset）"""
         def operation():
-            cursor = self._get_thread_cursor()
+            cursor = self._get_read_cursor()
             try:
-                # 查询总数
-                cursor.execute("SELECT COUNT(*) as total FROM vehicles")
-                total = cursor.fetchone()['total']
+                # 查询总数（读取计数表，with_total为False时跳过）
+                total = self._read_counter(cursor, "vehicles") if with_total else None
                 
                 # 查询车辆列表（关联用户信息）
-                cursor.execute("""
-                    SELECT v.vehicle_id, v.is_on_campus, v.created_at, u.name as registered_by_name
-                    FROM vehicles v
-                    LEFT JOIN users u ON v.registered_by = u.id
-                    LIMIT ? OFFSET ?
-                """, (limit, offset))
+                if after is not None:
+                    key = decode_page_cursor("vehicles", after)
+                    if key is None:
+                        return (False, "无效的分页游标", 0)
+                    cursor.execute("""
+                        SELECT v.vehicle_id, v.is_on_campus, v.created_at, u.name as registered_by_name
+                        FROM vehicles v
+                        LEFT JOIN users u ON v.registered_by = u.id
+                        WHERE v.vehicle_id > ?
+                        ORDER BY v.vehicle_id
+                        LIMIT ?
+                    """, (key[0], limit))
+                else:
+                    cursor.execute("""
+                        SELECT v.vehicle_id, v.is_on_campus, v.created_at, u.name as registered_by_name
+                        FROM vehicles v
+                        LEFT JOIN users u ON v.registered_by = u.id
+                        ORDER BY v.vehicle_id
+                        LIMIT ? OFFSET ?
+                    """, (limit, offset))
                 
                 vehicles = []
                 for row in cursor.fetchall():
                     vehicles.append({
                         'vehicle_id': row['vehicle_id'],
-                        'is_on_campus': row['is_on_campus'],
+                        'is_on_campus': self._current_on_campus(row['vehicle_id'], row['is_on_campus']),
                         'registered_by_name': row['registered_by_name'],
                         'created_at': row['created_at']
                     })
                 
                 return (True, vehicles, total)
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"查询失败: {str(e)}", 0)
 
         return self._retry_operation(operation)
 
-    def get_sensors(self, limit: int = 20, offset: int = 0) -> Tuple[bool, Any, int]:
-        """分页查询传感器列表"""
+    def get_sensors(self, limit: int = 20, offset: int = 0, after: Optional[str] = None,
+                    with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        """分页查询传感器列表，after为上一页返回的游标（提供时忽略offset）"""
         def operation():
-            cursor = self._get_thread_cursor()
+            cursor = self._get_read_cursor()
             try:
-                # 查询总数
-                cursor.execute("SELECT COUNT(*) as total FROM sensors")
-                total = cursor.fetchone()['total']
+                # 查询总数（读取计数表，with_total为False时跳过）
+                total = self._read_counter(cursor, "sensors") if with_total else None
                 
                 # 查询传感器列表
-                cursor.execute("""
-                    SELECT id, sensor_id, location, description, is_active, is_gate, created_at
-                    FROM sensors
-                    LIMIT ? OFFSET ?
-                """, (limit, offset))
+                if after is not None:
+                    key = decode_page_cursor("sensors", after)
+                    if key is None:
+                        return (False, "无效的分页游标", 0)
+                    cursor.execute("""
+                        SELECT id, sensor_id, location, description, is_active, is_gate, created_at
+                        FROM sensors
+                        WHERE id > ?
+                        ORDER BY id
+                        LIMIT ?
+                    """, (key[0], limit))
+                else:
+                    cursor.execute("""
+                        SELECT id, sensor_id, location, description, is_active, is_gate, created_at
+                        FROM sensors
+                        ORDER BY id
+                        LIMIT ? OFFSET ?
+                    """, (limit, offset))
                 
                 sensors = []
                 for row in cursor.fetchall():
@@ -581,15 +2256,123 @@ class VehicleDB:
                 
                 return (True, sensors, total)
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"查询失败: {str(e)}", 0)
 
         return self._retry_operation(operation)
 
+    # 流式查询函数
+    def _iter_rows(self, cursor: sqlite3.Cursor, record_type: type, row_type: str,
+                   chunk_size: int) -> Iterator[Any]:
+        """按固定块大小从已执行查询的游标中逐块读取并转换行"""
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            if row_type == "tuple":
+                yield from rows
+            elif row_type == "record":
+                yield from map(record_type, rows)
+            else:
+                fields = record_type.__slots__
+                for row in rows:
+                    yield dict(zip(fields, row))
+
+    def _stream_cursor(self, row_type: str) -> sqlite3.Cursor:
+        """创建流式查询游标，行直接以元组返回，不经过sqlite3.Row"""
+        if row_type not in ("dict", "tuple", "record"):
+            raise ValueError(f"不支持的行类型: {row_type}")
+        cursor = self._get_read_cursor()
+        cursor.row_factory = None
+        return cursor
+
+    def iter_users(self, row_type: str = "dict", chunk_size: int = 500) -> Iterator[Any]:
+        """按ID顺序流式遍历全部用户，内存占用与表大小无关
+
+        row_type 为 "dict"、"tuple"（字段顺序同 UserRecord）或 "record"（UserRecord）；
+        查询出错时抛出 sqlite3.Error。生成器应在同一线程（及同一read_session）内迭代完毕
+        """
+        cursor = self._stream_cursor(row_type)
+        cursor.execute("SELECT id, name, is_admin, created_at FROM users ORDER BY id")
+        yield from self._iter_rows(cursor, UserRecord, row_type, chunk_size)
+
+    def iter_vehicles(self, row_type: str = "dict", chunk_size: int = 500) -> Iterator[Any]:
+        """按车辆ID顺序流式遍历全部车辆，参数同 iter_users（记录类型为 VehicleRecord）"""
+        cursor = self._stream_cursor(row_type)
+        cursor.execute("""
+            SELECT v.vehicle_id, v.is_on_campus, u.name as registered_by_name, v.created_at
+            FROM vehicles v
+            LEFT JOIN users u ON v.registered_by = u.id
+            ORDER BY v.vehicle_id
+        """)
+        yield from self._iter_rows(cursor, VehicleRecord, row_type, chunk_size)
+
+    def iter_sensors(self, row_type: str = "dict", chunk_size: int = 500) -> Iterator[Any]:
+        """按ID顺序流式遍历全部传感器，参数同 iter_users（记录类型为 SensorRecord）"""
+        cursor = self._stream_cursor(row_type)
+        cursor.execute("""
+            SELECT id, sensor_id, location, description, is_active, is_gate, created_at
+            FROM sensors ORDER BY id
+        """)
+        yield from self._iter_rows(cursor, SensorRecord, row_type, chunk_size)
+
+    def iter_passages(self, vehicle_id: Optional[str] = None, sensor_id: Optional[int] = None,
+                      start_time: Optional[str] = None, end_time: Optional[str] = None,
+                      row_type: str = "dict", chunk_size: int = 500) -> Iterator[Any]:
+        """按时间升序流式遍历通行记录（含各分区，不含归档），可按车辆、传感器和时间范围 [start_time, end_time) 筛选
+
+        每张表各用一个游标按索引顺序读取，再按 (passage_time, id) 归并，
+        内存占用为每张表一个块；其余参数同 iter_users（记录类型为 PassageRecord）
+        """
+        cursor = self._stream_cursor(row_type)
+        conditions, params = [], []
+        if vehicle_id is not None:
+            conditions.append("pr.vehicle_id = ?")
+            params.append(vehicle_id)
+        if sensor_id is not None:
+            conditions.append("pr.sensor_id = ?")
+            params.append(sensor_id)
+        if start_time is not None:
+            conditions.append("pr.passage_time >= ?")
+            params.append(start_time)
+        if end_time is not None:
+            conditions.append("pr.passage_time < ?")
+            params.append(end_time)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        streams = []
+        for table in self._passage_sources(cursor):
+            table_cursor = self._stream_cursor(row_type)
+            table_cursor.execute(f"""
+                SELECT pr.id, pr.vehicle_id, pr.sensor_id, s.location, pr.passage_time, pr.created_at
+                FROM {table} pr
+                LEFT JOIN sensors s ON pr.sensor_id = s.id
+                {where}
+                ORDER BY pr.passage_time, pr.id
+            """, params)
+            streams.append(self._iter_rows(table_cursor, PassageRecord, "tuple", chunk_size))
+
+        rows = streams[0] if len(streams) == 1 else heapq.merge(*streams, key=lambda r: (r[4], r[0]))
+        if row_type == "tuple":
+            yield from rows
+        elif row_type == "record":
+            yield from map(PassageRecord, rows)
+        else:
+            fields = PassageRecord.__slots__
+            for row in rows:
+                yield dict(zip(fields, row))
+
     # 补充：车辆状态查询
+    def _current_on_campus(self, vehicle_id: str, stored: int) -> int:
+        """车辆当前在校状态：启用车辆状态表时以内存为准（车辆表中可能尚未写回）"""
+        states = self.vehicle_states
+        state = states.get(vehicle_id) if states is not None else None
+        return state[0] if state is not None else stored
+
     def get_vehicle_status(self, vehicle_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
         """查询单个车辆的详细状态"""
         def operation():
-            cursor = self._get_thread_cursor()
+            cursor = self._get_read_cursor()
             try:
                 cursor.execute("""
                     SELECT v.vehicle_id, v.is_on_campus, v.created_at, v.updated_at,
@@ -604,12 +2387,13 @@ class VehicleDB:
                 
                 return (True, {
                     'vehicle_id': row['vehicle_id'],
-                    'is_on_campus': row['is_on_campus'],
+                    'is_on_campus': self._current_on_campus(row['vehicle_id'], row['is_on_campus']),
                     'registered_by_name': row['registered_by_name'],
                     'created_at': row['created_at'],
                     'updated_at': row['updated_at']
                 })
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"查询失败: {str(e)}")
 
         return self._retry_operation(operation)
@@ -618,7 +2402,7 @@ class VehicleDB:
     def get_sensor_status(self, sensor_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
         """查询单个传感器的详细状态"""
         def operation():
-            cursor = self._get_thread_cursor()
+            cursor = self._get_read_cursor()
             try:
                 cursor.execute("""
                     SELECT id, sensor_id, location, description, is_active, is_gate, created_at, updated_at
@@ -640,38 +2424,45 @@ class VehicleDB:
                     'updated_at': row['updated_at']
                 })
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"查询失败: {str(e)}")
 
         return self._retry_operation(operation)
 
+    def lookup_sensor(self, sensor_id: str) -> Optional[Tuple[int, bool, bool]]:
+        """从进程内缓存查询传感器 (id, is_active, is_gate)，不存在时返回None"""
+        return self._retry_operation(lambda: self.sensor_registry.lookup(sensor_id))
+
     # 补充：通行记录查询（按车辆）
-    def get_passage_by_vehicle(self, vehicle_id: str, limit: int = 20, offset: int = 0) -> Tuple[bool, Any, int]:
-        """查询指定车辆的通行记录"""
+    def get_passage_by_vehicle(self, vehicle_id: str, limit: int = 20, offset: int = 0,
+                               after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        """查询指定车辆的通行记录，按时间倒序，after为上一页返回的游标（提供时忽略offset）"""
         def operation():
-            cursor = self._get_thread_cursor()
+            cursor = self._get_read_cursor()
             try:
                 # 检查车辆是否存在
                 cursor.execute("SELECT vehicle_id FROM vehicles WHERE vehicle_id = ?", (vehicle_id,))
                 if not cursor.fetchone():
                     return (False, "车辆不存在", 0)
                 
-                # 查询总数
-                cursor.execute("""
-                    SELECT COUNT(*) as total 
-                    FROM passage_records 
-                    WHERE vehicle_id = ?
-                """, (vehicle_id,))
-                total = cursor.fetchone()['total']
+                # 查询总数（读取计数表，with_total为False时跳过），含已归档记录
+                segments = self._archived_segments(cursor, vehicle_id)
+                total = None
+                if with_total:
+                    total = self._read_counter(cursor, "vehicle_passages", vehicle_id)
+                    total += sum(segment['records'] for segment in segments)
                 
                 # 查询通行记录
-                cursor.execute("""
-                    SELECT pr.id, pr.vehicle_id, pr.sensor_id, s.location, pr.passage_time, pr.created_at
-                    FROM passage_records pr
-                    LEFT JOIN sensors s ON pr.sensor_id = s.id
-                    WHERE pr.vehicle_id = ?
-                    ORDER BY pr.passage_time DESC
-                    LIMIT ? OFFSET ?
-                """, (vehicle_id, limit, offset))
+                key = None
+                if after is not None:
+                    key = decode_page_cursor("passages", after)
+                    if key is None:
+                        return (False, "无效的分页游标", 0)
+                # 有归档时先取前 offset+limit 条在线记录，再与归档合并分页
+                skip = 0 if key is not None or not segments else offset
+                window = skip + limit
+                self._select_passages(cursor, "vehicle_id", vehicle_id, window if segments else limit,
+                                      0 if segments else offset, key)
                 
                 records = []
                 for row in cursor.fetchall():
@@ -684,40 +2475,41 @@ class VehicleDB:
                         'created_at': row['created_at']
                     })
                 
+                # 在线记录已取满且都晚于归档时，查询范围未涉及归档
+                if segments and (len(records) < window or records[-1]['passage_time'] <= segments[0]['max_time']):
+                    records += self._select_archived_passages(cursor, segments, vehicle_id, window, key)
+                    records.sort(key=lambda r: (r['passage_time'], r['id']), reverse=True)
+                records = records[skip:window]
+                
                 return (True, records, total)
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"查询失败: {str(e)}", 0)
 
         return self._retry_operation(operation)
 
     # 补充：通行记录查询（按传感器）
-    def get_passage_by_sensor(self, sensor_id: int, limit: int = 20, offset: int = 0) -> Tuple[bool, Any, int]:
-        """查询指定传感器的通行记录"""
+    def get_passage_by_sensor(self, sensor_id: int, limit: int = 20, offset: int = 0,
+                              after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        """查询指定传感器的通行记录，按时间倒序，after为上一页返回的游标（提供时忽略offset）"""
         def operation():
-            cursor = self._get_thread_cursor()
+            cursor = self._get_read_cursor()
             try:
                 # 检查传感器是否存在
                 cursor.execute("SELECT id FROM sensors WHERE id = ?", (sensor_id,))
                 if not cursor.fetchone():
                     return (False, "传感器不存在", 0)
                 
-                # 查询总数
-                cursor.execute("""
-                    SELECT COUNT(*) as total 
-                    FROM passage_records 
-                    WHERE sensor_id = ?
-                """, (sensor_id,))
-                total = cursor.fetchone()['total']
+                # 查询总数（读取计数表，with_total为False时跳过）
+                total = self._read_counter(cursor, "sensor_passages", str(sensor_id)) if with_total else None
                 
                 # 查询通行记录
-                cursor.execute("""
-                    SELECT pr.id, pr.vehicle_id, pr.sensor_id, s.location, pr.passage_time, pr.created_at
-                    FROM passage_records pr
-                    LEFT JOIN sensors s ON pr.sensor_id = s.id
-                    WHERE pr.sensor_id = ?
-                    ORDER BY pr.passage_time DESC
-                    LIMIT ? OFFSET ?
-                """, (sensor_id, limit, offset))
+                key = None
+                if after is not None:
+                    key = decode_page_cursor("passages", after)
+                    if key is None:
+                        return (False, "无效的分页游标", 0)
+                self._select_passages(cursor, "sensor_id", sensor_id, limit, offset, key)
                 
                 records = []
                 for row in cursor.fetchall():
@@ -732,6 +2524,7 @@ class VehicleDB:
                 
                 return (True, records, total)
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"查询失败: {str(e)}", 0)
 
         return self._retry_operation(operation)
@@ -752,30 +2545,611 @@ class VehicleDB:
                        WHERE id = ?""",
                     (is_active, sensor['id'])
                 )
-                self._get_thread_connection().commit()
+                self._commit()
                 return (True, "传感器状态更新成功")
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"更新失败: {str(e)}")
 
+        result = self._execute_write(operation)
+        # 提交后使进程内传感器缓存失效
+        self.sensor_registry.invalidate()
+        return result
+
+    # 通行记录分区
+    def _passage_sources(self, cursor: sqlite3.Cursor) -> List[str]:
+        """返回存放通行记录的全部表：各月分区（新到旧），最后为原表passage_records"""
+        cursor.execute("SELECT name FROM passage_partitions ORDER BY month DESC")
+        return [row[0] for row in cursor.fetchall()] + ["passage_records"]
+
+    @staticmethod
+    def _partition_name(month: str) -> str:
+        return f"passage_records_p{month.replace('-', '')}"
+
+    @staticmethod
+    def _partition_month(table: str) -> Optional[str]:
+        """由分区表名得到月份（YYYY-MM），原表返回None"""
+        if not table.startswith("passage_records_p"):
+            return None
+        digits = table[len("passage_records_p"):]
+        return f"{digits[:4]}-{digits[4:]}"
+
+    @staticmethod
+    def _month_end(month: str) -> str:
+        """月份最后一秒的时间字符串"""
+        year, mon = int(month[:4]), int(month[5:7])
+        next_month = datetime(year + mon // 12, mon % 12 + 1, 1)
+        return (next_month - timedelta(seconds=1)).strftime("%Y-%m-%d %H:%M:%S")
+
+    def _passage_table_for(self, cursor: sqlite3.Cursor, passage_time: str) -> str:
+        """返回写入指定时间通行记录的表，分区模式下按需创建当月分区"""
+        if not self.partitioning:
+            return "passage_records"
+        month = passage_time[:7]
+        table = self._partition_name(month)
+        cursor.execute("SELECT name FROM passage_partitions WHERE name = ?", (table,))
+        if not cursor.fetchone():
+            for statement in _partition_ddl(table, month, self.id_base):
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO passage_partitions (name, month) VALUES (?, ?)", (table, month))
+        return table
+
+    def _drop_partition(self, cursor: sqlite3.Cursor, table: str) -> int:
+        """删除整个分区表并扣减计数，返回分区中的记录数
+
+        扣减计数需按车辆和传感器分组统计，沿覆盖索引完整扫描一遍分区，代价与分区行数成正比；
+        省去的是逐行删除及其触发器、索引维护和WAL写入，删除本身只是 DROP TABLE。
+        """
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        count = cursor.fetchone()[0]
+        # 分组统计只读取 (vehicle_id, ...) / (sensor_id, ...) 索引，不读取表数据页
+        cursor.execute(f"""
+            UPDATE row_counters SET value = value - g.c
+            FROM (SELECT vehicle_id AS k, COUNT(*) AS c FROM {table} GROUP BY vehicle_id) AS g
+            WHERE row_counters.scope = 'vehicle_passages' AND row_counters.key = g.k
+        """)
+        cursor.execute(f"""
+            UPDATE row_counters SET value = value - g.c
+            FROM (SELECT CAST(sensor_id AS TEXT) AS k, COUNT(*) AS c FROM {table} GROUP BY sensor_id) AS g
+            WHERE row_counters.scope = 'sensor_passages' AND row_counters.key = g.k
+        """)
+        cursor.execute("UPDATE row_counters SET value = value - ? WHERE scope = 'passages' AND key = ''", (count,))
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+        cursor.execute("DELETE FROM passage_partitions WHERE name = ?", (table,))
+        return count
+
+    def _select_passages(self, cursor: sqlite3.Cursor, column: str, value: Any,
+                         limit: int, offset: int, key: Optional[List[Any]]) -> None:
+        """在原表及全部分区上按时间倒序查询指定车辆/传感器的通行记录（column为内部常量）"""
+        self._select_passages_where(cursor, self._passage_sources(cursor), f"{column} = ?", [value],
+                                    limit, offset, key)
+
+    def _select_passages_where(self, cursor: sqlite3.Cursor, sources: List[str], where: str, params: List[Any],
+                               limit: int, offset: int, key: Optional[List[Any]]) -> None:
+        """在给定的表上按条件和时间倒序查询通行记录（where为内部生成的条件）
+
+        每个分区先各自按索引取前 offset+limit 条，再合并排序分页
+        """
+        params = list(params)
+        if key is not None:
+            where += " AND (passage_time, id) < (?, ?)"
+            params += [key[0], key[1]]
+            offset = 0
+        branches = []
+        branch_params = []
+        for table in sources:
+            branches.append(f"""SELECT * FROM (
+                SELECT id, vehicle_id, sensor_id, passage_time, created_at FROM {table}
+                WHERE {where} ORDER BY passage_time DESC, id DESC LIMIT ?)""")
+            branch_params += params + [offset + limit]
+        cursor.execute(f"""
+            SELECT pr.id, pr.vehicle_id, pr.sensor_id, s.location, pr.passage_time, pr.created_at
+            FROM ({" UNION ALL ".join(branches)}) pr
+            LEFT JOIN sensors s ON pr.sensor_id = s.id
+            ORDER BY pr.passage_time DESC, pr.id DESC
+            LIMIT ? OFFSET ?
+        """, branch_params + [limit, offset])
+
+    def get_passages_by_time(self, start_time: str, end_time: str, limit: int = 20, offset: int = 0,
+                             after: Optional[str] = None, with_total: bool = True) -> Tuple[bool, Any, Optional[int]]:
+        """查询时间范围 [start_time, end_time) 内的通行记录，按时间倒序，after为上一页返回的游标
+
+        只查询与时间范围重叠的分区；总数按时间索引统计（with_total为False时跳过）
+        """
+        def operation():
+            cursor = self._get_read_cursor()
+            try:
+                sources = [table for table in self._passage_sources(cursor)
+                           if self._partition_month(table) is None
+                           or (f"{self._partition_month(table)}-01 00:00:00" < end_time
+                               and self._month_end(self._partition_month(table)) >= start_time)]
+                where = "passage_time >= ? AND passage_time < ?"
+
+                total = None
+                if with_total:
+                    total = 0
+                    for table in sources:
+                        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", (start_time, end_time))
+                        total += cursor.fetchone()[0]
+
+                key = None
+                if after is not None:
+                    key = decode_page_cursor("passages", after)
+                    if key is None:
+                        return (False, "无效的分页游标", 0)
+                self._select_passages_where(cursor, sources, where, [start_time, end_time], limit, offset, key)
+                records = [dict(row) for row in cursor.fetchall()]
+                return (True, records, total)
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}", 0)
+
+        return self._retry_operation(operation)
+
+    def get_setting(self, key: str) -> Tuple[bool, Optional[str]]:
+        """读取保存在数据库中的设置项，不存在时返回 (True, None)"""
+        def operation():
+            cursor = self._get_thread_cursor()
+            try:
+                cursor.execute("SELECT value FROM db_settings WHERE key = ?", (key,))
+                row = cursor.fetchone()
+                return (True, row[0] if row else None)
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}")
+
+        return self._retry_operation(operation)
+
+    def set_setting(self, key: str, value: str) -> Tuple[bool, str]:
+        """保存设置项"""
+        def operation():
+            cursor = self._get_thread_cursor()
+            try:
+                cursor.execute(
+                    """INSERT INTO db_settings (key, value) VALUES (?, ?)
+                       ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP""",
+                    (key, value)
+                )
+                self._commit()
+                return (True, "设置已保存")
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"设置失败: {str(e)}")
+
+        return self._execute_write(operation)
+
+    # 通行事件发件箱（变更数据捕获）
+    def register_outbox_consumer(self, name: str, from_beginning: bool = False) -> Tuple[bool, str]:
+        """注册发件箱消费者，from_beginning为True时从保留的最早事件开始读取，否则只读取注册之后的事件"""
+        def operation():
+            cursor = self._get_thread_cursor()
+            try:
+                cursor.execute("SELECT name FROM outbox_consumers WHERE name = ?", (name,))
+                if cursor.fetchone():
+                    return (False, "消费者已存在")
+                last_seq = 0
+                if not from_beginning:
+                    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'passage_outbox'")
+                    row = cursor.fetchone()
+                    last_seq = row[0] if row else 0
+                cursor.execute("INSERT INTO outbox_consumers (name, last_seq) VALUES (?, ?)", (name, last_seq))
+                self._commit()
+                return (True, "消费者注册成功")
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"注册失败: {str(e)}")
+
+        return self._execute_write(operation)
+
+    def unregister_outbox_consumer(self, name: str) -> Tuple[bool, str]:
+        """注销发件箱消费者，之后压缩不再等待该消费者"""
+        def operation():
+            cursor = self._get_thread_cursor()
+            try:
+                cursor.execute("DELETE FROM outbox_consumers WHERE name = ?", (name,))
+                if cursor.rowcount == 0:
+                    return (False, "消费者不存在")
+                self._commit()
+                return (True, "消费者注销成功")
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"注销失败: {str(e)}")
+
+        return self._execute_write(operation)
+
+    def read_outbox(self, name: str, limit: int = 100) -> Tuple[bool, Any]:
+        """读取消费者上次确认的序号之后的一批事件（按seq升序），不改变消费进度
+
+        返回 (True, 事件列表)，处理完成后调用 ack_outbox 确认最后一条的 seq
+        """
+        def operation():
+            cursor = self._get_read_cursor()
+            try:
+                cursor.execute("SELECT last_seq FROM outbox_consumers WHERE name = ?", (name,))
+                consumer = cursor.fetchone()
+                if not consumer:
+                    return (False, "消费者不存在")
+                cursor.execute("""
+                    SELECT seq, passage_id, vehicle_id, sensor_id, passage_time, is_on_campus, created_at
+                    FROM passage_outbox
+                    WHERE seq > ?
+                    ORDER BY seq
+                    LIMIT ?
+                """, (consumer['last_seq'], limit))
+                return (True, [dict(row) for row in cursor.fetchall()])
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}")
+
         return self._retry_operation(operation)
 
+    def ack_outbox(self, name: str, seq: int) -> Tuple[bool, str]:
+        """确认消费者已处理到 seq（含），进度只前进不后退"""
+        def operation():
+            cursor = self._get_thread_cursor()
+            try:
+                cursor.execute("SELECT last_seq FROM outbox_consumers WHERE name = ?", (name,))
+                consumer = cursor.fetchone()
+                if not consumer:
+                    return (False, "消费者不存在")
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'passage_outbox'")
+                row = cursor.fetchone()
+                if seq > (row[0] if row else 0):
+                    return (False, "确认的序号超出已写入的事件")
+                if seq > consumer['last_seq']:
+                    cursor.execute(
+                        "UPDATE outbox_consumers SET last_seq = ?, updated_at = CURRENT_TIMESTAMP WHERE name = ?",
+                        (seq, name)
+                    )
+                    self._commit()
+                return (True, "确认成功")
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"确认失败: {str(e)}")
+
+        return self._execute_write(operation)
+
+    def get_outbox_consumers(self) -> Tuple[bool, Any]:
+        """查询各消费者的进度及积压事件数"""
+        def operation():
+            cursor = self._get_read_cursor()
+            try:
+                cursor.execute("""
+                    SELECT c.name, c.last_seq, c.updated_at,
+                           (SELECT COUNT(*) FROM passage_outbox o WHERE o.seq > c.last_seq) AS pending
+                    FROM outbox_consumers c
+                    ORDER BY c.name
+                """)
+                return (True, [dict(row) for row in cursor.fetchall()])
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}")
+
+        return self._retry_operation(operation)
+
+    def compact_outbox(self, before_seq: Optional[int] = None) -> Tuple[bool, Any]:
+        """删除所有消费者都已确认的事件（before_seq 进一步限定只删除 seq <= before_seq 的事件）
+
+        没有消费者时删除全部已写入的事件；返回 (True, 删除的事件数)
+        """
+        def operation():
+            cursor = self._get_thread_cursor()
+            try:
+                cursor.execute("SELECT MIN(last_seq), COUNT(*) FROM outbox_consumers")
+                min_seq, consumers = cursor.fetchone()
+                if consumers:
+                    upto = min_seq
+                else:
+                    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'passage_outbox'")
+                    row = cursor.fetchone()
+                    upto = row[0] if row else 0
+                if before_seq is not None:
+                    upto = min(upto, before_seq)
+                # 车辆状态写回缓存恢复时需要重放尚未写回车辆表的事件
+                upto = min(upto, self._read_counter(cursor, "vehicle_state_seq"))
+                cursor.execute("DELETE FROM passage_outbox WHERE seq <= ?", (upto,))
+                deleted = cursor.rowcount
+                self._commit()
+                return (True, deleted)
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"压缩失败: {str(e)}")
+
+        return self._execute_write(operation)
+
+    def enable_passage_partitioning(self) -> Tuple[bool, str]:
+        """启用按月分区：之后新写入的通行记录存入当月分区表，已有记录保留在原表
+
+        设置保存在数据库中，其他进程的VehicleDB重新初始化后生效
+        """
+        def operation():
+            cursor = self._get_thread_cursor()
+            try:
+                cursor.execute(
+                    """INSERT INTO db_settings (key, value) VALUES ('passage_partitioning', 'monthly')
+                       ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP"""
+                )
+                self._commit()
+                return (True, "已启用通行记录按月分区")
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"设置失败: {str(e)}")
+
+        result = self._execute_write(operation)
+        if result[0]:
+            self.partitioning = True
+        return result
+
+    def get_passage_partitions(self) -> Tuple[bool, Any]:
+        """查询通行记录分区列表（新到旧），包含月份和记录数"""
+        def operation():
+            cursor = self._get_read_cursor()
+            try:
+                cursor.execute("SELECT name, month, created_at FROM passage_partitions ORDER BY month DESC")
+                partitions = [dict(row) for row in cursor.fetchall()]
+                for partition in partitions:
+                    cursor.execute(f"SELECT COUNT(*) FROM {partition['name']}")
+                    partition['records'] = cursor.fetchone()[0]
+                return (True, partitions)
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}")
+
+        return self._retry_operation(operation)
+
+    def drop_passage_partitions_before(self, month: str) -> Tuple[bool, str]:
+        """保留策略：整体删除早于指定月份（YYYY-MM，不含）的分区，不逐行删除（扣减计数仍需扫描分区索引）"""
+        def operation():
+            cursor = self._get_thread_cursor()
+            try:
+                cursor.execute("SELECT name FROM passage_partitions WHERE month < ? ORDER BY month", (month,))
+                tables = [row[0] for row in cursor.fetchall()]
+                affected = sum(self._drop_partition(cursor, table) for table in tables)
+                self._commit()
+                return (True, f"成功删除 {len(tables)} 个分区，共 {affected} 条记录")
+            except Exception as e:
+                self._rollback()
+                _raise_if_busy(e)
+                return (False, f"删除失败: {str(e)}")
+
+        return self._execute_write(operation)
+
+    def incremental_vacuum(self, max_pages: int = 1000, pause: float = 0.05) -> Tuple[bool, Any]:
+        """分批回收空闲页，每批最多max_pages页，批次之间暂停pause秒
+
+        数据库未启用增量自动清理（auto_vacuum=INCREMENTAL）时返回失败
+        """
+        def free_pages():
+            cursor = self._get_thread_cursor()
+            try:
+                cursor.execute("PRAGMA auto_vacuum")
+                if cursor.fetchone()[0] != 2:
+                    return (False, "数据库未启用增量自动清理，请先调用enable_incremental_vacuum")
+                cursor.execute("PRAGMA freelist_count")
+                return (True, cursor.fetchone()[0])
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}")
+
+        def vacuum_batch():
+            conn = self._get_thread_connection()
+            try:
+                conn.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()
+                return (True, None)
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"清理失败: {str(e)}")
+
+        success, before = self._retry_operation(free_pages)
+        if not success:
+            return (False, before)
+        remaining = before
+        for _ in range(before // max(1, int(max_pages)) + 1):
+            if remaining == 0:
+                break
+            success, message = self._execute_write(vacuum_batch)
+            if not success:
+                return (False, message)
+            time.sleep(pause)
+            success, remaining = self._retry_operation(free_pages)
+            if not success:
+                return (False, remaining)
+        # 清理期间其他写入可能产生新的空闲页，按前后差值计算（不小于0）
+        return (True, {'freed_pages': max(0, before - remaining)})
+
+    def enable_incremental_vacuum(self) -> Tuple[bool, str]:
+        """将已有数据库切换为增量自动清理，需执行一次完整VACUUM（期间阻塞写入）"""
+        def operation():
+            conn = self._get_thread_connection()
+            try:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                return (True, "已启用增量自动清理")
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"设置失败: {str(e)}")
+
+        return self._retry_operation(operation)
+
+    def archive_passages_before(self, cutoff: str) -> Tuple[bool, Any]:
+        """将早于cutoff的通行记录按月移出数据库，写入归档目录中的列式压缩段文件
+
+        每个月份一个事务：写入段文件、删除原记录并登记段目录和按车辆索引
+        """
+        if self.db_path == ":memory:":
+            return (False, "内存数据库不支持归档")
+        directory = archive_dir(self.db_path)
+
+        def list_months():
+            cursor = self._get_thread_cursor()
+            try:
+                months = set()
+                for table in self._passage_sources(cursor):
+                    cursor.execute(f"SELECT DISTINCT substr(passage_time, 1, 7) FROM {table} WHERE passage_time < ?",
+                                   (cutoff,))
+                    months.update(row[0] for row in cursor.fetchall())
+                return (True, sorted(months))
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}")
+
+        success, months = self._retry_operation(list_months)
+        if not success:
+            return (False, months)
+
+        segments = []
+        archived = 0
+        for month in months:
+            success, result = self._execute_write(lambda: self._archive_month(directory, month, cutoff))
+            if not success:
+                return (False, result)
+            if result:
+                segments.append(result[0])
+                archived += result[1]
+        return (True, {'archived': archived, 'segments': segments})
+
+    def _archive_month(self, directory: str, month: str, cutoff: str) -> Tuple[bool, Any]:
+        """归档一个月份中早于cutoff的记录（在写事务中执行）"""
+        cursor = self._get_thread_cursor()
+        name = None
+        try:
+            start, end = f"{month}-01 00:00:00", min(self._month_end(month), cutoff)
+            rows, max_ids = [], {}
+            for table in self._passage_sources(cursor):
+                cursor.execute(f"""
+                    SELECT id, vehicle_id, sensor_id, passage_time, created_at FROM {table}
+                    WHERE passage_time >= ? AND passage_time <= ? AND passage_time < ?
+                """, (start, end, cutoff))
+                found = [tuple(row) for row in cursor.fetchall()]
+                if found:
+                    rows += found
+                    max_ids[table] = max(row[0] for row in found)
+            if not rows:
+                return (True, None)
+
+            name = f"passages_{month.replace('-', '')}_{min(r[0] for r in rows)}_{max(r[0] for r in rows)}"
+            size, blocks = write_segment(directory, name, rows)
+
+            for table, max_id in max_ids.items():
+                # 只删除已写入段文件的记录（按ID上界），计数由删除触发器维护
+                cursor.execute(f"""
+                    DELETE FROM {table}
+                    WHERE passage_time >= ? AND passage_time <= ? AND passage_time < ? AND id <= ?
+                """, (start, end, cutoff, max_id))
+                partition_month = self._partition_month(table)
+                if partition_month and self._month_end(partition_month) < cutoff:
+                    cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+                    if not cursor.fetchone():
+                        self._drop_partition(cursor, table)
+
+            times = [row[3] for row in rows]
+            cursor.execute(
+                """INSERT INTO passage_archives (name, month, min_time, max_time, records, bytes)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (name, month, min(times), max(times), len(rows), size)
+            )
+            cursor.executemany(
+                """INSERT INTO passage_archive_vehicles
+                   (vehicle_id, archive, records, min_time, max_time, block_offset, block_length)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [(vehicle_id, name, item['records'], item['min_time'], item['max_time']) + blocks[vehicle_id]
+                 for vehicle_id, item in segment_summary(rows).items()]
+            )
+            self._commit()
+            return (True, (name, len(rows)))
+        except Exception as e:
+            self._rollback()
+            if name:
+                remove_segment(directory, name)
+            _raise_if_busy(e)
+            return (False, f"归档失败: {str(e)}")
+
+    def get_passage_archives(self) -> Tuple[bool, Any]:
+        """查询归档段列表（新到旧），包含月份、时间范围、记录数和文件大小"""
+        def operation():
+            cursor = self._get_read_cursor()
+            try:
+                cursor.execute("""
+                    SELECT name, month, min_time, max_time, records, bytes, created_at
+                    FROM passage_archives ORDER BY max_time DESC
+                """)
+                return (True, [dict(row) for row in cursor.fetchall()])
+            except Exception as e:
+                _raise_if_busy(e)
+                return (False, f"查询失败: {str(e)}")
+
+        return self._retry_operation(operation)
+
+    def _archived_segments(self, cursor: sqlite3.Cursor, vehicle_id: str) -> List[sqlite3.Row]:
+        """车辆涉及的归档段（按最新时间倒序）"""
+        cursor.execute("""
+            SELECT archive, records, min_time, max_time, block_offset, block_length FROM passage_archive_vehicles
+            WHERE vehicle_id = ? ORDER BY max_time DESC
+        """, (vehicle_id,))
+        return cursor.fetchall()
+
+    def _select_archived_passages(self, cursor: sqlite3.Cursor, segments: List[sqlite3.Row], vehicle_id: str,
+                                  count: int, key: Optional[List[Any]]) -> List[Dict[str, Any]]:
+        """从归档段中按时间倒序读取车辆的前count条记录（key为分页游标位置）
+
+        每个段只读取并解压该车辆的数据块（迁移14之前写入的旧格式段解码整段后筛选），不缓存解码结果
+        """
+        directory = archive_dir(self.db_path)
+        rows = []
+        for segment in segments:
+            if key is not None and segment['min_time'] > key[0]:
+                continue
+            # 已取满且剩余段都更早时停止读取
+            if len(rows) >= count and segment['max_time'] < rows[count - 1][3]:
+                break
+            for row in read_vehicle_rows(directory, segment['archive'], vehicle_id,
+                                         segment['block_offset'], segment['block_length']):
+                if key is None or (row[3], row[0]) < (key[0], key[1]):
+                    rows.append(row)
+            rows.sort(key=lambda r: (r[3], r[0]), reverse=True)
+            del rows[count:]
+
+        locations = {}
+        sensor_ids = sorted({row[2] for row in rows})
+        if sensor_ids:
+            cursor.execute(f"SELECT id, location FROM sensors WHERE id IN ({','.join('?' * len(sensor_ids))})",
+                           sensor_ids)
+            locations = {row['id']: row['location'] for row in cursor.fetchall()}
+        return [{
+            'id': row[0],
+            'vehicle_id': row[1],
+            'sensor_id': row[2],
+            'location': locations.get(row[2]),
+            'passage_time': row[3],
+            'created_at': row[4]
+        } for row in rows]
+
     # 补充：批量删除通行记录（按时间）
     def delete_passage_records_by_time(self, start_time: str, end_time: str) -> Tuple[bool, str]:
         """删除指定时间范围内的通行记录"""
         def operation():
             cursor = self._get_thread_cursor()
             try:
-                cursor.execute("""
-                    DELETE FROM passage_records 
-                    WHERE passage_time BETWEEN ? AND ?
-                """, (start_time, end_time))
-                affected = cursor.rowcount
-                self._get_thread_connection().commit()
+                affected = 0
+                for table in self._passage_sources(cursor):
+                    month = self._partition_month(table)
+                    if month and start_time <= f"{month}-01 00:00:00" and end_time >= self._month_end(month):
+                        # 分区整体落在时间范围内，直接删除分区
+                        affected += self._drop_partition(cursor, table)
+                        continue
+                    cursor.execute(f"""
+                        DELETE FROM {table} 
+                        WHERE passage_time BETWEEN ? AND ?
+                    """, (start_time, end_time))
+                    affected += cursor.rowcount
+                self._commit()
                 return (True, f"成功删除 {affected} 条记录")
             except Exception as e:
+                _raise_if_busy(e)
                 return (False, f"删除失败: {str(e)}")
 
-        return self._retry_operation(operation)
+        return self._execute_write(operation)
 
 if __name__ == "__main__": 
     """初始化数据库并插入测试数据"""
@@ -1,5 +1,6 @@
 from flask import Flask, render_template, request, redirect, session, url_for, jsonify
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 
 app = Flask(__name__)
@@ -10,6 +11,11 @@ LOGIN_SERVER = 'http://localhost:12344'
 ADMIN_SERVER = 'http://localhost:12345'
 USER_SERVER = 'http://localhost:12346'
 
+# 复用到后端服务器的HTTP/1.1持久连接，避免每次请求重新建立TCP连接
+# pool_maxsize 为每个后端保留的空闲连接数，应不小于Flask的并发请求数
+backend = requests.Session()
+backend.mount('http://', HTTPAdapter(pool_connections=3, pool_maxsize=16))
+
 # 通用工具函数：检查管理员权限
 def is_admin():
     return session.get('role') == 'admin'
@@ -22,9 +28,9 @@ def is_user():
 def handle_request(url, method='get', params=None, json=None):
     try:
         if method.lower() == 'get':
-            response = requests.get(url, params=params, timeout=5)
+            response = backend.get(url, params=params, timeout=5)
         else:
-            response = requests.post(url, json=json, timeout=5)
+            response = backend.post(url, json=json, timeout=5)
         
         response.raise_for_status()  # 抛出HTTP错误状态码
         return response.json()